@@ -2,6 +2,7 @@
 Context processors for users_admin app.
 Provides navigation links based on user role.
 """
+from django.conf import settings
 
 
 def navigation_context(request):
@@ -25,6 +26,10 @@ def navigation_context(request):
     # Workflow link for all authenticated users
     links.append({'url': 'workflow:dashboard', 'text': 'Workflow', 'name': 'dashboard'})
 
+    # Slow request log for Administrador role, while requests are being timed
+    if request.user.role == 'Administrador' and getattr(settings, 'SERVER_TIMING', False):
+        links.append({'url': 'workflow:solicitudes_lentas', 'text': 'Rendimiento', 'name': 'solicitudes_lentas'})
+
     # Add "Crear Workflow" link for Jefe de Proyecto
     if request.user.role == 'Jefe de Proyecto':
         links.append({'url': 'workflow:workflow_create', 'text': 'Crear Workflow', 'name': 'workflow_create'})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Workflow, PlanPruebaQA, Actividad
+from .models import Workflow, PlanPruebaQA, Actividad, WorkflowArchivado, TrabajoExportacion
 
 
 @admin.register(Workflow)
@@ -16,6 +16,8 @@ class PlanPruebaQAAdmin(admin.ModelAdmin):
     list_display = ['workflow', 'id_prueba', 'prueba', 'avance', 'resultado']
     list_filter = ['resultado', 'workflow']
     search_fields = ['prueba', 'workflow__nom_proyecto']
+    # Allocated from the workflow counter on save
+    readonly_fields = ['id_prueba']
     ordering = ['workflow', 'id_prueba']
 
 
@@ -24,5 +26,24 @@ class ActividadAdmin(admin.ModelAdmin):
     list_display = ['workflow', 'id_actividad', 'fecha', 'usuario', 'estado_workflow', 'proceso', 'estado_proceso', 'actividad']
     list_filter = ['fecha', 'estado_workflow', 'proceso', 'estado_proceso']
     search_fields = ['usuario', 'actividad', 'workflow__nom_proyecto']
-    readonly_fields = ['fecha']
+    # Allocated from the workflow counter on save
+    readonly_fields = ['id_actividad', 'fecha']
     ordering = ['-fecha']
+
+
+@admin.register(WorkflowArchivado)
+class WorkflowArchivadoAdmin(admin.ModelAdmin):
+    list_display = ['id_workflow', 'id_proyecto', 'nom_proyecto', 'jefe_proyecto', 'componente', 'creacion', 'archivado']
+    list_filter = ['archivado', 'jefe_proyecto']
+    search_fields = ['id_proyecto', 'nom_proyecto', 'jefe_proyecto', 'componente']
+    readonly_fields = ['archivado']
+    ordering = ['-creacion']
+
+
+@admin.register(TrabajoExportacion)
+class TrabajoExportacionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'estado', 'gzip', 'filas', 'creado', 'finalizado']
+    list_filter = ['estado', 'creado']
+    search_fields = ['usuario']
+    readonly_fields = ['creado', 'iniciado', 'finalizado']
+    ordering = ['-creado']
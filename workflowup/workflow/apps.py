@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WorkflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workflow'
+
+    def ready(self):
+        from . import signals  # connects the signal handlers
+
+        # Query timing of the Server-Timing header, on every connection from the first one
+        if getattr(settings, 'SERVER_TIMING', False):
+            from .timing import medir_conexiones
+            medir_conexiones()
+
+        # N+1 query detection, on every connection from the first one
+        if getattr(settings, 'NPLUSONE', 'off') != 'off':
+            from .nplusone import vigilar_conexiones
+            vigilar_conexiones()
@@ -0,0 +1,244 @@
+"""
+Per-view benchmark (see the benchmark_views command).
+
+Every scenario is one URL requested through the Django test client as a user
+of the role that normally opens it. For each request the wall time (including
+the consumption of streamed bodies), the number of SQL queries and the time
+spent in them, and the response size are recorded; one extra request per
+scenario runs under tracemalloc to measure the peak Python memory, so tracing
+does not distort the timings.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from users_admin.models import User
+from .models import Workflow
+
+# (URL name, role) of every benchmarked request; the dashboard has one branch per role
+ESCENARIOS = [
+    ('dashboard', 'Administrador'),
+    ('dashboard', 'Jefe de Proyecto'),
+    ('dashboard', 'SCM'),
+    ('dashboard', 'Release Manager'),
+    ('dashboard', 'QA'),
+    ('dashboard_api', 'Administrador'),
+    ('export_workflows_csv', 'Administrador'),
+    ('workflow_detail', 'Jefe de Proyecto'),
+    ('workflow_detail_scm', 'SCM'),
+    ('workflow_detail_rm', 'Release Manager'),
+    ('workflow_detail_qa', 'QA'),
+    ('qa_update_avance_ajax', 'QA'),
+    ('qa_toggle_rechazar_ajax', 'QA'),
+    ('qa_batch_update_ajax', 'QA'),
+]
+
+# Metrics compared against a baseline; any increase in queries is a regression
+METRICAS = ['p50_ms', 'p95_ms', 'consultas', 'sql_ms', 'memoria_kb', 'bytes']
+# Timing differences below this are noise, whatever the tolerance
+MINIMO_MS = 1.0
+
+
+def nombre_escenario(vista, rol):
+    return f'{vista}[{rol}]'
+
+
+def preparar_escenarios(seleccion=None):
+    """
+    Requests of the ESCENARIOS (or of those named in `seleccion`, by scenario or
+    URL name) against the current data, as dicts with the user, method, URL and
+    data. Detail views open the workflow with the longest history (for reviewers,
+    among those in their work queue), the QA views the one with the largest test
+    plan pending QA, and the Jefe de Proyecto dashboard is that of the jefe with
+    the most workflows. Scenarios without data to act on are left out.
+    The QA AJAX requests write the values the tests already have (the toggle
+    alternates between 'No aprobado' and 'No iniciado'), so repeating them does
+    not drift the data.
+    """
+    usuarios = {
+        rol: User.objects.filter(role=rol, is_active=True).order_by('username').first()
+        for _, rol in ESCENARIOS
+    }
+    jefe = Workflow.objects.values('jefe_proyecto').annotate(total=Count('pk')).order_by('-total', 'jefe_proyecto').first()
+    if jefe:
+        usuarios['Jefe de Proyecto'] = User.objects.filter(username=jefe['jefe_proyecto']).first()
+
+    def mayor(relacion, rol=None):
+        workflows = Workflow.objects.filter(cola_trabajo__rol=rol) if rol else Workflow.objects.all()
+        return workflows.annotate(total=Count(relacion)).order_by('-total', 'pk').first()
+
+    detalle = {
+        'workflow_detail': mayor('actividades'),
+        'workflow_detail_scm': mayor('actividades', 'SCM'),
+        'workflow_detail_rm': mayor('actividades', 'Release Manager'),
+        'workflow_detail_qa': mayor('plan_pruebas', 'QA'),
+    }
+    qa = detalle['workflow_detail_qa']
+    pruebas = list(qa.plan_pruebas.order_by('id_prueba')) if qa else []
+    estables = [prueba for prueba in pruebas if prueba.resultado != 'No aprobado']
+    alternable = next(
+        (prueba for prueba in pruebas if prueba.resultado in ('No iniciado', 'No aprobado')), None
+    )
+
+    peticiones = {
+        'dashboard': ('get', [], {}),
+        'dashboard_api': ('get', [], {}),
+        'export_workflows_csv': ('get', [], {}),
+    }
+    for vista, workflow in detalle.items():
+        if workflow:
+            peticiones[vista] = ('get', [workflow.pk], {})
+    if estables:
+        prueba = estables[0]
+        peticiones['qa_update_avance_ajax'] = ('post', [qa.pk, prueba.id_prueba], {'avance': prueba.avance})
+        peticiones['qa_batch_update_ajax'] = ('json', [qa.pk], {'operaciones': [
+            {'id_prueba': prueba.id_prueba, 'avance': prueba.avance} for prueba in estables
+        ]})
+    if alternable:
+        peticiones['qa_toggle_rechazar_ajax'] = ('post', [qa.pk, alternable.id_prueba], {})
+
+    escenarios = []
+    for vista, rol in ESCENARIOS:
+        nombre = nombre_escenario(vista, rol)
+        if seleccion and nombre not in seleccion and vista not in seleccion:
+            continue
+        usuario = usuarios[rol]
+        if vista == 'workflow_detail' and detalle[vista]:
+            usuario = User.objects.filter(username=detalle[vista].jefe_proyecto).first()
+        if usuario is None or vista not in peticiones:
+            continue
+        metodo, args, datos = peticiones[vista]
+        escenarios.append({
+            'nombre': nombre,
+            'vista': vista,
+            'rol': rol,
+            'usuario': usuario,
+            'metodo': metodo,
+            'url': reverse(f'workflow:{vista}', args=args),
+            'datos': datos,
+        })
+    return escenarios
+
+
+class ContadorSQL:
+    """connection.execute_wrapper counting the queries and the seconds spent in them."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def solicitar(cliente, escenario):
+    """Send the scenario's request and read the whole body. Returns (status, bytes)."""
+    if escenario['metodo'] == 'json':
+        respuesta = cliente.post(escenario['url'], json.dumps(escenario['datos']), content_type='application/json')
+    else:
+        respuesta = getattr(cliente, escenario['metodo'])(escenario['url'], escenario['datos'])
+    cuerpo = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+    return respuesta.status_code, len(cuerpo)
+
+
+def _vaciar_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def medir(escenario, repeticiones=20, calentamiento=2, frio=True):
+    """
+    Measure one scenario. With `frio` every cache is emptied before each request,
+    so the numbers reflect the work of the view and not a cache hit.
+    Returns the metrics as a dict.
+    """
+    cliente = Client()
+    cliente.force_login(escenario['usuario'])
+    for _ in range(calentamiento):
+        solicitar(cliente, escenario)
+
+    latencias, consultas, segundos_sql, estados = [], [], [], set()
+    for _ in range(repeticiones):
+        if frio:
+            _vaciar_caches()
+        contador = ContadorSQL()
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            status, tamano = solicitar(cliente, escenario)
+            latencias.append(time.perf_counter() - inicio)
+        consultas.append(contador.consultas)
+        segundos_sql.append(contador.segundos)
+        estados.add(status)
+
+    if frio:
+        _vaciar_caches()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        solicitar(cliente, escenario)
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    latencias.sort()
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000
+    return {
+        'escenario': escenario['nombre'],
+        'vista': escenario['vista'],
+        'rol': escenario['rol'],
+        'status': sorted(estados),
+        'p50_ms': round(statistics.median(latencias) * 1000, 3),
+        'p95_ms': round(percentil(0.95), 3),
+        'p99_ms': round(percentil(0.99), 3),
+        'max_ms': round(latencias[-1] * 1000, 3),
+        'consultas': max(consultas),
+        'sql_ms': round(statistics.median(segundos_sql) * 1000, 3),
+        'memoria_kb': round(pico / 1024, 1),
+        'bytes': tamano,
+    }
+
+
+def comparar(resultados, base, tolerancia=25.0):
+    """
+    Compare results with a baseline run, matching them by scenario and dataset size.
+    Returns one dict per metric that moved by more than `tolerancia` percent
+    (timings also by more than MINIMO_MS) or, for the number of queries, at all;
+    'regresion' is set on those that grew.
+    """
+    anteriores = {(fila['escenario'], fila['workflows']): fila for fila in base}
+    cambios = []
+    for fila in resultados:
+        anterior = anteriores.get((fila['escenario'], fila['workflows']))
+        if anterior is None:
+            continue
+        for metrica in METRICAS:
+            antes, despues = anterior.get(metrica), fila[metrica]
+            if antes is None:
+                continue
+            limite = 0 if metrica == 'consultas' else abs(antes) * tolerancia / 100
+            if metrica.endswith('_ms'):
+                limite = max(limite, MINIMO_MS)
+            if abs(despues - antes) <= limite:
+                continue
+            cambios.append({
+                'escenario': fila['escenario'],
+                'workflows': fila['workflows'],
+                'metrica': metrica,
+                'antes': antes,
+                'despues': despues,
+                'cambio_pct': round((despues - antes) / antes * 100, 1) if antes else None,
+                'regresion': despues > antes,
+            })
+    return cambios
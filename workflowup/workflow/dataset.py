@@ -0,0 +1,291 @@
+"""
+Synthetic data for capacity testing (see the generate_dataset command).
+
+Each workflow is built from its own random stream, seeded from the global
+seed and the workflow index, so the generated data does not depend on how the
+index range is split among worker processes. Activity histories are produced
+by walking the transition table of transitions.py, so every history is one the
+application itself could have recorded: linea base, RM Rev, Diff Info and QA
+in order, with rejections, re-requests, closures and cancellations.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from users_admin.models import User
+from .models import Workflow, Actividad, PlanPruebaQA, WorkflowArchivado, WorkflowEstado, VersionDatos
+from .transitions import (
+    PROCESOS, ROLES_REVISORES, acciones_permitidas, registro_transicion, texto_actividad, comentario_obligatorio
+)
+
+# Username prefix per role; usernames are letters only (see User.username_validator)
+PREFIJOS_ROL = {
+    'Administrador': 'synadm',
+    'Jefe de Proyecto': 'synjp',
+    'SCM': 'synscm',
+    'Release Manager': 'synrm',
+    'QA': 'synqa',
+}
+PASSWORD = 'synthetic'
+
+COMPONENTES = ['api', 'backend', 'frontend', 'batch', 'integraciones', 'reportes', 'movil', 'seguridad']
+PROYECTOS = ['Portal Clientes', 'Facturación', 'Cobranza', 'Inventario', 'Recursos Humanos', 'Pagos', 'CRM', 'Logística']
+PRUEBAS = ['Login', 'Logout', 'Alta de registro', 'Baja de registro', 'Modificación', 'Búsqueda', 'Exportación',
+           'Permisos por rol', 'Carga masiva', 'Reporte mensual', 'Notificaciones', 'Integración externa']
+COMENTARIOS_RECHAZO = ['Falta documentación', 'Versión incorrecta', 'Errores en ambiente de pruebas',
+                       'No cumple los criterios de aceptación', 'Dependencias sin actualizar']
+
+# Chance that a reviewer rejects instead of approving
+PROB_RECHAZO = 0.2
+# Chance, at each step, that the Jefe de Proyecto cancels the workflow
+PROB_CANCELACION = 0.01
+# Time between consecutive activities of a workflow, in minutes
+PAUSA_MIN, PAUSA_MAX = 30, 72 * 60
+
+
+def _letras(numero, largo=3):
+    """Letters-only code of a number: 0 -> 'aaa', 1 -> 'aab', ..."""
+    letras = ''
+    while numero or len(letras) < largo:
+        numero, resto = divmod(numero, 26)
+        letras = chr(ord('a') + resto) + letras
+    return letras
+
+
+def usernames(por_rol):
+    """{rol: [username]} of the synthetic users."""
+    return {rol: [prefijo + _letras(i) for i in range(por_rol)] for rol, prefijo in PREFIJOS_ROL.items()}
+
+
+def crear_usuarios(por_rol):
+    """
+    Create `por_rol` users of every role, all with the password PASSWORD.
+    Users that already exist are kept. Returns usernames(por_rol).
+    """
+    nombres = usernames(por_rol)
+    clave = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [
+            User(
+                username=username, email=f'{username}@synthetic.workflowup.com', password=clave,
+                first_name='Usuario', last_name=username, role=rol, is_staff=rol == 'Administrador'
+            )
+            for rol, lista in nombres.items() for username in lista
+        ],
+        ignore_conflicts=True
+    )
+    return nombres
+
+
+@contextmanager
+def fechas_explicitas():
+    """
+    Let bulk_create keep the given Workflow.creacion and Actividad.fecha values
+    instead of stamping the current time (auto_now_add) inside the block.
+    """
+    campos = [Workflow._meta.get_field('creacion'), Actividad._meta.get_field('fecha')]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo in campos:
+            campo.auto_now_add = True
+
+
+def _siguiente_paso(rng, estado):
+    """(accion, proceso, rol) of the next transition of a simulated workflow."""
+    # A pending review is always answered first
+    for rol in ROLES_REVISORES:
+        acciones = sorted(acciones_permitidas(rol, estado))
+        if acciones:
+            accion = 'rechazar' if rng.random() < PROB_RECHAZO else 'aprobar'
+            return accion, acciones[0][1], rol
+
+    acciones = acciones_permitidas('Jefe de Proyecto', estado)
+    if ('cerrar', None) in acciones:
+        return 'cerrar', None, 'Jefe de Proyecto'
+    solicitudes = sorted(clave for clave in acciones if clave[0] == 'solicitar')
+    if not solicitudes or rng.random() < PROB_CANCELACION:
+        return 'cancelar', None, 'Jefe de Proyecto'
+    return (*rng.choice(solicitudes), 'Jefe de Proyecto')
+
+
+def _plan_pruebas(rng, id_workflow, estado_qa, max_pruebas):
+    """Test plan consistent with the final QA state of the workflow."""
+    pruebas = []
+    cantidad = rng.randint(1, max_pruebas) if max_pruebas else 0
+    for id_prueba in range(1, cantidad + 1):
+        if estado_qa == 'Ok':
+            avance = 100
+        elif estado_qa is None:
+            avance = 0
+        else:
+            avance = rng.choice([0, 25, 50, 75, 100])
+        prueba = PlanPruebaQA(
+            workflow_id=id_workflow, id_prueba=id_prueba, prueba=f'{rng.choice(PRUEBAS)} {id_prueba}'[:80],
+            avance=avance, resultado=PlanPruebaQA.resultado_para_avance(avance)
+        )
+        if estado_qa == 'No Ok' and avance < 100 and rng.random() < 0.3:
+            prueba.resultado = 'No aprobado'
+        pruebas.append(prueba)
+
+    # A rejected QA needs at least one rejected test
+    if estado_qa == 'No Ok' and pruebas and not any(p.resultado == 'No aprobado' for p in pruebas):
+        pruebas[-1].avance = min(pruebas[-1].avance, 50)
+        pruebas[-1].resultado = 'No aprobado'
+    return pruebas
+
+
+def generar_workflow(seed, indice, id_workflow, nombres, hasta, dias, max_pruebas):
+    """
+    Build workflow number `indice` of the dataset, unsaved: (workflow, activities, tests).
+    The workflow starts up to `dias` days before `hasta`, and its history runs
+    until it is closed or cancelled or until the next activity would fall after `hasta`.
+    """
+    rng = random.Random(f'{seed}:{indice}')
+    fecha = hasta - timedelta(minutes=rng.randint(0, dias * 24 * 60))
+    jefe = rng.choice(nombres['Jefe de Proyecto'])
+    componente = rng.choice(COMPONENTES)
+    qa_estimado = fecha.date() + timedelta(days=rng.randint(15, 60))
+
+    workflow = Workflow(
+        id_workflow=id_workflow,
+        id_proyecto=f'PRJ-{rng.randrange(2000):04d}',
+        nom_proyecto=f'{rng.choice(PROYECTOS)} {componente}',
+        jefe_proyecto=jefe,
+        desc_proyecto=f'Workflow sintético {indice} del componente {componente}.',
+        componente=componente,
+        linea_base=f'LB-{componente}-{rng.randint(1, 999)}',
+        release=f'v{rng.randint(1, 9)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}',
+        creacion=fecha.date(),
+        qa_estimado=qa_estimado,
+        pap_estimado=qa_estimado + timedelta(days=rng.randint(5, 30)),
+    )
+
+    def actividad(usuario, estado_workflow, proceso, estado_proceso, texto, comentario=None):
+        return Actividad(
+            workflow_id=id_workflow, id_actividad=len(actividades) + 1, fecha=fecha, usuario=usuario,
+            estado_workflow=estado_workflow, proceso=proceso, estado_proceso=estado_proceso,
+            actividad=texto, comentario=comentario
+        )
+
+    actividades = []
+    actividades.append(actividad(jefe, 'Nuevo', None, None, 'Workflow creado satisfactoriamente'))
+    estado = {'workflow': 'Nuevo', **{proceso: None for proceso in PROCESOS}}
+
+    while estado['workflow'] not in ('Cancelado', 'Cerrado'):
+        fecha += timedelta(minutes=rng.randint(PAUSA_MIN, PAUSA_MAX))
+        if fecha > hasta:
+            break
+
+        accion, proceso, rol = _siguiente_paso(rng, estado)
+        usuario = jefe if rol == 'Jefe de Proyecto' else rng.choice(nombres[rol])
+        estado_workflow, proceso_registro, estado_proceso = registro_transicion(accion, proceso)
+        comentario = rng.choice(COMENTARIOS_RECHAZO) if comentario_obligatorio(accion, proceso) else None
+        actividades.append(actividad(
+            usuario, estado_workflow, proceso_registro, estado_proceso,
+            texto_actividad(accion, proceso, estado), comentario
+        ))
+
+        estado['workflow'] = estado_workflow
+        if proceso_registro in PROCESOS:
+            estado[proceso_registro] = estado_proceso
+        if (accion, proceso) == ('aprobar', 'RM Rev'):
+            workflow.codigo_rm = f'RM-{rng.randrange(1000000):06d}'
+
+    pruebas = _plan_pruebas(rng, id_workflow, estado['QA'], max_pruebas)
+    workflow.next_actividad = len(actividades) + 1
+    workflow.next_prueba = len(pruebas) + 1
+    return workflow, actividades, pruebas
+
+
+def generar_bloque(seed, inicio, fin, primer_id, nombres, hasta, dias, max_pruebas, batch_size):
+    """
+    Generate and insert workflows inicio..fin-1 (id_workflow primer_id + indice)
+    with their activities and tests, in one transaction.
+    Returns the (workflows, activities, tests) counts.
+    """
+    workflows, actividades, pruebas = [], [], []
+    for indice in range(inicio, fin):
+        workflow, actividades_workflow, pruebas_workflow = generar_workflow(
+            seed, indice, primer_id + indice, nombres, hasta, dias, max_pruebas
+        )
+        workflows.append(workflow)
+        actividades.extend(actividades_workflow)
+        pruebas.extend(pruebas_workflow)
+
+    with fechas_explicitas(), transaction.atomic():
+        Workflow.objects.bulk_create(workflows, batch_size=batch_size)
+        Actividad.objects.bulk_create(actividades, batch_size=batch_size)
+        PlanPruebaQA.objects.bulk_create(pruebas, batch_size=batch_size)
+    return len(workflows), len(actividades), len(pruebas)
+
+
+def _iniciar_trabajador():
+    """Worker processes started with spawn (macOS, Windows) need their own Django setup."""
+    django.setup()
+
+
+def _generar_bloque(argumentos):
+    return generar_bloque(*argumentos)
+
+
+def generar(workflows, usuarios_por_rol, hasta, dias=365, max_pruebas=20, seed=0,
+            workers=1, chunk_size=500, batch_size=1000, progreso=None, inicio=0):
+    """
+    Append a synthetic dataset to the database: the users, `workflows` workflows
+    with their activity histories and test plans, and then the WorkflowEstado
+    snapshots and role work queues rebuilt from the activity log.
+    Chunks of `chunk_size` workflows are generated by `workers` processes;
+    SQLite allows a single writer, so it always runs in this process.
+    `progreso`, if given, is called with the running totals after every chunk.
+    The workflows are numbers inicio..inicio+workflows-1 of the seed's sequence, so
+    a dataset grown in steps is the same as one generated at once.
+    Returns the (workflows, activities, tests) totals.
+    """
+    nombres = crear_usuarios(usuarios_por_rol)
+
+    # Explicit ids after every live and archived workflow, so chunks can be inserted in any order
+    primer_id = max(
+        Workflow.objects.aggregate(maximo=Max('pk'))['maximo'] or 0,
+        WorkflowArchivado.objects.aggregate(maximo=Max('pk'))['maximo'] or 0,
+    ) + 1 - inicio
+    bloques = [
+        (seed, desde, min(desde + chunk_size, inicio + workflows), primer_id, nombres, hasta, dias, max_pruebas, batch_size)
+        for desde in range(inicio, inicio + workflows, chunk_size)
+    ]
+
+    totales = [0, 0, 0]
+
+    def acumular(cantidades):
+        for i, cantidad in enumerate(cantidades):
+            totales[i] += cantidad
+        if progreso:
+            progreso(*totales)
+
+    if workers > 1 and connection.vendor != 'sqlite':
+        # Forked workers must not share the connections of this process
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_trabajador) as pool:
+            for cantidades in pool.map(_generar_bloque, bloques):
+                acumular(cantidades)
+    else:
+        for bloque in bloques:
+            acumular(generar_bloque(*bloque))
+
+    # Backends with sequences (PostgreSQL) must move past the explicit ids
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Workflow]):
+            cursor.execute(sql)
+
+    WorkflowEstado.reconstruir(batch_size=batch_size)
+    VersionDatos.incrementar()
+    return tuple(totales)
@@ -0,0 +1,117 @@
+"""
+In-process broker of the live dashboard events (Server-Sent Events).
+Every new Actividad publishes a compact change event once its transaction
+commits (see signals.py); each open `dashboard_events` stream holds a
+subscription with its own bounded queue.
+
+The broker lives in the memory of one process: events reach the streams
+served by the same process, so run the application through the ASGI entry
+point (workflowup/asgi.py) with a single worker process.
+"""
+import asyncio
+import threading
+
+# Events kept for a stream that is not reading; older ones are dropped
+SUSCRIPCION_MAX_EVENTOS = 100
+
+
+class Suscripcion:
+    """
+    Queue of pending events of one stream, bound to the event loop that reads it.
+    """
+
+    def __init__(self, loop, max_eventos=SUSCRIPCION_MAX_EVENTOS):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=max_eventos)
+
+    def entregar(self, evento):
+        """Queue an event, dropping the oldest one when the stream falls behind. Runs on self.loop."""
+        if self.cola.full():
+            self.cola.get_nowait()
+        self.cola.put_nowait(evento)
+
+    async def recibir(self, timeout=None):
+        """Next event, or None when `timeout` seconds pass without one."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except TimeoutError:
+            return None
+
+
+class Broker:
+    """
+    Fan-out of events to every subscription.
+    publicar() may be called from any thread: delivery is scheduled on the
+    event loop of each subscription.
+    """
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self):
+        """Open a subscription read from the running event loop."""
+        suscripcion = Suscripcion(asyncio.get_running_loop())
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def hay_suscripciones(self):
+        with self._lock:
+            return bool(self._suscripciones)
+
+    def publicar(self, evento):
+        """Deliver an event to every open subscription. Returns the number of subscriptions reached."""
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+
+        entregados = 0
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # The loop of the stream is closed: the stream is gone
+                self.cancelar(suscripcion)
+            else:
+                entregados += 1
+        return entregados
+
+
+broker = Broker()
+
+
+def evento_actividad(estado):
+    """
+    Change event of a workflow from its freshly updated WorkflowEstado snapshot:
+    the fields of the new latest activity and the {rol: proceso} pending review.
+    """
+    actividad = estado.actividad_workflow
+    return {
+        'id_workflow': actividad.workflow_id,
+        'jefe_proyecto': actividad.workflow.jefe_proyecto,
+        'estado_workflow': actividad.estado_workflow,
+        'proceso': actividad.proceso,
+        'estado_proceso': actividad.estado_proceso,
+        'pendientes': estado.get_procesos_pendientes(),
+    }
+
+
+def publicar_actividad(estado):
+    """
+    on_commit callback of a snapshot update: publish its change event. The event
+    is only built, which may load the activity and its workflow, when a stream
+    is open, and after the write transaction, so its queries never run inside it.
+    """
+    if broker.hay_suscripciones():
+        broker.publicar(evento_actividad(estado))
+
+
+def evento_visible(evento, usuario):
+    """A Jefe de Proyecto only follows their own workflows; the other roles follow all of them."""
+    if usuario.role == 'Jefe de Proyecto':
+        return evento['jefe_proyecto'] == usuario.username
+    return True
@@ -0,0 +1,134 @@
+"""
+Generation of background export jobs (TrabajoExportacion).
+The workflow id range of the filtered set is split into partitions written in
+parallel by a process pool; the partitions are then concatenated, in id order,
+into the final file stored under MEDIA_ROOT.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+from django.core.files import File
+from django.db import connections
+from django.db.models import Max, Min
+from django.http import QueryDict
+from django.utils import timezone
+
+from .reports import parse_admin_filters, get_filtered_workflows, iter_export_rows, iter_csv
+
+
+def _filtered_workflows(filtros):
+    """
+    Compile the filters stored on a job ({param: [values]}) exactly as the dashboard does.
+    """
+    params = QueryDict(mutable=True)
+    for nombre, valores in filtros.items():
+        params.setlist(nombre, valores)
+    return get_filtered_workflows(parse_admin_filters(params))
+
+
+def _rango_ids(workflows, archivados):
+    """
+    (lowest, highest) workflow id of the filtered set, or None when it is empty.
+    """
+    limites = [workflows.aggregate(desde=Min('pk'), hasta=Max('pk'))]
+    if archivados is not None:
+        limites.append(archivados.aggregate(desde=Min('pk'), hasta=Max('pk')))
+    limites = [limite for limite in limites if limite['desde'] is not None]
+    if not limites:
+        return None
+    return min(limite['desde'] for limite in limites), max(limite['hasta'] for limite in limites)
+
+
+def _particiones(desde, hasta, cantidad):
+    """
+    Split the id range [desde, hasta] into at most `cantidad` contiguous ranges.
+    """
+    paso = -(-(hasta - desde + 1) // cantidad)
+    return [(inicio, min(inicio + paso - 1, hasta)) for inicio in range(desde, hasta + 1, paso)]
+
+
+def _inicializar_proceso():
+    """
+    Pool initializer: make sure Django is set up in processes that were not forked.
+    """
+    django.setup()
+
+
+def generar_particion(filtros, desde, hasta, ruta):
+    """
+    Write the CSV lines, without header, of the filtered workflows with id in
+    [desde, hasta] to `ruta`. Runs in a pool process. Returns the number of rows.
+    """
+    workflows, archivados = _filtered_workflows(filtros)
+    workflows = workflows.filter(pk__range=(desde, hasta))
+    if archivados is not None:
+        archivados = archivados.filter(pk__range=(desde, hasta))
+
+    filas = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as destino:
+        for linea in iter_csv(iter_export_rows(workflows, archivados, por_workflow=True), encabezado=False):
+            destino.write(linea)
+            filas += 1
+    return filas
+
+
+def generar(trabajo, procesos=1):
+    """
+    Generate the file of a claimed job with up to `procesos` worker processes
+    and store it on the job. Rows are grouped by workflow, newest first within each one.
+    """
+    rango = _rango_ids(*_filtered_workflows(trabajo.filtros))
+    particiones = _particiones(*rango, procesos) if rango else []
+
+    with tempfile.TemporaryDirectory() as directorio:
+        tareas = [
+            (trabajo.filtros, desde, hasta, os.path.join(directorio, f'{numero}.csv'))
+            for numero, (desde, hasta) in enumerate(particiones)
+        ]
+
+        if procesos > 1 and len(tareas) > 1:
+            # Forked processes must not inherit open database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso) as pool:
+                filas = sum(pool.map(generar_particion, *zip(*tareas)))
+        else:
+            filas = sum(generar_particion(*tarea) for tarea in tareas)
+
+        ruta_final = os.path.join(directorio, 'exportacion')
+        abrir = gzip.open if trabajo.gzip else open
+        with abrir(ruta_final, 'wb') as destino:
+            # UTF-8 BOM and header, then the partitions in workflow id order
+            destino.write(''.join(iter_csv([])).encode('utf-8'))
+            for _, _, _, ruta in tareas:
+                with open(ruta, 'rb') as origen:
+                    shutil.copyfileobj(origen, destino)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        nombre = f'workflows_report_{timestamp}.csv' + ('.gz' if trabajo.gzip else '')
+        with open(ruta_final, 'rb') as archivo:
+            trabajo.archivo.save(nombre, File(archivo), save=False)
+
+    trabajo.filas = filas
+    trabajo.estado = 'Completado'
+    trabajo.finalizado = timezone.now()
+    trabajo.save()
+    return trabajo
+
+
+def procesar(trabajo, procesos=1):
+    """
+    Run a claimed job, recording the failure on the job instead of raising.
+    """
+    try:
+        return generar(trabajo, procesos=procesos)
+    except Exception as e:
+        trabajo.estado = 'Error'
+        trabajo.error = str(e)
+        trabajo.finalizado = timezone.now()
+        trabajo.save(update_fields=['estado', 'error', 'finalizado'])
+        return trabajo
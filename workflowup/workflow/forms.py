@@ -1,6 +1,9 @@
 """
 Forms for the workflow app.
 """
+import codecs
+import csv
+
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Workflow, PlanPruebaQA
@@ -94,6 +97,78 @@ class PlanPruebaCreateForm(forms.ModelForm):
         }
 
 
+class PlanPruebaImportForm(forms.Form):
+    """
+    Form for importing a test plan from a CSV or TSV file, one test per row.
+    The description is taken from the "prueba" column when the file has a
+    header row, otherwise from the first column. The file is validated in a
+    single streaming pass; cleaned_data['pruebas'] holds the descriptions.
+    """
+    MAX_FILAS = 1000
+    MAX_ERRORES = 10
+    ENCABEZADOS = ('prueba', 'descripcion', 'descripción')
+
+    archivo = forms.FileField(
+        label='Archivo CSV o TSV',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'mt-1 block w-full text-sm text-gray-700',
+            'accept': '.csv,.tsv,.txt,text/csv,text/tab-separated-values',
+        })
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        max_length = PlanPruebaQA._meta.get_field('prueba').max_length
+
+        lineas = codecs.iterdecode(archivo, 'utf-8-sig')
+        pruebas, errores = [], []
+        try:
+            primera = next(lineas, '')
+            delimitador = '\t' if '\t' in primera else (';' if ';' in primera and ',' not in primera else ',')
+            filas = csv.reader(_encadenar(primera, lineas), delimiter=delimitador)
+
+            columna = 0
+            for numero, fila in enumerate(filas, start=1):
+                celdas = [celda.strip() for celda in fila]
+                if numero == 1:
+                    encabezado = [celda.lower() for celda in celdas]
+                    columnas = [i for i, celda in enumerate(encabezado) if celda in self.ENCABEZADOS]
+                    if columnas:
+                        columna = columnas[0]
+                        continue
+                if not any(celdas):
+                    continue
+
+                descripcion = celdas[columna] if columna < len(celdas) else ''
+                if not descripcion:
+                    errores.append(f'Fila {numero}: la descripción de la prueba está vacía.')
+                elif len(descripcion) > max_length:
+                    errores.append(f'Fila {numero}: la descripción supera los {max_length} caracteres.')
+                else:
+                    pruebas.append(descripcion)
+
+                if len(errores) >= self.MAX_ERRORES:
+                    break
+                if len(pruebas) > self.MAX_FILAS:
+                    raise ValidationError(f'El archivo no puede tener más de {self.MAX_FILAS} pruebas.')
+        except (UnicodeDecodeError, csv.Error):
+            raise ValidationError('El archivo debe ser un CSV o TSV de texto en UTF-8.')
+
+        if errores:
+            raise ValidationError(errores)
+        if not pruebas:
+            raise ValidationError('El archivo no contiene pruebas.')
+
+        self.cleaned_data['pruebas'] = pruebas
+        return archivo
+
+
+def _encadenar(primera, lineas):
+    """Put back the line read ahead to detect the delimiter."""
+    yield primera
+    yield from lineas
+
+
 class ReleaseUpdateForm(forms.ModelForm):
     """
     Form for updating the release field of a workflow.
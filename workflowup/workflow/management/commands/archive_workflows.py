@@ -0,0 +1,41 @@
+"""
+Management command to move finished workflows to the archive tables.
+"""
+from django.core.management.base import BaseCommand
+
+from workflow.models import WorkflowArchivado
+
+
+class Command(BaseCommand):
+    help = 'Move Cerrado and Cancelado workflows, with their activities and QA tests, from the live tables to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=None,
+            help='Only archive workflows finished at least this many days ago (default: all finished workflows).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of workflows moved per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many workflows would be archived.'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            total = WorkflowArchivado.candidatos(options['older_than_days']).count()
+            self.stdout.write(f'{total} workflows would be archived.')
+            return
+
+        total = WorkflowArchivado.archivar(
+            antiguedad_dias=options['older_than_days'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{total} workflows archived.'))
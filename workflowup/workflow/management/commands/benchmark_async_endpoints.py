@@ -0,0 +1,154 @@
+"""
+Management command comparing the throughput of the dashboard API and the QA
+avance AJAX endpoint served through the WSGI handler (one thread per in-flight
+request) and through the ASGI handler (one event loop running the async views).
+"""
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from workflow.models import PlanPruebaQA
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the same requests to dashboard_api and qa_update_avance_ajax through the WSGI '
+        'handler (thread pool) and the ASGI handler (concurrent coroutines) at the same '
+        'concurrency, and report throughput and latency. Runs against the configured database '
+        'and rewrites the avance of one test with its current value.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Requests in flight at the same time (default: 20).'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per endpoint and mode (default: 200).'
+        )
+        parser.add_argument(
+            '--filtros',
+            default='',
+            help='Query string of the dashboard_api requests, e.g. "estado=Activo&componente=api".'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON.'
+        )
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(role='Administrador', is_active=True).first()
+        qa = User.objects.filter(role='QA', is_active=True).first()
+        prueba = PlanPruebaQA.objects.order_by('pk').first()
+        if admin is None or qa is None or prueba is None:
+            raise CommandError('An active Administrador, an active QA user and at least one PlanPruebaQA are required.')
+
+        escenarios = [
+            ('dashboard_api', admin, 'get', reverse('workflow:dashboard_api'), QueryDict(options['filtros'])),
+            ('qa_update_avance_ajax', qa, 'post',
+             reverse('workflow:qa_update_avance_ajax', args=[prueba.workflow_id, prueba.id_prueba]),
+             {'avance': prueba.avance}),
+        ]
+
+        # The test clients send Host: testserver, as under the test runner
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            resultados = self.medir(escenarios, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+
+        for fila in resultados:
+            self.stdout.write(
+                f"{fila['endpoint']:<24} {fila['modo']:<5} {fila['req_s']:>9.1f} req/s   "
+                f"p50 {fila['p50_ms']:>8.1f} ms   p95 {fila['p95_ms']:>8.1f} ms   errores {fila['errores']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['requests']} requests per endpoint and mode at concurrency {options['concurrency']}."
+        ))
+
+    def medir(self, escenarios, options):
+        """Results of every scenario under both handlers."""
+        resultados = []
+        for nombre, usuario, metodo, url, datos in escenarios:
+            # Warm-up request, so both modes measure the same (cached) dashboard path
+            cliente = Client()
+            cliente.force_login(usuario)
+            getattr(cliente, metodo)(url, datos)
+
+            for modo, medir in (('wsgi', self.medir_wsgi), ('asgi', self.medir_asgi)):
+                duracion, latencias, errores = medir(usuario, metodo, url, datos, options)
+                resultados.append(self.resumen(nombre, modo, duracion, latencias, errores))
+        return resultados
+
+    def medir_wsgi(self, usuario, metodo, url, datos, options):
+        """Each worker thread keeps its own logged-in client, as a threaded WSGI server would."""
+        def trabajador(cantidad):
+            cliente = Client()
+            cliente.force_login(usuario)
+            latencias, errores = [], 0
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                respuesta = getattr(cliente, metodo)(url, datos)
+                latencias.append(time.perf_counter() - inicio)
+                errores += respuesta.status_code != 200
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            partes = list(pool.map(trabajador, self.repartir(options)))
+        return time.perf_counter() - inicio, [l for latencias, _ in partes for l in latencias], sum(e for _, e in partes)
+
+    def medir_asgi(self, usuario, metodo, url, datos, options):
+        """All requests share one event loop; each coroutine keeps its own logged-in client."""
+        async def trabajador(cantidad):
+            cliente = AsyncClient()
+            await cliente.aforce_login(usuario)
+            latencias, errores = [], 0
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                respuesta = await getattr(cliente, metodo)(url, datos)
+                latencias.append(time.perf_counter() - inicio)
+                errores += respuesta.status_code != 200
+            return latencias, errores
+
+        async def todos():
+            return await asyncio.gather(*(trabajador(cantidad) for cantidad in self.repartir(options)))
+
+        inicio = time.perf_counter()
+        partes = asyncio.run(todos())
+        return time.perf_counter() - inicio, [l for latencias, _ in partes for l in latencias], sum(e for _, e in partes)
+
+    def repartir(self, options):
+        """Split the requests among the concurrent workers."""
+        base, resto = divmod(options['requests'], options['concurrency'])
+        return [base + (1 if i < resto else 0) for i in range(options['concurrency'])]
+
+    def resumen(self, endpoint, modo, duracion, latencias, errores):
+        latencias = sorted(latencias)
+        percentil = lambda p: latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000
+        return {
+            'endpoint': endpoint,
+            'modo': modo,
+            'req_s': len(latencias) / duracion if duracion else 0,
+            'p50_ms': statistics.median(latencias) * 1000 if latencias else 0,
+            'p95_ms': percentil(0.95) if latencias else 0,
+            'errores': errores,
+        }
@@ -0,0 +1,220 @@
+"""
+Management command measuring how the dashboards, detail views, CSV export and
+QA AJAX endpoints scale with the size of the data, and comparing the results
+with a stored baseline.
+"""
+import json
+import platform
+from datetime import datetime, time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from workflow.benchmark import comparar, medir, preparar_escenarios
+from workflow.dataset import generar
+from workflow.models import Workflow
+
+# Every alias in local memory: the run never reads or fills the shared file caches
+CACHES_AISLADAS = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+    for alias in settings.CACHES
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic datasets of increasing size (see generate_dataset) into a throwaway test '
+        'database and request every view as the role that uses it. Reports wall time percentiles, '
+        'SQL query count and time, peak memory and response size per view and size, optionally '
+        'writes them as JSON and compares them with a baseline file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='100,1000',
+            help='Comma separated dataset sizes, in workflows (default: 100,1000).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Measured requests per view and size (default: 20).'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Unmeasured requests before the measured ones (default: 2).'
+        )
+        parser.add_argument(
+            '--only',
+            default='',
+            help='Comma separated URL names or scenarios to run, e.g. "dashboard,workflow_detail_qa[QA]".'
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Keep the caches between requests (by default they are emptied before each one).'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the datasets (default: 0).'
+        )
+        parser.add_argument(
+            '--users-per-role',
+            type=int,
+            default=5,
+            help='Synthetic users created for each role (default: 5).'
+        )
+        parser.add_argument(
+            '--max-tests',
+            type=int,
+            default=20,
+            help='Maximum number of QA tests per workflow (default: 20).'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results as JSON to this file.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON file of an earlier run to compare with.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=25.0,
+            help='Percent a metric may grow over the baseline before it is a regression (default: 25).'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when the comparison finds a regression.'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON.'
+        )
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Seed into and measure the configured database instead of a throwaway test database.'
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Replace a leftover test database without asking.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = sorted({int(tamano) for tamano in options['sizes'].split(',') if tamano.strip()})
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers.')
+        if not tamanos or tamanos[0] < 1 or options['repeat'] < 1:
+            raise CommandError('--sizes must be positive and --repeat at least 1.')
+
+        base = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as archivo:
+                    base = json.load(archivo)['resultados']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read the baseline {options["baseline"]}: {e}')
+
+        # The test client sends Host: testserver, as under the test runner
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], CACHES=CACHES_AISLADAS):
+            if options['in_place']:
+                resultados = self.ejecutar(tamanos, options)
+            else:
+                nombre_original = connection.settings_dict['NAME']
+                connection.creation.create_test_db(
+                    verbosity=0, autoclobber=not options['interactive'], serialize=False
+                )
+                try:
+                    resultados = self.ejecutar(tamanos, options)
+                finally:
+                    connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        informe = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'base_de_datos': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'seed': options['seed'],
+                'repeticiones': options['repeat'],
+                'caches': 'warm' if options['warm'] else 'cold',
+            },
+            'resultados': resultados,
+        }
+        cambios = comparar(resultados, base, options['tolerance']) if base is not None else []
+        if base is not None:
+            informe['comparacion'] = cambios
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(informe))
+        else:
+            self.imprimir(resultados, cambios if base is not None else None)
+
+        regresiones = [cambio for cambio in cambios if cambio['regresion']]
+        if regresiones and options['fail_on_regression']:
+            raise CommandError(f'{len(regresiones)} regressions against {options["baseline"]}.')
+
+    def ejecutar(self, tamanos, options):
+        """Grow the dataset to each size in turn and measure every scenario on it."""
+        hasta = timezone.make_aware(datetime.combine(timezone.localdate(), time(23, 59)))
+        seleccion = {nombre.strip() for nombre in options['only'].split(',') if nombre.strip()}
+        resultados = []
+        for tamano in tamanos:
+            existentes = Workflow.objects.count()
+            if tamano > existentes:
+                # The seed's workflows existentes..tamano-1: each size extends the previous one
+                generar(
+                    tamano - existentes, options['users_per_role'], hasta,
+                    max_pruebas=options['max_tests'], seed=options['seed'], inicio=existentes,
+                )
+            workflows = Workflow.objects.count()
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Measuring with {workflows} workflows...')
+
+            for escenario in preparar_escenarios(seleccion):
+                fila = medir(escenario, options['repeat'], options['warmup'], frio=not options['warm'])
+                fila['workflows'] = workflows
+                resultados.append(fila)
+        return resultados
+
+    def imprimir(self, resultados, cambios):
+        for fila in resultados:
+            self.stdout.write(
+                f"{fila['escenario']:<40} {fila['workflows']:>7} wf  "
+                f"p50 {fila['p50_ms']:>9.1f} ms  p95 {fila['p95_ms']:>9.1f} ms  "
+                f"{fila['consultas']:>4} q {fila['sql_ms']:>8.1f} ms SQL  "
+                f"{fila['memoria_kb']:>9.1f} KB  {fila['bytes']:>9} B  {fila['status']}"
+            )
+        if cambios is None:
+            return
+
+        self.stdout.write('')
+        if not cambios:
+            self.stdout.write(self.style.SUCCESS('No changes beyond the tolerance against the baseline.'))
+        for cambio in cambios:
+            linea = (
+                f"{cambio['escenario']:<40} {cambio['workflows']:>7} wf  {cambio['metrica']:<10} "
+                f"{cambio['antes']} -> {cambio['despues']}"
+                + (f" ({cambio['cambio_pct']:+.1f}%)" if cambio['cambio_pct'] is not None else '')
+            )
+            self.stdout.write(self.style.ERROR(linea) if cambio['regresion'] else linea)
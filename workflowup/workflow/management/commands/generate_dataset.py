@@ -0,0 +1,103 @@
+"""
+Management command to fill the database with a synthetic dataset for capacity testing.
+"""
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from workflow.dataset import PASSWORD, generar
+
+
+class Command(BaseCommand):
+    help = (
+        'Append synthetic users, workflows, activity histories and QA test plans to the configured '
+        'database. Histories follow the workflow state machine (linea base, RM Rev, Diff Info, QA, '
+        'with rejections and re-requests). The same --seed and --until always produce the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workflows',
+            type=int,
+            default=10000,
+            help='Number of workflows to generate (default: 10000).'
+        )
+        parser.add_argument(
+            '--users-per-role',
+            type=int,
+            default=10,
+            help='Synthetic users created for each role (default: 10).'
+        )
+        parser.add_argument(
+            '--max-tests',
+            type=int,
+            default=20,
+            help='Maximum number of QA tests per workflow (default: 20).'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Workflows start within this many days before --until (default: 365).'
+        )
+        parser.add_argument(
+            '--until',
+            default=None,
+            help='Date of the end of the simulated period, YYYY-MM-DD (default: today).'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed (default: 0).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes inserting in parallel; ignored on SQLite (default: 1).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Workflows generated and inserted per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        if options['workflows'] < 0 or options['users_per_role'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workflows must be >= 0, and --users-per-role and --chunk-size >= 1.')
+
+        try:
+            hasta = datetime.strptime(options['until'], '%Y-%m-%d').date() if options['until'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--until must be a date in YYYY-MM-DD format.')
+        hasta = timezone.make_aware(datetime.combine(hasta, time(23, 59)))
+
+        def progreso(workflows, actividades, pruebas):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{workflows} workflows, {actividades} activities, {pruebas} tests...')
+
+        workflows, actividades, pruebas = generar(
+            options['workflows'],
+            options['users_per_role'],
+            hasta,
+            dias=options['days'],
+            max_pruebas=options['max_tests'],
+            seed=options['seed'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{workflows} workflows, {actividades} activities and {pruebas} QA tests generated; '
+            f'{options["users_per_role"]} users per role (password "{PASSWORD}").'
+        ))
@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the WorkflowEstado snapshot table from the activity log.
+"""
+from django.core.management.base import BaseCommand
+
+from workflow.models import WorkflowEstado
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the current-state snapshot (WorkflowEstado) of every workflow from its Actividad history, and the role work queues derived from it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of snapshots written per INSERT (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        total = WorkflowEstado.reconstruir(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} workflow snapshots and role work queues rebuilt.'))
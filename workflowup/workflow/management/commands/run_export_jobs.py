@@ -0,0 +1,48 @@
+"""
+Management command that runs the background CSV export jobs.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflow.exports import procesar
+from workflow.models import TrabajoExportacion
+
+
+class Command(BaseCommand):
+    help = 'Generate the pending CSV export jobs of the administrator dashboard, splitting each one across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes per job (default: number of CPUs).'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs pending now and exit instead of polling for new ones.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between checks for new jobs (default: 5).'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            trabajo = TrabajoExportacion.tomar_siguiente()
+            if trabajo is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            trabajo = procesar(trabajo, procesos=max(1, options['processes']))
+            if trabajo.estado == 'Completado':
+                self.stdout.write(self.style.SUCCESS(f'Export {trabajo.pk}: {trabajo.filas} rows written to {trabajo.archivo.name}.'))
+            else:
+                self.stderr.write(self.style.ERROR(f'Export {trabajo.pk} failed: {trabajo.error}'))
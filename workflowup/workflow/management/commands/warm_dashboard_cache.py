@@ -0,0 +1,28 @@
+"""
+Management command to precompute the administrator dashboard after a deploy.
+"""
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from workflow.reports import admin_dashboard_data, parse_admin_filters
+
+
+class Command(BaseCommand):
+    help = 'Fill the dashboard cache with the default (unfiltered) administrator dashboard for the current data version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivados',
+            action='store_true',
+            help='Also warm the unfiltered view that includes archived workflows.'
+        )
+
+    def handle(self, *args, **options):
+        vistas = [QueryDict()]
+        if options['archivados']:
+            vistas.append(QueryDict('archivados=1'))
+
+        for params in vistas:
+            datos = admin_dashboard_data(parse_admin_filters(params))
+            self.stdout.write(f"Cached {datos['stats']['total']} workflows, {len(datos['workflow_details'])} history rows ({params.urlencode() or 'no filters'}).")
+        self.stdout.write(self.style.SUCCESS('Dashboard cache warmed.'))
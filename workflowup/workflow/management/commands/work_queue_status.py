@@ -0,0 +1,39 @@
+"""
+Management command to report the depth and age of the role work queues.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from workflow.models import ColaTrabajo
+from workflow.transitions import ROLES_REVISORES
+
+
+class Command(BaseCommand):
+    help = 'Show pending items and oldest item age of the SCM, Release Manager and QA work queues.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the result as JSON (ages in seconds), for monitoring scripts.'
+        )
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        resumen = ColaTrabajo.resumen()
+
+        filas = []
+        for rol in ROLES_REVISORES:
+            datos = resumen.get(rol, {'pendientes': 0, 'mas_antiguo': None})
+            edad = (ahora - datos['mas_antiguo']).total_seconds() if datos['mas_antiguo'] else None
+            filas.append({'rol': rol, 'pendientes': datos['pendientes'], 'edad_mas_antiguo': edad})
+
+        if options['json']:
+            self.stdout.write(json.dumps(filas))
+            return
+
+        for fila in filas:
+            edad = f"{fila['edad_mas_antiguo'] / 3600:.1f} h" if fila['edad_mas_antiguo'] is not None else '-'
+            self.stdout.write(f"{fila['rol']:<16} pendientes: {fila['pendientes']:>6}   más antiguo: {edad}")
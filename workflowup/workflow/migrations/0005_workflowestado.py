@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2025-12-15 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+PROCESO_SNAPSHOT_FIELDS = {
+    'linea base': 'actividad_scm1_id',
+    'RM Rev': 'actividad_rm_id',
+    'Diff Info': 'actividad_scm2_id',
+    'QA': 'actividad_qa_id',
+}
+
+
+def populate_workflow_estado(apps, schema_editor):
+    """
+    Build the initial snapshot of every workflow from its activity history.
+    Activities are read oldest first, so the last one seen per proceso wins.
+    """
+    Actividad = apps.get_model('workflow', 'Actividad')
+    WorkflowEstado = apps.get_model('workflow', 'WorkflowEstado')
+
+    snapshots = {}
+    actividades = Actividad.objects.order_by('workflow_id', 'fecha', 'id_actividad').values_list(
+        'pk', 'workflow_id', 'proceso'
+    )
+    for pk, workflow_id, proceso in actividades.iterator(chunk_size=2000):
+        campos = snapshots.setdefault(workflow_id, {})
+        campos['actividad_workflow_id'] = pk
+        if proceso in PROCESO_SNAPSHOT_FIELDS:
+            campos[PROCESO_SNAPSHOT_FIELDS[proceso]] = pk
+
+    WorkflowEstado.objects.bulk_create(
+        [WorkflowEstado(workflow_id=workflow_id, **campos) for workflow_id, campos in snapshots.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0004_alter_planpruebaqa_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowEstado',
+            fields=[
+                ('workflow', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado', serialize=False, to='workflow.workflow', verbose_name='Workflow')),
+                ('actividad_qa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workflow.actividad', verbose_name='Última Actividad QA')),
+                ('actividad_rm', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workflow.actividad', verbose_name='Última Actividad RM Rev')),
+                ('actividad_scm1', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workflow.actividad', verbose_name='Última Actividad Línea Base')),
+                ('actividad_scm2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workflow.actividad', verbose_name='Última Actividad Diff Info')),
+                ('actividad_workflow', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workflow.actividad', verbose_name='Última Actividad')),
+            ],
+            options={
+                'verbose_name': 'Estado Workflow',
+                'verbose_name_plural': 'Estados Workflow',
+            },
+        ),
+        migrations.RunPython(populate_workflow_estado, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2025-12-15 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0005_workflowestado'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='actividad',
+            options={'verbose_name': 'Actividad', 'verbose_name_plural': 'Actividades'},
+        ),
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(fields=['workflow', '-fecha', '-id_actividad'], name='actividad_wf_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(fields=['workflow', 'proceso', '-fecha', '-id_actividad'], name='actividad_wf_proceso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(fields=['usuario'], name='actividad_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workflow',
+            index=models.Index(fields=['jefe_proyecto', '-creacion'], name='workflow_jefe_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workflow',
+            index=models.Index(fields=['jefe_proyecto', 'id_proyecto'], name='workflow_jefe_proyecto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workflow',
+            index=models.Index(fields=['-creacion'], name='workflow_creacion_idx'),
+        ),
+    ]
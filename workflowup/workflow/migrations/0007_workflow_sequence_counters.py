@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2025-12-15 16:40
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def initialize_sequence_counters(apps, schema_editor):
+    """
+    Set next_actividad / next_prueba of every workflow to its current maximum id + 1.
+    """
+    Workflow = apps.get_model('workflow', 'Workflow')
+    Actividad = apps.get_model('workflow', 'Actividad')
+    PlanPruebaQA = apps.get_model('workflow', 'PlanPruebaQA')
+
+    max_actividad = Actividad.objects.filter(
+        workflow=OuterRef('pk')
+    ).values('workflow').annotate(max_id=Max('id_actividad')).values('max_id')
+    max_prueba = PlanPruebaQA.objects.filter(
+        workflow=OuterRef('pk')
+    ).values('workflow').annotate(max_id=Max('id_prueba')).values('max_id')
+
+    Workflow.objects.update(
+        next_actividad=Coalesce(Subquery(max_actividad), 0) + 1,
+        next_prueba=Coalesce(Subquery(max_prueba), 0) + 1,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0006_activity_workflow_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflow',
+            name='next_actividad',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Siguiente ID Actividad'),
+        ),
+        migrations.AddField(
+            model_name='workflow',
+            name='next_prueba',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Siguiente ID Prueba'),
+        ),
+        migrations.RunPython(initialize_sequence_counters, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2025-12-16 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_colas_trabajo(apps, schema_editor):
+    """
+    Build the initial role work queues from the WorkflowEstado snapshots.
+    SCM reviews linea base before Diff Info; RM reviews RM Rev; QA reviews QA.
+    """
+    WorkflowEstado = apps.get_model('workflow', 'WorkflowEstado')
+    ColaTrabajo = apps.get_model('workflow', 'ColaTrabajo')
+
+    revisiones = [
+        ('SCM', [('linea base', 'actividad_scm1'), ('Diff Info', 'actividad_scm2')]),
+        ('Release Manager', [('RM Rev', 'actividad_rm')]),
+        ('QA', [('QA', 'actividad_qa')]),
+    ]
+
+    snapshots = WorkflowEstado.objects.select_related(
+        'actividad_scm1', 'actividad_rm', 'actividad_scm2', 'actividad_qa'
+    ).filter(actividad_workflow__estado_workflow='Activo')
+
+    items = []
+    for estado in snapshots.iterator(chunk_size=1000):
+        for rol, procesos in revisiones:
+            for proceso, campo in procesos:
+                actividad = getattr(estado, campo)
+                if actividad and actividad.estado_proceso == 'En Proceso':
+                    items.append(ColaTrabajo(
+                        workflow_id=estado.workflow_id, rol=rol, proceso=proceso, encolado=actividad.fecha
+                    ))
+                    break
+
+    ColaTrabajo.objects.bulk_create(items, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0007_workflow_sequence_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColaTrabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rol', models.CharField(max_length=20, verbose_name='Rol')),
+                ('proceso', models.CharField(choices=[('linea base', 'Línea Base'), ('RM Rev', 'Revisión RM'), ('Diff Info', 'Informe Diferencias'), ('QA', 'Pruebas QA')], max_length=20, verbose_name='Proceso')),
+                ('encolado', models.DateTimeField(verbose_name='Fecha Encolado')),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cola_trabajo', to='workflow.workflow', verbose_name='Workflow')),
+            ],
+            options={
+                'verbose_name': 'Cola de Trabajo',
+                'verbose_name_plural': 'Colas de Trabajo',
+                'ordering': ['encolado'],
+                'indexes': [models.Index(fields=['rol', 'encolado'], name='cola_rol_encolado_idx')],
+                'unique_together': {('workflow', 'rol')},
+            },
+        ),
+        migrations.RunPython(populate_colas_trabajo, reverse_code=migrations.RunPython.noop),
+    ]
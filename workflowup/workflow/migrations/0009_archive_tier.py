@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2025-12-16 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0008_colatrabajo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowArchivado',
+            fields=[
+                ('id_workflow', models.IntegerField(primary_key=True, serialize=False)),
+                ('id_proyecto', models.CharField(max_length=8, verbose_name='ID Proyecto')),
+                ('nom_proyecto', models.CharField(max_length=70, verbose_name='Nombre Proyecto')),
+                ('jefe_proyecto', models.CharField(max_length=15, verbose_name='Jefe de Proyecto')),
+                ('desc_proyecto', models.TextField(verbose_name='Descripción Proyecto')),
+                ('componente', models.CharField(max_length=30, verbose_name='Componente')),
+                ('linea_base', models.CharField(blank=True, max_length=80, null=True, verbose_name='Línea Base')),
+                ('codigo_rm', models.CharField(blank=True, max_length=9, null=True, verbose_name='Código RM')),
+                ('release', models.CharField(blank=True, max_length=80, null=True, verbose_name='Release')),
+                ('creacion', models.DateField(verbose_name='Fecha Creación')),
+                ('qa_estimado', models.DateField(verbose_name='QA Estimado')),
+                ('pap_estimado', models.DateField(verbose_name='PAP Estimado')),
+                ('archivado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha Archivado')),
+            ],
+            options={
+                'verbose_name': 'Workflow Archivado',
+                'verbose_name_plural': 'Workflows Archivados',
+                'ordering': ['-creacion'],
+                'indexes': [models.Index(fields=['-creacion'], name='wf_archivado_creacion_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlanPruebaQAArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_prueba', models.PositiveSmallIntegerField(verbose_name='ID Prueba')),
+                ('prueba', models.CharField(max_length=80, verbose_name='Prueba')),
+                ('avance', models.PositiveSmallIntegerField(default=0, verbose_name='Avance')),
+                ('resultado', models.CharField(max_length=20, verbose_name='Resultado')),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plan_pruebas', to='workflow.workflowarchivado', verbose_name='Workflow')),
+            ],
+            options={
+                'verbose_name': 'Plan de Prueba QA Archivado',
+                'verbose_name_plural': 'Planes de Prueba QA Archivados',
+                'ordering': ['id_prueba'],
+                'unique_together': {('workflow', 'id_prueba')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ActividadArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_actividad', models.PositiveIntegerField(verbose_name='ID Actividad')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha')),
+                ('usuario', models.CharField(max_length=15, verbose_name='Usuario')),
+                ('estado_workflow', models.CharField(blank=True, max_length=20, null=True, verbose_name='Estado Workflow')),
+                ('proceso', models.CharField(blank=True, max_length=20, null=True, verbose_name='Proceso')),
+                ('estado_proceso', models.CharField(blank=True, max_length=20, null=True, verbose_name='Estado Proceso')),
+                ('actividad', models.CharField(max_length=35, verbose_name='Actividad')),
+                ('comentario', models.CharField(blank=True, max_length=200, null=True, verbose_name='Comentario')),
+                ('workflow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actividades', to='workflow.workflowarchivado', verbose_name='Workflow')),
+            ],
+            options={
+                'verbose_name': 'Actividad Archivada',
+                'verbose_name_plural': 'Actividades Archivadas',
+                'indexes': [models.Index(fields=['workflow', '-fecha', '-id_actividad'], name='act_archivada_wf_fecha_idx')],
+                'unique_together': {('workflow', 'id_actividad')},
+            },
+        ),
+    ]
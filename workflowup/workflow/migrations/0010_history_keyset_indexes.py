@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2025-12-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0009_archive_tier'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(fields=['-fecha', 'workflow', '-id_actividad'], name='actividad_historial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actividadarchivada',
+            index=models.Index(fields=['-fecha', 'workflow', '-id_actividad'], name='act_archivada_historial_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2025-12-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0010_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario', models.CharField(max_length=15, verbose_name='Usuario')),
+                ('filtros', models.JSONField(default=dict, verbose_name='Filtros')),
+                ('gzip', models.BooleanField(default=False, verbose_name='Comprimido')),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('En Proceso', 'En Proceso'), ('Completado', 'Completado'), ('Error', 'Error')], default='Pendiente', max_length=20, verbose_name='Estado')),
+                ('archivo', models.FileField(blank=True, upload_to='exportaciones/', verbose_name='Archivo')),
+                ('filas', models.PositiveIntegerField(default=0, verbose_name='Filas')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('creado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha Creación')),
+                ('iniciado', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Inicio')),
+                ('finalizado', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Fin')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'creado'], name='exportacion_estado_idx')],
+            },
+        ),
+    ]
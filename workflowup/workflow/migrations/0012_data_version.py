@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2025-12-18 09:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0011_export_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionDatos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versión')),
+                ('modificado', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última Modificación')),
+            ],
+            options={
+                'verbose_name': 'Versión de Datos',
+                'verbose_name_plural': 'Versión de Datos',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2025-12-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0012_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflow',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
@@ -6,6 +9,39 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+class WorkflowQuerySet(models.QuerySet):
+    """
+    QuerySet with loaders for the latest-activity helpers of Workflow.
+    Either loader lets get_actividad_*() resolve without one query per call.
+    """
+
+    def with_latest_activities(self):
+        """
+        Load the WorkflowEstado snapshot and its latest activities in the same query.
+        Use this for lists of workflows: the number of queries stays constant.
+        """
+        return self.select_related(
+            'estado__actividad_workflow',
+            'estado__actividad_scm1',
+            'estado__actividad_rm',
+            'estado__actividad_scm2',
+            'estado__actividad_qa',
+        )
+
+    def with_actividades(self):
+        """
+        Prefetch the full activity history, newest first, into `actividades_ordenadas`.
+        Use this only when the history itself is needed in memory.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'actividades',
+                queryset=Actividad.objects.order_by('-fecha', '-id_actividad'),
+                to_attr='actividades_ordenadas'
+            )
+        )
+
+
 class Workflow(models.Model):
     """
     Main workflow model for managing software release workflows.
@@ -29,15 +65,45 @@ class Workflow(models.Model):
     creacion = models.DateField(auto_now_add=True, verbose_name='Fecha Creación')
     qa_estimado = models.DateField(verbose_name='QA Estimado')
     pap_estimado = models.DateField(verbose_name='PAP Estimado')
+    # Per-workflow sequence counters, advanced only by workflow.services
+    next_actividad = models.PositiveIntegerField(default=1, editable=False, verbose_name='Siguiente ID Actividad')
+    next_prueba = models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Siguiente ID Prueba')
+    # Bumped on every write to the workflow, its activities or its tests (see signals.py);
+    # keys the cached fragments of the detail pages
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Versión')
+
+    SEQUENCE_FIELDS = ('next_actividad', 'next_prueba', 'version')
+
+    objects = WorkflowQuerySet.as_manager()
 
     class Meta:
         ordering = ['-creacion']
+        indexes = [
+            # Jefe de Proyecto dashboard: own workflows, newest first
+            models.Index(fields=['jefe_proyecto', '-creacion'], name='workflow_jefe_creacion_idx'),
+            # Jefe de Proyecto dashboard: project filter and project dropdown
+            models.Index(fields=['jefe_proyecto', 'id_proyecto'], name='workflow_jefe_proyecto_idx'),
+            # Administrator dashboard: creation date range filter
+            models.Index(fields=['-creacion'], name='workflow_creacion_idx'),
+        ]
         verbose_name = 'Workflow'
         verbose_name_plural = 'Workflows'
 
     def __str__(self):
         return f"{self.id_workflow} - {self.nom_proyecto}"
 
+    def save(self, *args, **kwargs):
+        """
+        Override save so updates never write back the sequence counters or the version.
+        A stale in-memory value would otherwise rewind a counter advanced concurrently.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SEQUENCE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def clean(self):
         """
         Validate that pap_estimado > qa_estimado
@@ -57,25 +123,75 @@ class Workflow(models.Model):
                 })
 
     # Helper methods to get the latest activities
+    # Resolution order: prefetched history (with_actividades() or a plain
+    # prefetch_related('actividades')), then the WorkflowEstado snapshot
+    # (with_latest_activities()), and only then a query on the activity log.
+    def _get_actividades_prefetched(self):
+        """Get the prefetched activity history (newest first), or None if it was not prefetched"""
+        if hasattr(self, 'actividades_ordenadas'):
+            return self.actividades_ordenadas
+
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('actividades')
+        if prefetched is None:
+            return None
+
+        # Sort once and keep it, so every helper reuses the same list
+        self.actividades_ordenadas = sorted(
+            prefetched, key=lambda actividad: (actividad.fecha, actividad.id_actividad), reverse=True
+        )
+        return self.actividades_ordenadas
+
+    def _get_estado(self):
+        """Get the WorkflowEstado snapshot, or None if it does not exist"""
+        try:
+            return self.estado
+        except WorkflowEstado.DoesNotExist:
+            return None
+
+    def _get_ultima_actividad(self, campo, proceso=None):
+        """Resolve the latest activity from memory when possible, falling back to the log"""
+        actividades = self._get_actividades_prefetched()
+        if actividades is not None:
+            return next(
+                (actividad for actividad in actividades if proceso is None or actividad.proceso == proceso),
+                None
+            )
+
+        estado = self._get_estado()
+        if estado is not None:
+            return getattr(estado, campo)
+
+        actividades = self.actividades.all()
+        if proceso is not None:
+            actividades = actividades.filter(proceso=proceso)
+        return actividades.order_by('-fecha', '-id_actividad').first()
+
+    def get_historial(self):
+        """Get the complete activity history, newest first"""
+        actividades = self._get_actividades_prefetched()
+        if actividades is not None:
+            return actividades
+        return self.actividades.order_by('-fecha', '-id_actividad')
+
     def get_actividad_workflow(self):
         """Get the most recent general activity (latest by fecha)"""
-        return self.actividades.order_by('-fecha').first()
+        return self._get_ultima_actividad('actividad_workflow')
 
     def get_actividad_scm1(self):
         """Get the most recent 'linea base' activity"""
-        return self.actividades.filter(proceso='linea base').order_by('-fecha').first()
+        return self._get_ultima_actividad('actividad_scm1', 'linea base')
 
     def get_actividad_rm(self):
         """Get the most recent 'RM Rev' activity"""
-        return self.actividades.filter(proceso='RM Rev').order_by('-fecha').first()
+        return self._get_ultima_actividad('actividad_rm', 'RM Rev')
 
     def get_actividad_scm2(self):
         """Get the most recent 'Diff Info' activity"""
-        return self.actividades.filter(proceso='Diff Info').order_by('-fecha').first()
+        return self._get_ultima_actividad('actividad_scm2', 'Diff Info')
 
     def get_actividad_qa(self):
         """Get the most recent 'QA' activity"""
-        return self.actividades.filter(proceso='QA').order_by('-fecha').first()
+        return self._get_ultima_actividad('actividad_qa', 'QA')
 
 
 class PlanPruebaQA(models.Model):
@@ -120,6 +236,50 @@ class PlanPruebaQA(models.Model):
     def __str__(self):
         return f"{self.workflow.id_workflow} - Prueba {self.id_prueba}: {self.prueba}"
 
+    def save(self, *args, **kwargs):
+        """
+        Override save so new tests take their id_prueba from the workflow counter
+        (or move it past an explicit one), in the same transaction as the insert.
+        """
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        from .services import asignar_id
+
+        with transaction.atomic():
+            asignar_id(self, 'id_prueba', 'next_prueba')
+            super().save(*args, **kwargs)
+
+    # QA progress rules, shared by the single and the batch QA endpoints
+    @staticmethod
+    def resultado_para_avance(avance):
+        """resultado implied by an avance: 100 is 'Aprobado', above 0 'En proceso', 0 'No iniciado'"""
+        if avance == 100:
+            return 'Aprobado'
+        if avance > 0:
+            return 'En proceso'
+        return 'No iniciado'
+
+    def registrar_avance(self, avance):
+        """Set the avance and its implied resultado (not saved)"""
+        self.avance = avance
+        self.resultado = self.resultado_para_avance(avance)
+
+    def alternar_rechazo(self):
+        """
+        Toggle rechazar/reinyectar (not saved):
+        'No iniciado' or 'En proceso' become 'No aprobado';
+        'No aprobado' goes back to 'No iniciado' with avance 0.
+        Raises ValidationError for an approved test.
+        """
+        if self.resultado in ['No iniciado', 'En proceso']:
+            self.resultado = 'No aprobado'
+        elif self.resultado == 'No aprobado':
+            self.resultado = 'No iniciado'
+            self.avance = 0
+        else:
+            raise ValidationError('No se puede rechazar una prueba aprobada al 100%')
+
 
 class Actividad(models.Model):
     """
@@ -182,10 +342,632 @@ class Actividad(models.Model):
     comentario = models.CharField(max_length=200, blank=True, null=True, verbose_name='Comentario')
 
     class Meta:
-        ordering = ['-fecha']
+        # No default ordering: it would force a sort on every related-manager
+        # query. Callers order explicitly by ('-fecha', '-id_actividad'),
+        # which the indexes below serve without a filesort.
         unique_together = [['workflow', 'id_actividad']]
+        indexes = [
+            # Activity history and latest general activity of a workflow
+            models.Index(fields=['workflow', '-fecha', '-id_actividad'], name='actividad_wf_fecha_idx'),
+            # Latest activity of a workflow for a given proceso
+            models.Index(fields=['workflow', 'proceso', '-fecha', '-id_actividad'], name='actividad_wf_proceso_idx'),
+            # Administrator dashboard: usuario filter and usuario dropdown
+            models.Index(fields=['usuario'], name='actividad_usuario_idx'),
+            # Administrator history list: keyset pagination in display order
+            models.Index(fields=['-fecha', 'workflow', '-id_actividad'], name='actividad_historial_idx'),
+        ]
         verbose_name = 'Actividad'
         verbose_name_plural = 'Actividades'
 
     def __str__(self):
         return f"{self.workflow.id_workflow} - Actividad {self.id_actividad}: {self.actividad}"
+
+    def save(self, *args, **kwargs):
+        """
+        Override save to keep the WorkflowEstado snapshot in sync.
+        New activities take their id_actividad from the workflow counter (or move
+        it past an explicit one) and are written with the snapshot update in the
+        same transaction.
+        """
+        from .services import asignar_id
+
+        is_new = self._state.adding
+        with transaction.atomic():
+            if is_new:
+                asignar_id(self, 'id_actividad', 'next_actividad')
+            super().save(*args, **kwargs)
+            if is_new:
+                estado = WorkflowEstado.registrar_actividad(self)
+                # Keep an already loaded workflow instance consistent with the snapshot
+                if self._meta.get_field('workflow').is_cached(self):
+                    self.workflow.estado = estado
+
+
+# Snapshot field holding the latest activity of each proceso
+PROCESO_SNAPSHOT_FIELDS = {
+    'linea base': 'actividad_scm1',
+    'RM Rev': 'actividad_rm',
+    'Diff Info': 'actividad_scm2',
+    'QA': 'actividad_qa',
+}
+
+
+class WorkflowEstado(models.Model):
+    """
+    Current-state snapshot of a workflow.
+    Holds the latest general activity and the latest activity per proceso,
+    so dashboards and detail views do not need to scan the activity log.
+    Maintained by Actividad.save(); rebuild with `manage.py rebuild_workflow_estado`,
+    which also rebuilds the ColaTrabajo work queues derived from it.
+    """
+
+    workflow = models.OneToOneField(
+        Workflow,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estado',
+        verbose_name='Workflow'
+    )
+    actividad_workflow = models.ForeignKey(
+        Actividad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Última Actividad'
+    )
+    actividad_scm1 = models.ForeignKey(
+        Actividad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Última Actividad Línea Base'
+    )
+    actividad_rm = models.ForeignKey(
+        Actividad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Última Actividad RM Rev'
+    )
+    actividad_scm2 = models.ForeignKey(
+        Actividad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Última Actividad Diff Info'
+    )
+    actividad_qa = models.ForeignKey(
+        Actividad,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Última Actividad QA'
+    )
+
+    class Meta:
+        verbose_name = 'Estado Workflow'
+        verbose_name_plural = 'Estados Workflow'
+
+    def __str__(self):
+        return f"{self.workflow_id} - Estado"
+
+    def get_estado(self):
+        """State dict of the transition engine for this snapshot (see transitions.estado_actual)"""
+        from .transitions import construir_estado
+
+        return construir_estado(
+            self.actividad_workflow,
+            {proceso: getattr(self, campo) for proceso, campo in PROCESO_SNAPSHOT_FIELDS.items()}
+        )
+
+    def get_procesos_pendientes(self):
+        """{rol: proceso} of every reviewer role with pending work on this workflow"""
+        from .transitions import procesos_pendientes
+
+        return procesos_pendientes(self.get_estado())
+
+    def aplicar(self, actividad):
+        """
+        Point the general and the proceso field at a new activity, unless they
+        already hold a later one in history order (fecha, id_actividad): an
+        activity recorded with an older fecha must not hide the current state.
+        """
+        for campo in ('actividad_workflow', PROCESO_SNAPSHOT_FIELDS.get(actividad.proceso)):
+            if campo is None:
+                continue
+            actual = getattr(self, campo)
+            if actual is None or (actividad.fecha, actividad.id_actividad) >= (actual.fecha, actual.id_actividad):
+                setattr(self, campo, actividad)
+
+    @classmethod
+    def registrar_actividad(cls, actividad):
+        """
+        Point the snapshot of the activity's workflow at the new activity
+        and update the role work queues accordingly.
+        Must be called inside the transaction that inserted the activity.
+        """
+        estado = cls.objects.select_for_update().select_related(
+            *PROCESO_SNAPSHOT_FIELDS.values(), 'actividad_workflow'
+        ).filter(workflow_id=actividad.workflow_id).first()
+        is_new = estado is None
+        if is_new:
+            estado = cls(workflow_id=actividad.workflow_id)
+
+        pendientes_antes = estado.get_procesos_pendientes()
+        estado.aplicar(actividad)
+        estado.save(force_insert=is_new)
+
+        ColaTrabajo.sincronizar(
+            actividad.workflow_id, pendientes_antes, estado.get_procesos_pendientes(), actividad.fecha
+        )
+        return estado
+
+    @classmethod
+    def registrar_actividades(cls, actividades):
+        """
+        Bulk counterpart of registrar_actividad() for activities of distinct
+        workflows inserted with bulk_create (which calls no save()): one locking
+        read, one bulk write of the snapshots and one work-queue sync for all of them.
+        Must be called inside the transaction that inserted the activities.
+        Returns the snapshots, in the order of the activities.
+        """
+        existentes = cls.objects.select_for_update().select_related(
+            *PROCESO_SNAPSHOT_FIELDS.values(), 'actividad_workflow'
+        ).in_bulk([actividad.workflow_id for actividad in actividades])
+
+        estados, nuevos, cambios = [], [], []
+        for actividad in actividades:
+            estado = existentes.get(actividad.workflow_id)
+            if estado is None:
+                estado = cls(workflow_id=actividad.workflow_id)
+                nuevos.append(estado)
+
+            pendientes_antes = estado.get_procesos_pendientes()
+            estado.aplicar(actividad)
+            estados.append(estado)
+            cambios.append(
+                (actividad.workflow_id, pendientes_antes, estado.get_procesos_pendientes(), actividad.fecha)
+            )
+
+        cls.objects.bulk_create(nuevos)
+        cls.objects.bulk_update(
+            list(existentes.values()), ['actividad_workflow', *PROCESO_SNAPSHOT_FIELDS.values()]
+        )
+        ColaTrabajo.sincronizar_varios(cambios)
+        return estados
+
+    @classmethod
+    def reconstruir(cls, batch_size=1000):
+        """
+        Rebuild every snapshot from the Actividad history in a single pass.
+        Returns the number of snapshots written.
+        """
+        actividades = Actividad.objects.order_by(
+            'workflow_id', 'fecha', 'id_actividad'
+        ).values_list('pk', 'workflow_id', 'proceso').iterator(chunk_size=batch_size)
+
+        total = 0
+        pendientes = []
+        actual = None
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+
+            for pk, workflow_id, proceso in actividades:
+                if actual is None or actual.workflow_id != workflow_id:
+                    actual = cls(workflow_id=workflow_id)
+                    pendientes.append(actual)
+                    if len(pendientes) > batch_size:
+                        cls.objects.bulk_create(pendientes[:-1])
+                        total += len(pendientes) - 1
+                        pendientes = pendientes[-1:]
+
+                # Activities arrive oldest first, so the last one seen wins
+                actual.actividad_workflow_id = pk
+                campo_proceso = PROCESO_SNAPSHOT_FIELDS.get(proceso)
+                if campo_proceso:
+                    setattr(actual, f'{campo_proceso}_id', pk)
+
+            cls.objects.bulk_create(pendientes)
+            total += len(pendientes)
+
+            ColaTrabajo.reconstruir(batch_size=batch_size)
+
+        return total
+
+
+class ColaTrabajo(models.Model):
+    """
+    Work queue of the reviewer roles (SCM, Release Manager, QA).
+    One row per workflow and role while that role has a proceso pending
+    review, so each role dashboard is a single indexed query sorted by age.
+    Maintained from the WorkflowEstado snapshot on every Actividad insert.
+    """
+
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        related_name='cola_trabajo',
+        verbose_name='Workflow'
+    )
+    rol = models.CharField(max_length=20, verbose_name='Rol')
+    proceso = models.CharField(
+        max_length=20,
+        choices=Actividad.PROCESO_CHOICES,
+        verbose_name='Proceso'
+    )
+    encolado = models.DateTimeField(verbose_name='Fecha Encolado')
+
+    class Meta:
+        ordering = ['encolado']
+        unique_together = [['workflow', 'rol']]
+        indexes = [
+            # Role dashboards: pending items of a role, oldest first
+            models.Index(fields=['rol', 'encolado'], name='cola_rol_encolado_idx'),
+        ]
+        verbose_name = 'Cola de Trabajo'
+        verbose_name_plural = 'Colas de Trabajo'
+
+    def __str__(self):
+        return f"{self.rol} - {self.workflow_id} ({self.proceso})"
+
+    @classmethod
+    def sincronizar(cls, workflow_id, pendientes_antes, pendientes_despues, encolado):
+        """
+        Apply the difference between two {rol: proceso} pending sets of a workflow.
+        Roles whose pending proceso did not change keep their original enqueue time.
+        """
+        salientes = [rol for rol in pendientes_antes if rol not in pendientes_despues]
+        if salientes:
+            cls.objects.filter(workflow_id=workflow_id, rol__in=salientes).delete()
+
+        for rol, proceso in pendientes_despues.items():
+            if pendientes_antes.get(rol) != proceso:
+                cls.objects.update_or_create(
+                    workflow_id=workflow_id,
+                    rol=rol,
+                    defaults={'proceso': proceso, 'encolado': encolado}
+                )
+
+    @classmethod
+    def sincronizar_varios(cls, cambios):
+        """
+        Bulk counterpart of sincronizar() for several workflows.
+        cambios holds (workflow_id, pendientes_antes, pendientes_despues, encolado)
+        tuples; every row whose proceso changes is deleted in one query and the
+        new ones are inserted in one bulk_create.
+        """
+        salientes = models.Q()
+        entrantes = []
+        for workflow_id, pendientes_antes, pendientes_despues, encolado in cambios:
+            for rol in pendientes_antes.keys() | pendientes_despues.keys():
+                if pendientes_antes.get(rol) == pendientes_despues.get(rol):
+                    continue
+                salientes |= models.Q(workflow_id=workflow_id, rol=rol)
+                if rol in pendientes_despues:
+                    entrantes.append(cls(
+                        workflow_id=workflow_id, rol=rol, proceso=pendientes_despues[rol], encolado=encolado
+                    ))
+
+        if salientes:
+            cls.objects.filter(salientes).delete()
+        cls.objects.bulk_create(entrantes)
+
+    @classmethod
+    def reconstruir(cls, batch_size=1000):
+        """
+        Rebuild every queue from the WorkflowEstado snapshots.
+        Items are enqueued at the date of the activity that opened the pending proceso.
+        """
+        snapshots = WorkflowEstado.objects.select_related(
+            *PROCESO_SNAPSHOT_FIELDS.values(), 'actividad_workflow'
+        ).filter(actividad_workflow__estado_workflow='Activo')
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+
+            items = []
+            for estado in snapshots.iterator(chunk_size=batch_size):
+                for rol, proceso in estado.get_procesos_pendientes().items():
+                    actividad = getattr(estado, PROCESO_SNAPSHOT_FIELDS[proceso])
+                    items.append(cls(workflow_id=estado.workflow_id, rol=rol, proceso=proceso, encolado=actividad.fecha))
+                if len(items) >= batch_size:
+                    cls.objects.bulk_create(items)
+                    items = []
+            cls.objects.bulk_create(items)
+
+    @classmethod
+    def resumen(cls):
+        """
+        Queue depth and oldest enqueue time per role, in one grouped query.
+        Returns {rol: {'pendientes': int, 'mas_antiguo': datetime}}.
+        """
+        filas = cls.objects.order_by().values('rol').annotate(
+            pendientes=models.Count('pk'),
+            mas_antiguo=models.Min('encolado')
+        )
+        return {
+            fila['rol']: {'pendientes': fila['pendientes'], 'mas_antiguo': fila['mas_antiguo']}
+            for fila in filas
+        }
+
+
+# ============================================================================
+# ARCHIVE TIER
+# Closed and cancelled workflows are moved here by `manage.py archive_workflows`
+# so the live tables only hold active work. Rows keep their original ids.
+# ============================================================================
+
+ESTADOS_FINALES = ('Cerrado', 'Cancelado')
+
+
+class WorkflowArchivado(models.Model):
+    """
+    Archived copy of a finished (Cerrado or Cancelado) workflow.
+    """
+
+    id_workflow = models.IntegerField(primary_key=True)
+    id_proyecto = models.CharField(max_length=8, verbose_name='ID Proyecto')
+    nom_proyecto = models.CharField(max_length=70, verbose_name='Nombre Proyecto')
+    jefe_proyecto = models.CharField(max_length=15, verbose_name='Jefe de Proyecto')
+    desc_proyecto = models.TextField(verbose_name='Descripción Proyecto')
+    componente = models.CharField(max_length=30, verbose_name='Componente')
+    linea_base = models.CharField(max_length=80, blank=True, null=True, verbose_name='Línea Base')
+    codigo_rm = models.CharField(max_length=9, blank=True, null=True, verbose_name='Código RM')
+    release = models.CharField(max_length=80, blank=True, null=True, verbose_name='Release')
+    creacion = models.DateField(verbose_name='Fecha Creación')
+    qa_estimado = models.DateField(verbose_name='QA Estimado')
+    pap_estimado = models.DateField(verbose_name='PAP Estimado')
+    archivado = models.DateTimeField(auto_now_add=True, verbose_name='Fecha Archivado')
+
+    class Meta:
+        ordering = ['-creacion']
+        indexes = [
+            models.Index(fields=['-creacion'], name='wf_archivado_creacion_idx'),
+        ]
+        verbose_name = 'Workflow Archivado'
+        verbose_name_plural = 'Workflows Archivados'
+
+    def __str__(self):
+        return f"{self.id_workflow} - {self.nom_proyecto} (archivado)"
+
+    @classmethod
+    def candidatos(cls, antiguedad_dias=None):
+        """
+        Live workflows eligible for archiving: those whose latest activity
+        left them Cerrado or Cancelado, optionally at least `antiguedad_dias` ago.
+        """
+        candidatos = Workflow.objects.filter(
+            estado__actividad_workflow__estado_workflow__in=ESTADOS_FINALES
+        )
+        if antiguedad_dias is not None:
+            limite = timezone.now() - timedelta(days=antiguedad_dias)
+            candidatos = candidatos.filter(estado__actividad_workflow__fecha__lt=limite)
+        return candidatos.order_by('id_workflow')
+
+    @classmethod
+    def archivar(cls, antiguedad_dias=None, batch_size=500):
+        """
+        Move finished workflows, with their activities and QA tests, to the archive tables.
+        Each batch is copied and deleted in its own transaction, so an interrupted
+        run leaves every workflow either fully live or fully archived.
+        Returns the number of workflows archived.
+        """
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(cls.candidatos(antiguedad_dias).values_list('id_workflow', flat=True)[:batch_size])
+                if not ids:
+                    break
+
+                workflows = Workflow.objects.filter(id_workflow__in=ids).select_for_update()
+                cls.objects.bulk_create([
+                    cls(
+                        id_workflow=wf.id_workflow,
+                        id_proyecto=wf.id_proyecto,
+                        nom_proyecto=wf.nom_proyecto,
+                        jefe_proyecto=wf.jefe_proyecto,
+                        desc_proyecto=wf.desc_proyecto,
+                        componente=wf.componente,
+                        linea_base=wf.linea_base,
+                        codigo_rm=wf.codigo_rm,
+                        release=wf.release,
+                        creacion=wf.creacion,
+                        qa_estimado=wf.qa_estimado,
+                        pap_estimado=wf.pap_estimado,
+                    )
+                    for wf in workflows
+                ])
+                ActividadArchivada.objects.bulk_create([
+                    ActividadArchivada(
+                        workflow_id=act.workflow_id,
+                        id_actividad=act.id_actividad,
+                        fecha=act.fecha,
+                        usuario=act.usuario,
+                        estado_workflow=act.estado_workflow,
+                        proceso=act.proceso,
+                        estado_proceso=act.estado_proceso,
+                        actividad=act.actividad,
+                        comentario=act.comentario,
+                    )
+                    for act in Actividad.objects.filter(workflow_id__in=ids).order_by().iterator(chunk_size=batch_size)
+                ], batch_size=batch_size)
+                PlanPruebaQAArchivado.objects.bulk_create([
+                    PlanPruebaQAArchivado(
+                        workflow_id=prueba.workflow_id,
+                        id_prueba=prueba.id_prueba,
+                        prueba=prueba.prueba,
+                        avance=prueba.avance,
+                        resultado=prueba.resultado,
+                    )
+                    for prueba in PlanPruebaQA.objects.filter(workflow_id__in=ids).order_by()
+                ], batch_size=batch_size)
+
+                # Drop the snapshot first so deleting the activities does not
+                # have to null out its foreign keys row by row
+                WorkflowEstado.objects.filter(workflow_id__in=ids).delete()
+                Workflow.objects.filter(id_workflow__in=ids).delete()
+                transaction.on_commit(VersionDatos.incrementar)
+
+            total += len(ids)
+        return total
+
+
+class ActividadArchivada(models.Model):
+    """
+    Archived activity of a finished workflow.
+    """
+
+    workflow = models.ForeignKey(
+        WorkflowArchivado,
+        on_delete=models.CASCADE,
+        related_name='actividades',
+        verbose_name='Workflow'
+    )
+    id_actividad = models.PositiveIntegerField(verbose_name='ID Actividad')
+    fecha = models.DateTimeField(verbose_name='Fecha')
+    usuario = models.CharField(max_length=15, verbose_name='Usuario')
+    estado_workflow = models.CharField(max_length=20, null=True, blank=True, verbose_name='Estado Workflow')
+    proceso = models.CharField(max_length=20, null=True, blank=True, verbose_name='Proceso')
+    estado_proceso = models.CharField(max_length=20, null=True, blank=True, verbose_name='Estado Proceso')
+    actividad = models.CharField(max_length=35, verbose_name='Actividad')
+    comentario = models.CharField(max_length=200, blank=True, null=True, verbose_name='Comentario')
+
+    class Meta:
+        unique_together = [['workflow', 'id_actividad']]
+        indexes = [
+            models.Index(fields=['workflow', '-fecha', '-id_actividad'], name='act_archivada_wf_fecha_idx'),
+            models.Index(fields=['-fecha', 'workflow', '-id_actividad'], name='act_archivada_historial_idx'),
+        ]
+        verbose_name = 'Actividad Archivada'
+        verbose_name_plural = 'Actividades Archivadas'
+
+    def __str__(self):
+        return f"{self.workflow_id} - Actividad {self.id_actividad}: {self.actividad}"
+
+
+class PlanPruebaQAArchivado(models.Model):
+    """
+    Archived QA test of a finished workflow.
+    """
+
+    workflow = models.ForeignKey(
+        WorkflowArchivado,
+        on_delete=models.CASCADE,
+        related_name='plan_pruebas',
+        verbose_name='Workflow'
+    )
+    id_prueba = models.PositiveSmallIntegerField(verbose_name='ID Prueba')
+    prueba = models.CharField(max_length=80, verbose_name='Prueba')
+    avance = models.PositiveSmallIntegerField(default=0, verbose_name='Avance')
+    resultado = models.CharField(max_length=20, verbose_name='Resultado')
+
+    class Meta:
+        ordering = ['id_prueba']
+        unique_together = [['workflow', 'id_prueba']]
+        verbose_name = 'Plan de Prueba QA Archivado'
+        verbose_name_plural = 'Planes de Prueba QA Archivados'
+
+    def __str__(self):
+        return f"{self.workflow_id} - Prueba {self.id_prueba}: {self.prueba}"
+
+
+# ============================================================================
+# EXPORT JOBS
+# ============================================================================
+
+class TrabajoExportacion(models.Model):
+    """
+    Background CSV export of the administrator dashboard history.
+    Created from the dashboard with its current filters and generated by
+    `manage.py run_export_jobs`; the finished file is stored under MEDIA_ROOT.
+    """
+
+    ESTADO_CHOICES = [
+        ('Pendiente', 'Pendiente'),
+        ('En Proceso', 'En Proceso'),
+        ('Completado', 'Completado'),
+        ('Error', 'Error'),
+    ]
+
+    usuario = models.CharField(max_length=15, verbose_name='Usuario')  # username
+    filtros = models.JSONField(default=dict, verbose_name='Filtros')  # {param: [values]} of the dashboard form
+    gzip = models.BooleanField(default=False, verbose_name='Comprimido')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente', verbose_name='Estado')
+    archivo = models.FileField(upload_to='exportaciones/', blank=True, verbose_name='Archivo')
+    filas = models.PositiveIntegerField(default=0, verbose_name='Filas')
+    error = models.TextField(blank=True, verbose_name='Error')
+    creado = models.DateTimeField(auto_now_add=True, verbose_name='Fecha Creación')
+    iniciado = models.DateTimeField(null=True, blank=True, verbose_name='Fecha Inicio')
+    finalizado = models.DateTimeField(null=True, blank=True, verbose_name='Fecha Fin')
+
+    class Meta:
+        ordering = ['-creado']
+        indexes = [
+            # Worker: oldest pending job first
+            models.Index(fields=['estado', 'creado'], name='exportacion_estado_idx'),
+        ]
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+
+    def __str__(self):
+        return f"Exportación {self.pk} - {self.estado}"
+
+    @classmethod
+    def tomar_siguiente(cls):
+        """
+        Claim the oldest pending job for this worker, or return None.
+        The conditional UPDATE makes the claim safe with several workers running.
+        """
+        while True:
+            pk = cls.objects.filter(estado='Pendiente').order_by('creado', 'pk').values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            if cls.objects.filter(pk=pk, estado='Pendiente').update(estado='En Proceso', iniciado=timezone.now()):
+                return cls.objects.get(pk=pk)
+
+
+# ============================================================================
+# DATA VERSION
+# ============================================================================
+
+class VersionDatos(models.Model):
+    """
+    Global version of the workflow data: a single row bumped after every
+    committed write to Workflow, Actividad or PlanPruebaQA (see signals.py).
+    Dashboards use it as a cheap validator for conditional GET.
+    """
+
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Versión')
+    modificado = models.DateTimeField(default=timezone.now, verbose_name='Última Modificación')
+
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versión de Datos'
+
+    def __str__(self):
+        return f"Versión {self.version}"
+
+    @classmethod
+    def actual(cls):
+        """Current version row, created on first use."""
+        version, _ = cls.objects.get_or_create(pk=1)
+        return version
+
+    @classmethod
+    async def aactual(cls):
+        """Async version of actual()."""
+        version, _ = await cls.objects.aget_or_create(pk=1)
+        return version
+
+    @classmethod
+    def incrementar(cls):
+        """Bump the version with a single UPDATE."""
+        ahora = timezone.now()
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1, modificado=ahora):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1, 'modificado': ahora})
@@ -0,0 +1,195 @@
+"""
+Detection of N+1 query patterns.
+
+While a request (NPlusOneMiddleware) or a detectar() block runs, every query
+is counted by its shape, the SQL with literals and IN lists normalized, and by
+its call site, the innermost frames of project code that issued it. A shape
+repeated from the same call site more than NPLUSONE_THRESHOLD times is the
+signature of a loop doing one query per row, e.g.
+
+    for workflow in workflows:
+        workflow.get_actividad_workflow()
+
+and is logged or, with NPLUSONE = 'raise', raised as ConsultasRepetidas with
+the call site, so a test exercising the view fails.
+
+Queries of async views are counted too; ORM calls awaited directly in the
+view run in a worker thread without the view on its stack, so their call
+site is the nearest project frame, if any.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('off', 'log', 'raise')
+# Project frames kept as the call site of a query
+PROFUNDIDAD = 3
+# Transaction control repeats by design
+IGNORADAS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTAS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+# Detector of the request or block being checked in this context, or None
+_detector = ContextVar('detector', default=None)
+
+
+class ConsultasRepetidas(Exception):
+    """The same query was issued from the same place too many times."""
+
+
+def normalizar(sql):
+    """Shape of a query: literals as ?, IN lists of any length as (...), single spaces."""
+    forma = _CADENAS.sub('?', sql)
+    forma = _NUMEROS.sub('?', forma)
+    forma = _LISTAS.sub('(...)', forma)
+    return _ESPACIOS.sub(' ', forma).strip()
+
+
+def _raiz():
+    return os.path.join(str(settings.BASE_DIR), '')
+
+
+def lugar(raiz):
+    """
+    Call site of the running query: (path, line, function) of the innermost
+    PROFUNDIDAD frames under the project root, outside installed packages.
+    """
+    lugares = []
+    # Skip the execute wrappers (this module's, timing's...): start from the cursor running them
+    marco = inicio = sys._getframe(1)
+    while marco is not None and marco.f_code.co_name != '_execute_with_wrappers':
+        marco = marco.f_back
+    marco = marco or inicio
+    while marco is not None and len(lugares) < PROFUNDIDAD:
+        archivo = marco.f_code.co_filename
+        if archivo.startswith(raiz) and 'site-packages' not in archivo:
+            lugares.append((os.path.relpath(archivo, raiz), marco.f_lineno, marco.f_code.co_name))
+        marco = marco.f_back
+    return tuple(lugares)
+
+
+class Detector:
+    """Queries of one request or block, by shape and call site."""
+
+    def __init__(self, umbral):
+        self.umbral = umbral
+        self.raiz = _raiz()
+        self.conteo = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        forma = normalizar(sql)
+        if not forma.upper().startswith(IGNORADAS):
+            self.conteo[forma, lugar(self.raiz)] += 1
+        return execute(sql, params, many, context)
+
+    def repetidas(self):
+        """[(shape, call site, times)] over the threshold, most repeated first."""
+        return sorted(
+            ((forma, sitio, veces) for (forma, sitio), veces in self.conteo.items() if veces > self.umbral),
+            key=lambda repetida: -repetida[2]
+        )
+
+    def informe(self, descripcion=''):
+        lineas = [f'Repeated queries{" in " + descripcion if descripcion else ""} '
+                  f'(more than {self.umbral} times from the same place):']
+        for forma, sitio, veces in self.repetidas():
+            origen = ' <- '.join(f'{archivo}:{linea} in {funcion}' for archivo, linea, funcion in sitio)
+            lineas.append(f'  {veces}x at {origen or "(no project frame)"}')
+            lineas.append(f'      {forma}')
+        return '\n'.join(lineas)
+
+
+def _detectar_consulta(execute, sql, params, many, context):
+    """Execute wrapper of every connection, passing the query to the active detector."""
+    detector = _detector.get()
+    if detector is None:
+        return execute(sql, params, many, context)
+    return detector(execute, sql, params, many, context)
+
+
+def _instalar(sender, connection, **kwargs):
+    """First in the connection's execute wrappers, like timing._instalar."""
+    if _detectar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _detectar_consulta)
+
+
+def vigilar_conexiones():
+    """Check the queries of every connection opened from now on (from WorkflowConfig.ready)."""
+    connection_created.connect(_instalar)
+
+
+@contextmanager
+def detectar(umbral=None, modo='raise', descripcion=''):
+    """
+    Check the queries run inside the block, e.g. in a test:
+
+        with nplusone.detectar():
+            self.client.get(url)
+
+    On leaving it, shapes repeated more than `umbral` times (default
+    NPLUSONE_THRESHOLD) from the same call site are logged, or raised as
+    ConsultasRepetidas with modo='raise'. Yields the Detector.
+    """
+    if modo not in MODOS:
+        raise ImproperlyConfigured(f'NPLUSONE must be one of {", ".join(MODOS)}, not {modo!r}.')
+    for conexion in connections.all(initialized_only=True):
+        _instalar(None, conexion)
+
+    detector = Detector(umbral if umbral is not None else getattr(settings, 'NPLUSONE_THRESHOLD', 5))
+    token = _detector.set(detector)
+    try:
+        yield detector
+    finally:
+        _detector.reset(token)
+
+    if modo != 'off' and detector.repetidas():
+        informe = detector.informe(descripcion)
+        if modo == 'raise':
+            raise ConsultasRepetidas(informe)
+        logger.warning(informe)
+
+
+class NPlusOneMiddleware:
+    """
+    Check every request for repeated queries, as set by NPLUSONE ('off', 'log'
+    or 'raise') and NPLUSONE_THRESHOLD. Queries run while a streamed response is
+    being sent are not checked.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.modo = getattr(settings, 'NPLUSONE', 'off')
+        if self.modo not in MODOS:
+            raise ImproperlyConfigured(f'NPLUSONE must be one of {", ".join(MODOS)}, not {self.modo!r}.')
+        if self.modo == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with detectar(modo=self.modo, descripcion=f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with detectar(modo=self.modo, descripcion=f'{request.method} {request.path}'):
+            return await self.get_response(request)
@@ -0,0 +1,523 @@
+"""
+Administrator reporting queries shared by the dashboard views, the export worker
+and the cache warm-up command: filter compilation, stats and matrix aggregation,
+the paginated activity history and the CSV row stream.
+"""
+import csv
+import hashlib
+import heapq
+import zlib
+from datetime import datetime
+
+from django.core.cache import caches
+from django.db.models import Q, F, Count, OuterRef, Subquery
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+from .models import Workflow, Actividad, WorkflowArchivado, ActividadArchivada, VersionDatos
+
+
+def parse_admin_filters(params):
+    """
+    Read the administrator dashboard filters from a QueryDict (request.GET), once per request.
+    estado and usuario accept several values (?estado=Nuevo&estado=Activo).
+    Malformed dates are ignored, as before.
+    """
+    def fecha(nombre):
+        valor = params.get(nombre, '').strip()
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        except ValueError:
+            return None
+
+    def valores(nombre):
+        return [valor.strip() for valor in params.getlist(nombre) if valor.strip()]
+
+    return {
+        'fecha_desde': fecha('fecha_desde'),
+        'fecha_hasta': fecha('fecha_hasta'),
+        'estados': valores('estado'),
+        'usuarios': valores('usuario'),
+        'id_proyecto': params.get('id_proyecto', '').strip(),
+        'nom_proyecto': params.get('nom_proyecto', '').strip(),
+        'componente': params.get('componente', '').strip(),
+        # The archive tables are only queried when this is set
+        'archivados': params.get('archivados', '') == '1',
+    }
+
+
+def admin_filter_q(filtros, estado_lookup, usuario_lookup):
+    """
+    Build the Q object of the administrator filters.
+    estado_lookup and usuario_lookup point at the latest activity of the workflow.
+    """
+    q = Q()
+    if filtros['fecha_desde']:
+        q &= Q(creacion__gte=filtros['fecha_desde'])
+    if filtros['fecha_hasta']:
+        q &= Q(creacion__lte=filtros['fecha_hasta'])
+    if filtros['estados']:
+        q &= Q(**{f'{estado_lookup}__in': filtros['estados']})
+    if filtros['usuarios']:
+        q &= Q(**{f'{usuario_lookup}__in': filtros['usuarios']})
+    if filtros['id_proyecto']:
+        q &= Q(id_proyecto__icontains=filtros['id_proyecto'])
+    if filtros['nom_proyecto']:
+        q &= Q(nom_proyecto__icontains=filtros['nom_proyecto'])
+    if filtros['componente']:
+        q &= Q(componente__icontains=filtros['componente'])
+    return q
+
+
+def get_filtered_workflows(filtros):
+    """
+    Compile the administrator filters into querysets.
+    Returns (workflows, archivados): the live workflows matching the filters and the
+    matching archived workflows annotated with their latest activity, or None when
+    the archive was not requested.
+    """
+    workflows = Workflow.objects.filter(
+        admin_filter_q(filtros, 'estado__actividad_workflow__estado_workflow', 'estado__actividad_workflow__usuario'),
+        estado__actividad_workflow__isnull=False
+    )
+
+    archivados = None
+    if filtros['archivados']:
+        ultima_actividad = ActividadArchivada.objects.filter(
+            workflow=OuterRef('pk')
+        ).order_by('-fecha', '-id_actividad')
+        archivados = WorkflowArchivado.objects.annotate(
+            ultima_actividad_id=Subquery(ultima_actividad.values('pk')[:1]),
+            ultimo_estado_workflow=Subquery(ultima_actividad.values('estado_workflow')[:1]),
+            ultimo_usuario=Subquery(ultima_actividad.values('usuario')[:1]),
+            ultimo_proceso=Subquery(ultima_actividad.values('proceso')[:1]),
+            ultimo_estado_proceso=Subquery(ultima_actividad.values('estado_proceso')[:1]),
+        ).filter(
+            admin_filter_q(filtros, 'ultimo_estado_workflow', 'ultimo_usuario'),
+            ultima_actividad_id__isnull=False
+        )
+
+    return workflows, archivados
+
+
+def history_querysets(workflows, archivados=None):
+    """
+    Activity querysets (live, then archived) of the filtered workflows.
+    The workflow filter stays in SQL as a subquery.
+    """
+    querysets = [Actividad.objects.filter(workflow__in=workflows.values('pk'))]
+    if archivados is not None:
+        querysets.append(ActividadArchivada.objects.filter(workflow__in=archivados.values('pk')))
+    return querysets
+
+
+# Latest-activity lookups of each tier, as built by get_filtered_workflows
+_LIVE_LATEST = {
+    'estado_workflow': 'estado__actividad_workflow__estado_workflow',
+    'proceso': 'estado__actividad_workflow__proceso',
+    'estado_proceso': 'estado__actividad_workflow__estado_proceso',
+}
+_ARCHIVED_LATEST = {
+    'estado_workflow': 'ultimo_estado_workflow',
+    'proceso': 'ultimo_proceso',
+    'estado_proceso': 'ultimo_estado_proceso',
+}
+
+
+def _tiers(workflows, archivados):
+    """
+    (queryset, latest-activity lookups) of every tier included in the request.
+    """
+    tiers = [(workflows, _LIVE_LATEST)]
+    if archivados is not None:
+        tiers.append((archivados, _ARCHIVED_LATEST))
+    return tiers
+
+
+# The stats, matrix and history below are split into the queries to run and the
+# shaping of their results, shared by the sync functions and their async
+# counterparts (prefixed with `a`) used by the async dashboard API.
+
+def _stats_queries(workflows, archivados):
+    """
+    (queryset, aggregate expressions) of every tier for the summary cards.
+    """
+    for queryset, latest in _tiers(workflows, archivados):
+        estado = latest['estado_workflow']
+        yield queryset.order_by(), {
+            'total': Count('pk'),
+            'nuevo': Count('pk', filter=Q(**{estado: 'Nuevo'})),
+            'activo': Count('pk', filter=Q(**{estado: 'Activo'})),
+            'cerrado': Count('pk', filter=Q(**{estado: 'Cerrado'})),
+            'cancelado': Count('pk', filter=Q(**{estado: 'Cancelado'})),
+        }
+
+
+def _sum_stats(tier_counts):
+    stats = {'total': 0, 'nuevo': 0, 'activo': 0, 'cerrado': 0, 'cancelado': 0}
+    for counts in tier_counts:
+        for key, value in counts.items():
+            stats[key] += value
+    return stats
+
+
+def calculate_workflow_stats(workflows, archivados=None):
+    """
+    Calculate statistics for summary cards.
+    Returns dict with counts for each workflow state, from one aggregate query per tier.
+    """
+    return _sum_stats(
+        queryset.aggregate(**aggregates) for queryset, aggregates in _stats_queries(workflows, archivados)
+    )
+
+
+async def acalculate_workflow_stats(workflows, archivados=None):
+    """Async version of calculate_workflow_stats."""
+    return _sum_stats([
+        await queryset.aaggregate(**aggregates) for queryset, aggregates in _stats_queries(workflows, archivados)
+    ])
+
+
+# Process/state combinations of the matrix
+MATRIX_PROCESOS = ['linea base', 'RM Rev', 'Diff Info', 'QA']
+MATRIX_ESTADOS_PROCESO = ['En Proceso', 'Ok', 'No Ok']
+
+
+def _matrix_queries(workflows, archivados):
+    """
+    Grouped (proceso, estado_proceso, cantidad) query of every tier for the matrix.
+    """
+    for queryset, latest in _tiers(workflows, archivados):
+        yield queryset.order_by().filter(**{
+            f"{latest['proceso']}__in": MATRIX_PROCESOS,
+            f"{latest['estado_proceso']}__in": MATRIX_ESTADOS_PROCESO,
+        }).values(
+            proceso_actual=F(latest['proceso']),
+            estado_proceso_actual=F(latest['estado_proceso'])
+        ).annotate(cantidad=Count('pk'))
+
+
+def _empty_matrix():
+    return {proceso: {estado: 0 for estado in MATRIX_ESTADOS_PROCESO} for proceso in MATRIX_PROCESOS}
+
+
+def calculate_process_state_matrix(workflows, archivados=None):
+    """
+    Calculate process/state matrix showing count of workflows in each combination.
+    Returns a dict with process as keys, and estado_proceso counts as values,
+    from one grouped query per tier.
+    """
+    matrix = _empty_matrix()
+    for filas in _matrix_queries(workflows, archivados):
+        for fila in filas:
+            matrix[fila['proceso_actual']][fila['estado_proceso_actual']] += fila['cantidad']
+    return matrix
+
+
+async def acalculate_process_state_matrix(workflows, archivados=None):
+    """Async version of calculate_process_state_matrix."""
+    matrix = _empty_matrix()
+    for filas in _matrix_queries(workflows, archivados):
+        async for fila in filas:
+            matrix[fila['proceso_actual']][fila['estado_proceso_actual']] += fila['cantidad']
+    return matrix
+
+
+# Activities per page of the administrator history list
+HISTORIAL_PAGE_SIZE = 100
+
+
+def encode_historial_cursor(activity):
+    """
+    Encode the position of an activity in the history order as an opaque cursor.
+    """
+    clave = f'{activity.fecha.isoformat()}|{activity.workflow_id}|{activity.id_actividad}'
+    return urlsafe_base64_encode(clave.encode('utf-8'))
+
+
+def decode_historial_cursor(cursor):
+    """
+    Decode a cursor built by encode_historial_cursor into (fecha, workflow_id, id_actividad).
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        fecha, workflow_id, id_actividad = urlsafe_base64_decode(cursor).decode('utf-8').split('|')
+        return datetime.fromisoformat(fecha), int(workflow_id), int(id_actividad)
+    except (TypeError, UnicodeDecodeError, ValueError):
+        raise ValueError('Cursor inválido')
+
+
+def _historial_after(queryset, cursor):
+    """
+    Keyset filter: activities that come after the cursor in the history order
+    (-fecha, workflow_id, -id_actividad).
+    """
+    fecha, workflow_id, id_actividad = cursor
+    return queryset.filter(
+        Q(fecha__lt=fecha) |
+        Q(fecha=fecha, workflow_id__gt=workflow_id) |
+        Q(fecha=fecha, workflow_id=workflow_id, id_actividad__lt=id_actividad)
+    )
+
+
+def count_workflow_details(workflows, archivados=None):
+    """
+    Total number of history rows of the filtered workflows, counted in SQL.
+    """
+    return sum(queryset.count() for queryset in history_querysets(workflows, archivados))
+
+
+async def acount_workflow_details(workflows, archivados=None):
+    """Async version of count_workflow_details."""
+    return sum([await queryset.acount() for queryset in history_querysets(workflows, archivados)])
+
+
+def _historial_page_querysets(workflows, archivados, cursor, limit):
+    """
+    Query of one history page per tier. One extra row per tier tells whether
+    there is a next page.
+    """
+    querysets = []
+    for queryset in history_querysets(workflows, archivados):
+        queryset = queryset.select_related('workflow').order_by('-fecha', 'workflow_id', '-id_actividad')
+        if cursor is not None:
+            queryset = _historial_after(queryset, cursor)
+        if limit is not None:
+            queryset = queryset[:limit + 1]
+        querysets.append(queryset)
+    return querysets
+
+
+def prepare_workflow_details(workflows, archivados=None, cursor=None, limit=None):
+    """
+    Prepare the historical activity list for display, one page at a time.
+    Returns ALL activities from the filtered workflows, not just the latest one,
+    ordered newest first and paginated by keyset on (fecha, workflow_id, id_actividad).
+
+    Returns (details, next_cursor). next_cursor is None on the last page;
+    without a limit the complete history is returned in a single page.
+    """
+    querysets = _historial_page_querysets(workflows, archivados, cursor, limit)
+    all_activities = []
+    for queryset in querysets:
+        all_activities.extend(queryset)
+    return _historial_page(all_activities, len(querysets) > 1, limit)
+
+
+async def aprepare_workflow_details(workflows, archivados=None, cursor=None, limit=None):
+    """Async version of prepare_workflow_details."""
+    querysets = _historial_page_querysets(workflows, archivados, cursor, limit)
+    all_activities = []
+    for queryset in querysets:
+        all_activities.extend([activity async for activity in queryset])
+    return _historial_page(all_activities, len(querysets) > 1, limit)
+
+
+def _historial_page(all_activities, varios_tiers, limit):
+    """
+    Merge the rows read from every tier into one page: (details, next_cursor).
+    """
+    if varios_tiers:
+        # Same order as the SQL: newest first, then workflow, then newest id
+        all_activities.sort(key=lambda activity: (activity.workflow_id, -activity.id_actividad))
+        all_activities.sort(key=lambda activity: activity.fecha, reverse=True)
+
+    next_cursor = None
+    if limit is not None and len(all_activities) > limit:
+        all_activities = all_activities[:limit]
+        next_cursor = encode_historial_cursor(all_activities[-1])
+
+    # Prepare details list with the activities of this page
+    details = []
+    for activity in all_activities:
+        details.append({
+            'id_workflow': activity.workflow.id_workflow,
+            'nom_proyecto': activity.workflow.nom_proyecto,
+            'componente': activity.workflow.componente or '',
+            'id_proyecto': activity.workflow.id_proyecto,
+            'estado_workflow': activity.estado_workflow,
+            'proceso': activity.proceso or 'N/A',
+            'estado_proceso': activity.estado_proceso or 'N/A',
+            'usuario': activity.usuario,
+            'fecha': activity.fecha,
+            'comentario': activity.comentario or '',
+        })
+
+    return details, next_cursor
+
+
+def _dashboard_cache_key(filtros, cursor, version):
+    """
+    Cache key of an administrator dashboard result: normalized filters, history
+    cursor and data version. The version's timestamp keeps keys distinct even if
+    the version row is ever recreated.
+    """
+    normalizados = sorted(
+        (nombre, sorted(valor) if isinstance(valor, list) else valor)
+        for nombre, valor in filtros.items()
+    )
+    clave = repr((normalizados, cursor, version.version, version.modificado.timestamp()))
+    return 'admin-dashboard:' + hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+
+def admin_dashboard_data(filtros, cursor=None, version=None):
+    """
+    Statistics, matrix, total row count and one history page of the administrator
+    dashboard for the given filters.
+    Results are kept in the 'dashboard' cache under the current data version, so
+    any write (which bumps VersionDatos) makes them stale immediately.
+    """
+    version = version or VersionDatos.actual()
+    cache = caches['dashboard']
+    clave = _dashboard_cache_key(filtros, cursor, version)
+
+    datos = cache.get(clave)
+    if datos is None:
+        workflows, archivados = get_filtered_workflows(filtros)
+        workflow_details, next_cursor = prepare_workflow_details(
+            workflows, archivados, cursor=cursor, limit=HISTORIAL_PAGE_SIZE
+        )
+        datos = {
+            'stats': calculate_workflow_stats(workflows, archivados),
+            'matrix': calculate_process_state_matrix(workflows, archivados),
+            'workflow_details': workflow_details,
+            'next_cursor': next_cursor,
+            'total_registros': count_workflow_details(workflows, archivados),
+        }
+        cache.set(clave, datos)
+    return datos
+
+
+async def aadmin_dashboard_data(filtros, cursor=None, version=None):
+    """Async version of admin_dashboard_data, sharing its cache entries."""
+    version = version or await VersionDatos.aactual()
+    cache = caches['dashboard']
+    clave = _dashboard_cache_key(filtros, cursor, version)
+
+    datos = await cache.aget(clave)
+    if datos is None:
+        workflows, archivados = get_filtered_workflows(filtros)
+        workflow_details, next_cursor = await aprepare_workflow_details(
+            workflows, archivados, cursor=cursor, limit=HISTORIAL_PAGE_SIZE
+        )
+        datos = {
+            'stats': await acalculate_workflow_stats(workflows, archivados),
+            'matrix': await acalculate_process_state_matrix(workflows, archivados),
+            'workflow_details': workflow_details,
+            'next_cursor': next_cursor,
+            'total_registros': await acount_workflow_details(workflows, archivados),
+        }
+        await cache.aset(clave, datos)
+    return datos
+
+
+# Rows read from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADER = [
+    'ID Workflow',
+    'Proyecto',
+    'Componente',
+    'ID Proyecto',
+    'Estado Workflow',
+    'Proceso',
+    'Estado Proceso',
+    'Usuario',
+    'Fecha',
+    'Comentario'
+]
+
+
+class _Echo:
+    """
+    File-like object for csv.writer that hands each formatted line back
+    instead of buffering it, so lines can be streamed.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(workflows, archivados=None, por_workflow=False):
+    """
+    Yield the export rows of ALL historical activities of the filtered workflows,
+    newest first, reading the database in chunks of EXPORT_CHUNK_SIZE.
+    With por_workflow the rows are grouped by workflow (ascending id) instead,
+    newest first within each workflow, so workflow id ranges can be exported apart.
+    """
+    if por_workflow:
+        orden = ('workflow_id', '-fecha', '-id_actividad')
+    else:
+        orden = ('-fecha', 'workflow_id', '-id_actividad')
+
+    def clave(fila):
+        # Sort key matching `orden` when compared in reverse
+        if por_workflow:
+            return (-fila[0], fila[8], fila[10])
+        return (fila[8], -fila[0], fila[10])
+
+    iterators = []
+    for queryset in history_querysets(workflows, archivados):
+        iterators.append(queryset.order_by(*orden).values_list(
+            'workflow_id',
+            'workflow__nom_proyecto',
+            'workflow__componente',
+            'workflow__id_proyecto',
+            'estado_workflow',
+            'proceso',
+            'estado_proceso',
+            'usuario',
+            'fecha',
+            'comentario',
+            'id_actividad',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+    # Both tiers are already sorted, merge them lazily into the same order
+    filas = heapq.merge(*iterators, key=clave, reverse=True) if len(iterators) > 1 else iterators[0]
+
+    for (id_workflow, nom_proyecto, componente, id_proyecto, estado_workflow,
+         proceso, estado_proceso, usuario, fecha, comentario, _) in filas:
+        yield [
+            id_workflow,
+            nom_proyecto,
+            componente or '',
+            id_proyecto,
+            estado_workflow,
+            proceso or 'N/A',
+            estado_proceso or 'N/A',
+            usuario,
+            fecha.strftime('%Y-%m-%d %H:%M:%S') if fecha else '',
+            comentario or '',
+        ]
+
+
+def iter_csv(rows, encabezado=True):
+    """
+    Yield the CSV text of the export: UTF-8 BOM, header, then one line per row.
+    encabezado=False yields only the row lines, for partial files.
+    """
+    writer = csv.writer(_Echo())
+
+    if encabezado:
+        # Add UTF-8 BOM for Excel compatibility
+        yield '\ufeff' + writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_gzip(lines, chunk_size=64 * 1024):
+    """
+    Gzip-compress a stream of text lines, yielding compressed blocks of about chunk_size bytes.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            block = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if block:
+                yield block
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
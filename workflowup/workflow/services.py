@@ -0,0 +1,221 @@
+"""
+Write services for the workflow app.
+The per-workflow sequential ids of Actividad and PlanPruebaQA are allocated
+here from the counters on Workflow: by asignar_id() from the models' save()
+for single inserts and by the bulk services below for bulk_create. The bulk
+QA test updates live here too.
+"""
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from .events import publicar_actividad
+from .models import Workflow, Actividad, PlanPruebaQA, VersionDatos, WorkflowEstado
+
+
+def marcar_modificado(*workflow_ids):
+    """
+    Bump the version of the given workflows and, once committed, the global data version.
+    Bulk writes (update, bulk_create, bulk_update) send no post_save, so they call
+    this inside their transaction in place of the signal handlers.
+    """
+    Workflow.objects.filter(pk__in=workflow_ids).update(version=F('version') + 1)
+    transaction.on_commit(VersionDatos.incrementar)
+
+
+def reservar_ids(workflow, campo, cantidad=1):
+    """
+    Atomically reserve `cantidad` consecutive ids from a workflow counter.
+    Returns the first reserved id. Must run inside a transaction: the UPDATE
+    locks only this workflow row until commit, so concurrent writers on the
+    same workflow are serialized and writers on other workflows are not blocked.
+    """
+    queryset = Workflow.objects.filter(pk=workflow.pk)
+    queryset.update(**{campo: F(campo) + cantidad})
+    siguiente = queryset.values_list(campo, flat=True).get()
+    setattr(workflow, campo, siguiente)
+    return siguiente - cantidad
+
+
+def reservar_ids_varios(workflow_ids, campo):
+    """
+    Atomically reserve one id from the same counter of several workflows, with
+    one UPDATE and one read. Returns {workflow_id: reserved id}.
+    Must run inside a transaction, like reservar_ids().
+    """
+    queryset = Workflow.objects.filter(pk__in=workflow_ids)
+    queryset.update(**{campo: F(campo) + 1})
+    return {pk: siguiente - 1 for pk, siguiente in queryset.values_list('pk', campo)}
+
+
+def asignar_id(objeto, campo, contador):
+    """
+    Give a new Actividad or PlanPruebaQA its per-workflow id before the insert:
+    the next one of the workflow `contador` when `campo` is empty, or else move
+    the counter past the given id, so later reservations cannot collide with it.
+    Must run inside the transaction of the insert, like reservar_ids().
+    """
+    valor = getattr(objeto, campo)
+    if valor is None:
+        # The loaded workflow, if any, so its in-memory counter follows the reservation
+        cargado = objeto._meta.get_field('workflow').is_cached(objeto)
+        workflow = objeto.workflow if cargado else Workflow(pk=objeto.workflow_id)
+        setattr(objeto, campo, reservar_ids(workflow, contador))
+    else:
+        Workflow.objects.filter(pk=objeto.workflow_id, **{f'{contador}__lte': valor}).update(**{contador: valor + 1})
+
+
+def registrar_actividad(workflow, usuario, actividad, estado_workflow=None,
+                        proceso=None, estado_proceso=None, comentario=None):
+    """
+    Create the next activity of a workflow.
+    The id allocation (in Actividad.save()), the insert and the WorkflowEstado
+    update share one transaction.
+    """
+    with transaction.atomic():
+        return Actividad.objects.create(
+            workflow=workflow,
+            usuario=usuario,
+            estado_workflow=estado_workflow,
+            proceso=proceso,
+            estado_proceso=estado_proceso,
+            actividad=actividad,
+            comentario=comentario
+        )
+
+
+def registrar_actividades(actividades):
+    """
+    Create the next activity of several distinct workflows at once, from unsaved
+    Actividad instances: one id reservation, one bulk_create and one snapshot and
+    work-queue update for all of them, in one transaction. bulk_create sends no
+    post_save, so the versions are bumped and the live dashboard events queued here.
+    Returns the activities.
+    """
+    if not actividades:
+        return actividades
+
+    with transaction.atomic():
+        ids = reservar_ids_varios([actividad.workflow_id for actividad in actividades], 'next_actividad')
+        for actividad in actividades:
+            actividad.id_actividad = ids[actividad.workflow_id]
+        Actividad.objects.bulk_create(actividades)
+
+        # Backends that cannot return the inserted keys (MySQL) leave pk unset
+        if any(actividad.pk is None for actividad in actividades):
+            pks = {
+                (workflow_id, id_actividad): pk
+                for pk, workflow_id, id_actividad in Actividad.objects.filter(
+                    workflow_id__in=ids, id_actividad__in=ids.values()
+                ).values_list('pk', 'workflow_id', 'id_actividad')
+            }
+            for actividad in actividades:
+                actividad.pk = pks[(actividad.workflow_id, actividad.id_actividad)]
+
+        estados = WorkflowEstado.registrar_actividades(actividades)
+        marcar_modificado(*ids)
+        for estado in estados:
+            transaction.on_commit(partial(publicar_actividad, estado))
+    return actividades
+
+
+def registrar_prueba(workflow, prueba):
+    """
+    Add an unsaved PlanPruebaQA to the workflow's test plan with the next id_prueba
+    (allocated by PlanPruebaQA.save()).
+    """
+    prueba.workflow = workflow
+    prueba.id_prueba = None
+    prueba.save()
+    return prueba
+
+
+def importar_pruebas(workflow, descripciones, batch_size=500):
+    """
+    Append many tests to the workflow's test plan, 'No iniciado' at 0%.
+    The consecutive id_prueba values come from one counter reservation and the
+    rows are inserted with bulk_create in batches of `batch_size`, all in one
+    transaction. Returns the number of tests created.
+    """
+    with transaction.atomic():
+        primero = reservar_ids(workflow, 'next_prueba', len(descripciones))
+        PlanPruebaQA.objects.bulk_create(
+            (
+                PlanPruebaQA(
+                    workflow=workflow, id_prueba=id_prueba, prueba=descripcion,
+                    avance=0, resultado='No iniciado'
+                )
+                for id_prueba, descripcion in enumerate(descripciones, start=primero)
+            ),
+            batch_size=batch_size
+        )
+        marcar_modificado(workflow.pk)
+    return len(descripciones)
+
+
+def actualizar_pruebas(workflow, operaciones):
+    """
+    Apply a batch of QA test operations in order, in one transaction.
+    operaciones is a list of (id_prueba, avance) pairs; an avance of None toggles
+    rechazar/reinyectar instead. The rules are those of PlanPruebaQA.registrar_avance()
+    and alternar_rechazo(). Every touched test is written with one bulk_update.
+    Raises ValidationError, writing nothing, if a test does not exist or cannot change.
+    Returns the touched tests.
+    """
+    with transaction.atomic():
+        pruebas = {
+            prueba.id_prueba: prueba
+            for prueba in workflow.plan_pruebas.select_for_update().filter(
+                id_prueba__in={id_prueba for id_prueba, _ in operaciones}
+            )
+        }
+
+        for id_prueba, avance in operaciones:
+            prueba = pruebas.get(id_prueba)
+            if prueba is None:
+                raise ValidationError(f'La prueba {id_prueba} no existe en este workflow.')
+            if avance is None:
+                try:
+                    prueba.alternar_rechazo()
+                except ValidationError as e:
+                    raise ValidationError(f'Prueba {id_prueba}: {e.messages[0]}')
+            else:
+                prueba.registrar_avance(avance)
+
+        if pruebas:
+            PlanPruebaQA.objects.bulk_update(pruebas.values(), ['avance', 'resultado'])
+            marcar_modificado(workflow.pk)
+
+    return sorted(pruebas.values(), key=lambda prueba: prueba.id_prueba)
+
+
+def completar_pruebas(workflow, resultados=None):
+    """
+    Mark every test of the workflow, or only those with one of `resultados`,
+    as 100% 'Aprobado' with a single UPDATE. Returns the number of tests changed.
+    """
+    pruebas = workflow.plan_pruebas.exclude(avance=100, resultado='Aprobado')
+    if resultados:
+        pruebas = pruebas.filter(resultado__in=resultados)
+
+    with transaction.atomic():
+        cantidad = pruebas.update(avance=100, resultado=PlanPruebaQA.resultado_para_avance(100))
+        if cantidad:
+            marcar_modificado(workflow.pk)
+    return cantidad
+
+
+def reinyectar_pruebas_rechazadas(workflow):
+    """
+    Send every 'No aprobado' test of the workflow back to 'No iniciado' with
+    avance 0, with a single UPDATE. Returns the number of tests changed.
+    """
+    with transaction.atomic():
+        cantidad = workflow.plan_pruebas.filter(resultado='No aprobado').update(
+            avance=0, resultado='No iniciado'
+        )
+        if cantidad:
+            marcar_modificado(workflow.pk)
+    return cantidad
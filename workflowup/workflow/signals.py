@@ -0,0 +1,45 @@
+"""
+Signal handlers of the workflow app.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .events import publicar_actividad
+from .models import Workflow, Actividad, PlanPruebaQA, VersionDatos, WorkflowEstado
+
+
+@receiver(post_save, sender=Workflow)
+@receiver(post_save, sender=Actividad)
+@receiver(post_save, sender=PlanPruebaQA)
+def incrementar_version_datos(sender, instance, **kwargs):
+    """
+    Bump the global data version once the write is committed, so a reader
+    that sees the new version also sees the new data.
+    """
+    transaction.on_commit(VersionDatos.incrementar)
+
+
+@receiver(post_save, sender=Workflow)
+@receiver(post_save, sender=Actividad)
+@receiver(post_save, sender=PlanPruebaQA)
+def incrementar_version_workflow(sender, instance, **kwargs):
+    """
+    Bump the version of the affected workflow inside the writing transaction,
+    so its cached detail fragments are never served for the new data.
+    """
+    workflow_id = instance.pk if sender is Workflow else instance.workflow_id
+    Workflow.objects.filter(pk=workflow_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=WorkflowEstado)
+def publicar_evento_actividad(sender, instance, **kwargs):
+    """
+    Publish the new state of a workflow to the live dashboards once the
+    activity that moved its snapshot is committed.
+    """
+    if instance.actividad_workflow_id is not None:
+        transaction.on_commit(partial(publicar_actividad, instance))
@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import codecs
+import csv
+import gzip
+import importlib
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock, skipUnless
+
+from users_admin import urls as users_admin_urls
+from users_admin.models import User
+from .models import (
+    Workflow, Actividad, ColaTrabajo, WorkflowEstado, WorkflowArchivado, PlanPruebaQA, TrabajoExportacion,
+    PROCESO_SNAPSHOT_FIELDS
+)
+from . import benchmark, dataset, nplusone, reports, timing, urls as workflow_urls
+from .events import broker
+from .services import registrar_actividad, registrar_actividades, registrar_prueba, importar_pruebas, completar_pruebas
+from .transitions import (
+    acciones_permitidas, proceso_pendiente, estado_actual, ejecutar_transicion, ejecutar_transiciones
+)
+
+
+# Username of the test user of each role
+USUARIOS = {
+    'Administrador': 'admin',
+    'Jefe de Proyecto': 'jefe',
+    'SCM': 'scm',
+    'Release Manager': 'rm',
+    'QA': 'qa',
+}
+
+
+def crear_usuario(role, username=None, **campos):
+    """User of a role, named after it unless `username` is given; `campos` set other fields."""
+    username = username or USUARIOS[role]
+    return User.objects.create_user(
+        username=username, email=f'{username}@workflowup.com', password='x',
+        role=role, first_name=username.capitalize(), last_name='Test', **campos
+    )
+
+
+def crear_workflow(**campos):
+    """Workflow of the jefe 'jefe' with valid estimated dates; `campos` override any field."""
+    datos = {
+        'id_proyecto': 'PRJ-001', 'nom_proyecto': 'Proyecto', 'jefe_proyecto': 'jefe',
+        'desc_proyecto': 'Descripción', 'componente': 'Backend',
+        'qa_estimado': date(2030, 1, 1), 'pap_estimado': date(2030, 2, 1),
+    }
+    datos.update(campos)
+    return Workflow.objects.create(**datos)
+
+
+# Snapshot columns, in the order of ultimas_del_historial()
+CAMPOS_SNAPSHOT = ['actividad_workflow_id'] + [f'{campo}_id' for campo in PROCESO_SNAPSHOT_FIELDS.values()]
+
+
+def ultimas_del_historial():
+    """{workflow_id: pks of the latest general and per-proceso activities}, read from the activity log."""
+    ultimas = {}
+    for workflow in Workflow.objects.all():
+        actividades = workflow.actividades.order_by('-fecha', '-id_actividad')
+        ultimas[workflow.pk] = tuple(
+            getattr(consulta.first(), 'pk', None)
+            for consulta in [actividades] + [actividades.filter(proceso=proceso) for proceso in PROCESO_SNAPSHOT_FIELDS]
+        )
+    return ultimas
+
+
+def snapshots():
+    """{workflow_id: snapshot columns} of every WorkflowEstado."""
+    return {fila[0]: fila[1:] for fila in WorkflowEstado.objects.values_list('workflow_id', *CAMPOS_SNAPSHOT)}
+
+
+class WorkflowEstadoTests(TestCase):
+    """The latest-activity snapshot matches the activity log, however it was built."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+
+    def test_snapshot_follows_every_new_activity(self):
+        creacion = registrar_actividad(self.workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+        self.assertEqual(snapshots(), {self.workflow.pk: (creacion.pk, None, None, None, None)})
+
+        solicitud = registrar_actividad(self.workflow, 'jefe', 'Linea base solicitada', estado_workflow='Activo',
+                                        proceso='linea base', estado_proceso='En Proceso')
+        revision = registrar_actividad(self.workflow, 'jefe', 'Revision RM solicitada', estado_workflow='Activo',
+                                       proceso='RM Rev', estado_proceso='En Proceso')
+        self.assertEqual(snapshots(), {self.workflow.pk: (revision.pk, solicitud.pk, revision.pk, None, None)})
+        self.assertEqual(snapshots(), ultimas_del_historial())
+
+    def test_backdated_activity_does_not_replace_a_later_one(self):
+        actual = registrar_actividad(self.workflow, 'jefe', 'Linea base solicitada', estado_workflow='Activo',
+                                     proceso='linea base', estado_proceso='En Proceso')
+        with mock.patch('django.utils.timezone.now', return_value=actual.fecha - timedelta(days=1)):
+            anterior = registrar_actividad(self.workflow, 'jefe', 'Linea base aprobada', estado_workflow='Activo',
+                                           proceso='linea base', estado_proceso='Ok')
+        otra = registrar_actividad(self.workflow, 'jefe', 'Revision RM solicitada', estado_workflow='Activo',
+                                   proceso='RM Rev', estado_proceso='En Proceso')
+        # Older than the current linea base activity, but the first one of its proceso
+        with mock.patch('django.utils.timezone.now', return_value=actual.fecha - timedelta(days=2)):
+            diferencias = registrar_actividad(self.workflow, 'jefe', 'Informe diferencias solicitado',
+                                              estado_workflow='Activo', proceso='Diff Info', estado_proceso='En Proceso')
+
+        self.assertLess(anterior.fecha, actual.fecha)
+        self.assertEqual(snapshots(), {self.workflow.pk: (otra.pk, actual.pk, otra.pk, diferencias.pk, None)})
+        self.assertEqual(snapshots(), ultimas_del_historial())
+
+    def test_backfill_and_rebuild_match_the_activity_log(self):
+        otro = crear_workflow(id_proyecto='PRJ-002')
+        sin_actividades = crear_workflow(id_proyecto='PRJ-003')
+        for workflow in (self.workflow, otro):
+            registrar_actividad(workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+            registrar_actividad(workflow, 'jefe', 'Linea base solicitada', estado_workflow='Activo',
+                                proceso='linea base', estado_proceso='En Proceso')
+        registrar_actividad(otro, 'scm', 'Linea base aprobada', estado_workflow='Activo',
+                            proceso='linea base', estado_proceso='Ok')
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(days=1)):
+            registrar_actividad(otro, 'jefe', 'Release actualizado', estado_workflow='Activo')
+
+        esperado = ultimas_del_historial()
+        del esperado[sin_actividades.pk]
+        self.assertEqual(snapshots(), esperado)
+
+        # Data migration 0005, which built the snapshot of the existing workflows
+        migracion = importlib.import_module('workflow.migrations.0005_workflowestado')
+        WorkflowEstado.objects.all().delete()
+        migracion.populate_workflow_estado(apps, None)
+        self.assertEqual(snapshots(), esperado)
+
+        WorkflowEstado.objects.all().delete()
+        salida = io.StringIO()
+        call_command('rebuild_workflow_estado', batch_size=1, stdout=salida)
+        self.assertIn('2 workflow snapshots', salida.getvalue())
+        self.assertEqual(snapshots(), esperado)
+
+
+class WorkflowLoaderTests(TestCase):
+    """The latest-activity helpers read loaded workflows from memory."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        for numero in range(2):
+            cls.agregar(numero)
+
+    @staticmethod
+    def agregar(numero):
+        workflow = crear_workflow(id_proyecto=f'PRJ-{numero:03}')
+        registrar_actividad(workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+        registrar_actividad(workflow, 'jefe', 'Linea base solicitada', estado_workflow='Activo',
+                            proceso='linea base', estado_proceso='En Proceso')
+        registrar_actividad(workflow, 'scm', 'Linea base aprobada', estado_workflow='Activo',
+                            proceso='linea base', estado_proceso='Ok')
+
+    def leer_todo(self, workflows):
+        return [
+            (workflow.get_actividad_workflow(), workflow.get_actividad_scm1(), workflow.get_actividad_rm(),
+             workflow.get_actividad_scm2(), workflow.get_actividad_qa())
+            for workflow in workflows
+        ]
+
+    def test_helpers_run_no_queries_on_loaded_workflows(self):
+        esperado = self.leer_todo(Workflow.objects.order_by('pk'))
+
+        with self.assertNumQueries(1):
+            workflows = list(Workflow.objects.with_latest_activities().order_by('pk'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.leer_todo(workflows), esperado)
+
+        with self.assertNumQueries(2):
+            workflows = list(Workflow.objects.with_actividades().order_by('pk'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.leer_todo(workflows), esperado)
+            self.assertEqual([len(workflow.get_historial()) for workflow in workflows], [3, 3])
+
+    def test_dashboard_query_count_does_not_grow_with_workflows(self):
+        self.client.force_login(self.jefe)
+        url = reverse('workflow:dashboard')
+        self.client.get(url)  # creates the data version row
+        with CaptureQueriesContext(connection) as pocos:
+            self.assertEqual(len(self.client.get(url).context['workflow_data']), 2)
+
+        for numero in range(2, 8):
+            self.agregar(numero)
+        with self.assertNumQueries(len(pocos)):
+            self.assertEqual(len(self.client.get(url).context['workflow_data']), 8)
+
+
+def query_plan(queryset):
+    """Return the SQLite EXPLAIN QUERY PLAN of a queryset as a single string."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' | '.join(row[-1] for row in cursor.fetchall())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class HotQueryIndexTests(TestCase):
+    """
+    The hot queries of the dashboards and detail views must be served by the
+    composite indexes, without a temporary B-tree for sorting (a filesort).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+        registrar_actividad(cls.workflow, 'jefe', 'Workflow creado satisfactoriamente', estado_workflow='Nuevo')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = query_plan(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_activity_history_uses_workflow_fecha_index(self):
+        self.assertUsesIndex(self.workflow.get_historial(), 'actividad_wf_fecha_idx')
+
+    def test_latest_activity_by_proceso_uses_workflow_proceso_index(self):
+        queryset = self.workflow.actividades.filter(proceso='QA').order_by('-fecha', '-id_actividad')[:1]
+        self.assertUsesIndex(queryset, 'actividad_wf_proceso_idx')
+
+    def test_usuario_filter_options_use_usuario_index(self):
+        queryset = Actividad.objects.values_list('usuario', flat=True).distinct().order_by('usuario')
+        self.assertUsesIndex(queryset, 'actividad_usuario_idx')
+
+    def test_jefe_dashboard_uses_jefe_creacion_index(self):
+        queryset = Workflow.objects.filter(jefe_proyecto='jefe')
+        self.assertUsesIndex(queryset, 'workflow_jefe_creacion_idx')
+
+    def test_jefe_project_filter_uses_jefe_proyecto_index(self):
+        queryset = Workflow.objects.filter(
+            jefe_proyecto='jefe'
+        ).order_by('id_proyecto').values_list('id_proyecto', flat=True).distinct()
+        self.assertUsesIndex(queryset, 'workflow_jefe_proyecto_idx')
+
+
+class SequenceCounterTests(TestCase):
+    """id_actividad and id_prueba come from per-workflow counters, whatever path inserts the row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_usuario('Jefe de Proyecto')
+
+    def setUp(self):
+        self.workflow = crear_workflow()
+
+    def ids(self, workflow=None):
+        actividades = Actividad.objects.filter(workflow=workflow or self.workflow).order_by('pk')
+        return list(actividades.values_list('id_actividad', flat=True))
+
+    def contador(self, campo='next_actividad'):
+        return getattr(Workflow.objects.get(pk=self.workflow.pk), campo)
+
+    def test_activity_ids_are_sequential_per_workflow(self):
+        otro = crear_workflow(id_proyecto='PRJ-002')
+        for workflow in (self.workflow, otro, self.workflow, self.workflow, otro):
+            registrar_actividad(workflow, 'jefe', 'Actividad', estado_workflow='Activo')
+        self.assertEqual(self.ids(), [1, 2, 3])
+        self.assertEqual(self.ids(otro), [1, 2])
+        self.assertEqual(self.contador(), 4)
+
+    def test_burst_of_inserts_gets_unique_ids(self):
+        # Stale instances of the same workflow, as held by concurrent requests
+        copias = [Workflow.objects.get(pk=self.workflow.pk) for _ in range(3)]
+        otro = crear_workflow(id_proyecto='PRJ-002')
+        for numero in range(30):
+            if numero % 3 == 0:
+                registrar_actividad(copias[numero % 2], 'jefe', 'Actividad', estado_workflow='Activo')
+            elif numero % 3 == 1:
+                Actividad.objects.create(workflow_id=self.workflow.pk, usuario='jefe', actividad='Actividad')
+            else:
+                registrar_actividades([
+                    Actividad(workflow=copias[2], usuario='jefe', actividad='Actividad'),
+                    Actividad(workflow=otro, usuario='jefe', actividad='Actividad'),
+                ])
+        self.assertEqual(self.ids(), list(range(1, 31)))
+        self.assertEqual(self.contador(), 31)
+
+    def test_explicit_ids_move_the_counter_forward(self):
+        registrar_actividad(self.workflow, 'jefe', 'Actividad', estado_workflow='Nuevo')
+        Actividad.objects.create(workflow=self.workflow, id_actividad=10, usuario='jefe', actividad='Actividad')
+        self.assertEqual(self.contador(), 11)
+        Actividad.objects.create(workflow=self.workflow, id_actividad=5, usuario='jefe', actividad='Actividad')
+        self.assertEqual(self.contador(), 11)
+        self.assertEqual(registrar_actividad(self.workflow, 'jefe', 'Actividad').id_actividad, 11)
+
+    def test_next_prueba_follows_imports(self):
+        registrar_prueba(self.workflow, PlanPruebaQA(prueba='Manual'))
+        self.assertEqual(importar_pruebas(self.workflow, ['Login', 'Logout', 'Reporte']), 3)
+        self.assertEqual(self.contador('next_prueba'), 5)
+        registrar_prueba(self.workflow, PlanPruebaQA(prueba='Otra'))
+        PlanPruebaQA.objects.create(workflow=self.workflow, prueba='Sin id')
+        self.assertEqual(
+            list(self.workflow.plan_pruebas.values_list('id_prueba', 'prueba')),
+            [(1, 'Manual'), (2, 'Login'), (3, 'Logout'), (4, 'Reporte'), (5, 'Otra'), (6, 'Sin id')]
+        )
+        self.assertEqual(self.contador('next_prueba'), 7)
+
+    def test_admin_adds_take_the_next_id(self):
+        registrar_actividad(self.workflow, 'jefe', 'Actividad', estado_workflow='Nuevo')
+        self.client.force_login(crear_usuario('Administrador', is_staff=True, is_superuser=True))
+
+        respuesta = self.client.post(reverse('admin:workflow_actividad_add'), {
+            'workflow': self.workflow.pk, 'id_actividad': 1, 'usuario': 'admin', 'actividad': 'Corrección manual',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        respuesta = self.client.post(reverse('admin:workflow_planpruebaqa_add'), {
+            'workflow': self.workflow.pk, 'id_prueba': 1, 'prueba': 'Login', 'avance': 0, 'resultado': 'No iniciado',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+
+        self.assertEqual(self.ids(), [1, 2])
+        self.assertEqual(self.workflow.plan_pruebas.get().id_prueba, 1)
+        self.assertEqual((self.contador(), self.contador('next_prueba')), (3, 2))
+
+
+def estado(workflow='Activo', **procesos):
+    """State dict for the transition engine; procesos use underscores for spaces."""
+    base = {'workflow': workflow, 'linea base': None, 'RM Rev': None, 'Diff Info': None, 'QA': None}
+    base.update({proceso.replace('_', ' '): valor for proceso, valor in procesos.items()})
+    return base
+
+
+class TransitionTableTests(SimpleTestCase):
+    """Allowed transitions per role and state, resolved from the compiled table."""
+
+    def test_new_workflow_only_allows_linea_base_request_and_cancel(self):
+        self.assertEqual(
+            acciones_permitidas('Jefe de Proyecto', estado('Nuevo')),
+            {('solicitar', 'linea base'), ('cancelar', None)}
+        )
+
+    def test_rejected_process_can_be_requested_again(self):
+        permitidas = acciones_permitidas('Jefe de Proyecto', estado(linea_base='Ok', RM_Rev='No Ok'))
+        self.assertIn(('solicitar', 'RM Rev'), permitidas)
+        self.assertNotIn(('solicitar', 'Diff Info'), permitidas)
+
+    def test_close_requires_qa_approval(self):
+        self.assertNotIn(('cerrar', None), acciones_permitidas('Jefe de Proyecto', estado(QA='En Proceso')))
+        self.assertIn(('cerrar', None), acciones_permitidas('Jefe de Proyecto', estado(QA='Ok')))
+
+    def test_scm_linea_base_takes_precedence_over_diff_info(self):
+        self.assertEqual(
+            proceso_pendiente('SCM', estado(linea_base='En Proceso', Diff_Info='En Proceso')),
+            'linea base'
+        )
+        self.assertEqual(proceso_pendiente('SCM', estado(linea_base='Ok', Diff_Info='En Proceso')), 'Diff Info')
+
+    def test_reviewers_cannot_act_on_inactive_workflows(self):
+        for rol, proceso in [('SCM', 'linea_base'), ('Release Manager', 'RM_Rev'), ('QA', 'QA')]:
+            self.assertEqual(acciones_permitidas(rol, estado('Cancelado', **{proceso: 'En Proceso'})), set())
+
+    def test_roles_cannot_fire_other_roles_transitions(self):
+        self.assertEqual(acciones_permitidas('QA', estado(linea_base='En Proceso')), set())
+        self.assertEqual(acciones_permitidas('Administrador', estado(QA='Ok')), set())
+
+
+class TransitionExecutionTests(TestCase):
+    """Transitions submitted through the engine record the expected Actividad."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_usuario('Jefe de Proyecto')
+
+    def setUp(self):
+        self.workflow = crear_workflow()
+
+    def ejecutar(self, accion, proceso, usuario, rol, comentario=''):
+        workflow = Workflow.objects.with_latest_activities().get(pk=self.workflow.pk)
+        return ejecutar_transicion(workflow, accion, proceso, usuario=usuario, rol=rol, comentario=comentario)
+
+    def test_request_rejection_and_re_request(self):
+        actividad, mensaje = self.ejecutar('solicitar', 'linea base', 'jefe', 'Jefe de Proyecto')
+        self.assertEqual(actividad.id_actividad, 1)
+        self.assertEqual(mensaje, 'Linea base solicitada exitosamente.')
+
+        actividad, _ = self.ejecutar('rechazar', 'linea base', 'scm', 'SCM', comentario='Falta tag')
+        self.assertEqual((actividad.proceso, actividad.estado_proceso), ('linea base', 'No Ok'))
+
+        actividad, _ = self.ejecutar('solicitar', 'linea base', 'jefe', 'Jefe de Proyecto')
+        self.assertEqual(actividad.actividad, 'Re solicitud de linea base')
+        self.assertEqual(actividad.id_actividad, 3)
+
+    def test_rejection_requires_comment(self):
+        self.ejecutar('solicitar', 'linea base', 'jefe', 'Jefe de Proyecto')
+        with self.assertRaises(ValidationError):
+            self.ejecutar('rechazar', 'linea base', 'scm', 'SCM', comentario='  ')
+
+    def test_approval_checks_data_requirements(self):
+        self.ejecutar('solicitar', 'linea base', 'jefe', 'Jefe de Proyecto')
+        with self.assertRaises(ValidationError):
+            self.ejecutar('aprobar', 'linea base', 'scm', 'SCM')
+
+        Workflow.objects.filter(pk=self.workflow.pk).update(linea_base='baseline-1')
+        actividad, _ = self.ejecutar('aprobar', 'linea base', 'scm', 'SCM')
+        self.assertEqual(actividad.estado_proceso, 'Ok')
+
+    def test_disallowed_transition_records_nothing(self):
+        with self.assertRaises(ValidationError):
+            self.ejecutar('aprobar', 'QA', 'qa', 'QA')
+        self.assertFalse(self.workflow.actividades.exists())
+
+    def test_state_is_checked_again_when_recording(self):
+        Workflow.objects.filter(pk=self.workflow.pk).update(linea_base='baseline-1')
+        self.ejecutar('solicitar', 'linea base', 'jefe', 'Jefe de Proyecto')
+
+        # Two approvals submitted from pages loaded while the request was pending
+        leido = Workflow.objects.with_latest_activities().get(pk=self.workflow.pk)
+        otro = Workflow.objects.with_latest_activities().get(pk=self.workflow.pk)
+        self.assertEqual(estado_actual(leido)['linea base'], 'En Proceso')
+        ejecutar_transicion(otro, 'aprobar', 'linea base', usuario='scm', rol='SCM')
+
+        with self.assertRaisesMessage(ValidationError, 'no está permitida'):
+            ejecutar_transicion(leido, 'aprobar', 'linea base', usuario='scm2', rol='SCM')
+        self.assertEqual(self.workflow.actividades.filter(estado_proceso='Ok').count(), 1)
+
+    def test_workflow_row_is_locked_before_the_snapshot(self):
+        # Same order as an activity insert: the id reservation, then the snapshot
+        Workflow.objects.filter(pk=self.workflow.pk).update(linea_base='baseline-1')
+        workflow = Workflow.objects.with_latest_activities().get(pk=self.workflow.pk)
+        with CaptureQueriesContext(connection) as contexto:
+            ejecutar_transicion(workflow, 'solicitar', 'linea base', usuario='jefe', rol='Jefe de Proyecto')
+        consultas = [consulta['sql'] for consulta in contexto.captured_queries]
+
+        def primera(tabla):
+            return next(i for i, sql in enumerate(consultas) if f'FROM "{tabla}" ' in sql)
+
+        self.assertLess(primera('workflow_workflow'), primera('workflow_workflowestado'))
+
+
+class WorkQueueTests(TestCase):
+    """The role work queues follow every Actividad insert."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_usuario('Jefe de Proyecto')
+
+    def setUp(self):
+        self.workflow = crear_workflow()
+
+    def registrar(self, estado_workflow, proceso=None, estado_proceso=None):
+        return registrar_actividad(
+            self.workflow, 'jefe', 'Actividad',
+            estado_workflow=estado_workflow, proceso=proceso, estado_proceso=estado_proceso
+        )
+
+    def cola(self):
+        return dict(ColaTrabajo.objects.values_list('rol', 'proceso'))
+
+    def test_request_enqueues_and_review_dequeues(self):
+        self.registrar('Nuevo')
+        self.assertEqual(self.cola(), {})
+
+        solicitud = self.registrar('Activo', 'linea base', 'En Proceso')
+        self.assertEqual(self.cola(), {'SCM': 'linea base'})
+        self.assertEqual(ColaTrabajo.objects.get().encolado, solicitud.fecha)
+
+        self.registrar('Activo', 'linea base', 'Ok')
+        self.assertEqual(self.cola(), {})
+
+    def test_cancellation_empties_every_queue(self):
+        self.registrar('Activo', 'RM Rev', 'En Proceso')
+        self.registrar('Activo', 'QA', 'En Proceso')
+        self.assertEqual(self.cola(), {'Release Manager': 'RM Rev', 'QA': 'QA'})
+
+        self.registrar('Cancelado')
+        self.assertEqual(self.cola(), {})
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        self.registrar('Activo', 'linea base', 'Ok')
+        self.registrar('Activo', 'Diff Info', 'En Proceso')
+        self.registrar('Activo', 'QA', 'En Proceso')
+        incremental = self.cola()
+
+        ColaTrabajo.objects.all().delete()
+        WorkflowEstado.reconstruir()
+        self.assertEqual(self.cola(), incremental)
+        self.assertEqual(ColaTrabajo.resumen()['SCM']['pendientes'], 1)
+
+
+class ArchiveTests(TestCase):
+    """Finished workflows move to the archive tables and stay reachable from the admin dashboard."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+
+    def crear(self, nom_proyecto, *estados):
+        workflow = crear_workflow(nom_proyecto=nom_proyecto)
+        for estado_workflow in estados:
+            registrar_actividad(workflow, 'jefe', 'Actividad', estado_workflow=estado_workflow)
+        return workflow
+
+    def test_only_finished_workflows_are_archived(self):
+        activo = self.crear('Activo', 'Nuevo', 'Activo')
+        cerrado = self.crear('Cerrado', 'Nuevo', 'Activo', 'Cerrado')
+        PlanPruebaQA.objects.create(workflow=cerrado, id_prueba=1, prueba='Login', resultado='Ok')
+
+        self.assertEqual(WorkflowArchivado.archivar(antiguedad_dias=1), 0)
+        self.assertEqual(WorkflowArchivado.archivar(batch_size=1), 1)
+
+        self.assertEqual(list(Workflow.objects.values_list('pk', flat=True)), [activo.pk])
+        self.assertFalse(Actividad.objects.filter(workflow_id=cerrado.pk).exists())
+        self.assertFalse(WorkflowEstado.objects.filter(workflow_id=cerrado.pk).exists())
+
+        archivado = WorkflowArchivado.objects.get(pk=cerrado.pk)
+        self.assertEqual(archivado.actividades.count(), 3)
+        self.assertEqual(archivado.plan_pruebas.get().prueba, 'Login')
+
+    def test_dashboard_reads_archive_only_on_request(self):
+        self.crear('Activo', 'Nuevo', 'Activo')
+        self.crear('Cerrado', 'Nuevo', 'Cerrado')
+        WorkflowArchivado.archivar()
+        self.client.force_login(self.admin)
+
+        datos = self.client.get(reverse('workflow:dashboard_api')).json()
+        self.assertEqual(datos['stats']['total'], 1)
+        self.assertEqual(len(datos['workflow_details']), 2)
+        self.assertEqual(datos['total_registros'], 2)
+
+        datos = self.client.get(reverse('workflow:dashboard_api'), {'archivados': '1'}).json()
+        self.assertEqual(datos['stats'], {'total': 2, 'nuevo': 0, 'activo': 1, 'cerrado': 1, 'cancelado': 0})
+        self.assertEqual(len(datos['workflow_details']), 4)
+
+        respuesta = self.client.get(reverse('workflow:export_workflows_csv'), {'archivados': '1'})
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        self.assertEqual(len(contenido.splitlines()), 5)
+
+
+class HistoryPaginationTests(TestCase):
+    """The admin history list is served in keyset pages that cover every activity once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        for numero in range(3):
+            workflow = crear_workflow(id_proyecto=f'PRJ-00{numero}')
+            for _ in range(3):
+                registrar_actividad(workflow, 'jefe', 'Actividad', estado_workflow='Activo')
+        # Ties on fecha must be broken by workflow_id and id_actividad
+        Actividad.objects.filter(id_actividad=2).update(fecha=Actividad.objects.get(workflow_id=workflow.pk, id_actividad=2).fecha)
+
+    def test_pages_follow_cursor_without_gaps_or_duplicates(self):
+        self.client.force_login(self.admin)
+        url = reverse('workflow:dashboard_api')
+
+        vistos, cursor = [], None
+        with mock.patch.object(reports, 'HISTORIAL_PAGE_SIZE', 4):
+            while True:
+                datos = self.client.get(url, {'cursor': cursor} if cursor else {}).json()
+                self.assertEqual(datos['stats']['total'], 3)
+                self.assertEqual(datos['total_registros'], 9)
+                self.assertLessEqual(len(datos['workflow_details']), 4)
+                vistos.extend(datos['workflow_details'])
+                cursor = datos['next']
+                if not cursor:
+                    break
+
+        esperado = list(Actividad.objects.order_by('-fecha', 'workflow_id', '-id_actividad').values_list('workflow_id', 'fecha'))
+        self.assertEqual([(d['id_workflow'], d['fecha']) for d in vistos],
+                         [(wf, fecha.strftime('%Y-%m-%d %H:%M:%S')) for wf, fecha in esperado])
+
+    def test_malformed_cursor_is_rejected(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('workflow:dashboard_api'), {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class AdminFilterTests(TestCase):
+    """Administrator filters are compiled into SQL and shared by the dashboard views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        for id_proyecto, componente, usuario, estado_workflow in [
+            ('ALFA-1', 'Backend', 'jefe1', 'Nuevo'),
+            ('ALFA-2', 'Frontend', 'jefe2', 'Activo'),
+            ('BETA-1', 'Backend', 'jefe1', 'Cancelado'),
+        ]:
+            workflow = crear_workflow(id_proyecto=id_proyecto, jefe_proyecto=usuario, componente=componente)
+            registrar_actividad(workflow, usuario, 'Actividad', estado_workflow=estado_workflow)
+
+    def total(self, **params):
+        return self.client.get(reverse('workflow:dashboard_api'), params).json()['stats']['total']
+
+    def test_filters(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.total(), 3)
+        self.assertEqual(self.total(estado=['Nuevo', 'Activo']), 2)
+        self.assertEqual(self.total(usuario=['jefe1'], componente='back'), 2)
+        self.assertEqual(self.total(id_proyecto='alfa', estado='Activo'), 1)
+        self.assertEqual(self.total(fecha_desde='2000-01-01', fecha_hasta='2000-12-31'), 0)
+        self.assertEqual(self.total(fecha_desde='no-es-fecha'), 3)
+
+    def test_stats_and_matrix_follow_latest_activity(self):
+        workflow = Workflow.objects.get(id_proyecto='ALFA-2')
+        registrar_actividad(
+            workflow, 'jefe2', 'Solicitud de RM Rev',
+            estado_workflow='Activo', proceso='RM Rev', estado_proceso='En Proceso'
+        )
+        self.client.force_login(self.admin)
+        datos = self.client.get(reverse('workflow:dashboard_api')).json()
+
+        self.assertEqual(datos['stats'], {'total': 3, 'nuevo': 1, 'activo': 1, 'cerrado': 0, 'cancelado': 1})
+        self.assertEqual(datos['matrix']['RM Rev'], {'En Proceso': 1, 'Ok': 0, 'No Ok': 0})
+        self.assertEqual(sum(sum(fila.values()) for fila in datos['matrix'].values()), 1)
+
+    def test_query_count_does_not_depend_on_matches(self):
+        self.client.force_login(self.admin)
+        url = reverse('workflow:dashboard_api')
+        self.client.get(url, {'id_proyecto': 'GAMMA'})
+        # Filters not seen before, so neither request is answered from the dashboard cache
+        with CaptureQueriesContext(connection) as varios:
+            self.client.get(url, {'id_proyecto': 'A'})
+        with CaptureQueriesContext(connection) as uno:
+            self.client.get(url, {'id_proyecto': 'BETA'})
+        self.assertEqual(len(varios), len(uno))
+
+
+class CsvExportTests(TestCase):
+    """The CSV export is streamed in history order, plain or gzip-compressed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        workflow = crear_workflow(nom_proyecto='Proyecto, Uno')
+        for _ in range(3):
+            registrar_actividad(workflow, 'jefe', 'Actividad', estado_workflow='Activo')
+
+    def exportar(self, **params):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('workflow:export_workflows_csv'), params)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def test_plain_export_keeps_bom_and_layout(self):
+        _, contenido = self.exportar()
+        self.assertTrue(contenido.startswith(codecs.BOM_UTF8))
+        filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+        self.assertEqual(filas[0][0], 'ID Workflow')
+        self.assertEqual(len(filas), 4)
+        self.assertEqual({len(fila) for fila in filas}, {10})
+        self.assertEqual(filas[1][1], 'Proyecto, Uno')
+        self.assertEqual(filas[1][5], 'N/A')
+
+    def test_gzip_export_decompresses_to_plain_export(self):
+        respuesta, comprimido = self.exportar(gzip='1')
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', respuesta['Content-Disposition'])
+        _, plano = self.exportar()
+        self.assertEqual(gzip.decompress(comprimido), plano)
+
+
+class _InlineExecutor:
+    """Stand-in for ProcessPoolExecutor that runs the partitions in this process."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, funcion, *iterables):
+        return map(funcion, *iterables)
+
+
+class ExportJobTests(TestCase):
+    """Background export jobs produce the same rows as the streamed export."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        for numero in range(5):
+            workflow = crear_workflow(id_proyecto=f'PRJ-00{numero}', componente='Backend' if numero % 2 else 'Frontend')
+            for _ in range(2):
+                registrar_actividad(workflow, 'jefe', 'Actividad', estado_workflow='Activo')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        ajustes = self.settings(MEDIA_ROOT=media_root)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client.force_login(self.admin)
+
+    def crear(self, **datos):
+        respuesta = self.client.post(reverse('workflow:export_job_create'), datos)
+        self.assertEqual(respuesta.status_code, 202)
+        return respuesta.json()['trabajo']
+
+    def test_job_lifecycle_and_partitioned_output(self):
+        trabajo = self.crear(componente='Backend')
+        self.assertEqual(trabajo['estado'], 'Pendiente')
+        self.assertIsNone(trabajo['download_url'])
+
+        with mock.patch('workflow.exports.ProcessPoolExecutor', _InlineExecutor):
+            call_command('run_export_jobs', processes=3, once=True, stdout=io.StringIO())
+
+        trabajo = self.client.get(trabajo['status_url']).json()['trabajo']
+        self.assertEqual((trabajo['estado'], trabajo['filas']), ('Completado', 4))
+
+        respuesta = self.client.get(trabajo['download_url'])
+        generado = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        respuesta = self.client.get(reverse('workflow:export_workflows_csv'), {'componente': 'Backend'})
+        directo = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+
+        filas = list(csv.reader(io.StringIO(generado)))
+        self.assertEqual(filas[0], list(csv.reader(io.StringIO(directo)))[0])
+        self.assertEqual(sorted(filas[1:]), sorted(list(csv.reader(io.StringIO(directo)))[1:]))
+        ids = [int(fila[0]) for fila in filas[1:]]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_gzip_job_and_empty_result(self):
+        self.crear(gzip='1', id_proyecto='NO-EXISTE')
+        call_command('run_export_jobs', processes=1, once=True, stdout=io.StringIO())
+
+        trabajo = TrabajoExportacion.objects.get()
+        self.assertEqual((trabajo.estado, trabajo.filas), ('Completado', 0))
+        self.assertTrue(trabajo.archivo.name.endswith('.csv.gz'))
+        with trabajo.archivo.open('rb') as archivo:
+            self.assertEqual(len(gzip.decompress(archivo.read()).decode('utf-8-sig').splitlines()), 1)
+
+
+class ConditionalGetTests(TestCase):
+    """Dashboards answer 304 Not Modified until the data or the request changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+
+    def revalidar(self, url, respuesta, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+
+    def test_dashboard_api_revalidation(self):
+        self.client.force_login(self.admin)
+        url = reverse('workflow:dashboard_api')
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 304)
+        self.assertEqual(self.revalidar(url, respuesta, estado='Activo').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_actividad(self.workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 200)
+
+    def test_role_dashboard_revalidation_is_per_user(self):
+        url = reverse('workflow:dashboard')
+        self.client.force_login(self.jefe)
+        self.client.get(url)  # first page view sets the CSRF cookie
+        respuesta = self.client.get(url)
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Workflow.objects.filter(pk=self.workflow.pk).get().save()
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 200)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 200)
+
+    def test_queue_ages_are_revalidated_every_minute(self):
+        url = reverse('workflow:dashboard')
+        self.client.force_login(crear_usuario('SCM'))
+        self.client.get(url)
+        ahora = timezone.now().replace(second=0)
+        with mock.patch('django.utils.timezone.now', return_value=ahora):
+            respuesta = self.client.get(url)
+            self.assertEqual(self.revalidar(url, respuesta).status_code, 304)
+        with mock.patch('django.utils.timezone.now', return_value=ahora + timedelta(minutes=1)):
+            self.assertEqual(self.revalidar(url, respuesta).status_code, 200)
+
+
+class DashboardCacheTests(TestCase):
+    """Administrator dashboard results are cached per data version and filter set."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.workflow = crear_workflow()
+        registrar_actividad(cls.workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+
+    def datos(self, query=''):
+        return reports.admin_dashboard_data(reports.parse_admin_filters(QueryDict(query)))
+
+    def test_hits_until_a_write_bumps_the_version(self):
+        call_command('warm_dashboard_cache', stdout=io.StringIO())
+        with self.assertNumQueries(1):  # only the version lookup
+            self.assertEqual(self.datos()['stats']['nuevo'], 1)
+        self.datos('estado=Nuevo&componente=back')
+        with self.assertNumQueries(1):  # same filters, different parameter order
+            self.datos('componente=back&estado=Nuevo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_actividad(self.workflow, 'jefe', 'Solicitud de linea base', estado_workflow='Activo')
+        self.assertEqual(self.datos()['stats'], {'total': 1, 'nuevo': 0, 'activo': 1, 'cerrado': 0, 'cancelado': 0})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragments'},
+})
+class DetailFragmentCacheTests(TestCase):
+    """Read-only fragments of the detail pages are cached per workflow version and role."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+        registrar_actividad(cls.workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+
+    def setUp(self):
+        self.client.force_login(self.jefe)
+        self.url = reverse('workflow:workflow_detail', args=[self.workflow.pk])
+
+    def test_writes_bump_the_workflow_version(self):
+        version = Workflow.objects.get(pk=self.workflow.pk).version
+        PlanPruebaQA.objects.create(
+            workflow=self.workflow, id_prueba=1, prueba='Prueba', avance=0, resultado='No iniciado'
+        )
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).version, version + 1)
+
+        # A stale instance saved afterwards advances the version instead of rewinding it
+        self.workflow.save()
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).version, version + 2)
+
+    def test_history_is_served_from_the_fragment_cache_until_a_write(self):
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as segunda:
+            respuesta = self.client.get(self.url)
+        self.assertEqual(len(segunda), len(primera) - 1)  # no history query
+        self.assertContains(respuesta, 'Creación de workflow')
+        self.assertContains(respuesta, 'csrfmiddlewaretoken')
+
+        registrar_actividad(self.workflow, 'jefe', 'Solicitud de linea base', estado_workflow='Activo')
+        self.assertContains(self.client.get(self.url), 'Solicitud de linea base')
+
+
+class DashboardEventsTests(TestCase):
+    """New activities are pushed to the live dashboards through the in-process broker."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+
+    def evento(self, id_workflow, jefe_proyecto):
+        return {
+            'id_workflow': id_workflow, 'jefe_proyecto': jefe_proyecto, 'estado_workflow': 'Activo',
+            'proceso': 'linea base', 'estado_proceso': 'En Proceso', 'pendientes': {'SCM': 'linea base'},
+        }
+
+    def registrar(self):
+        registrar_actividad(
+            self.workflow, 'jefe', 'Solicitud de linea base', estado_workflow='Activo',
+            proceso='linea base', estado_proceso='En Proceso'
+        )
+
+    def test_committed_activity_publishes_the_new_state(self):
+        with mock.patch.object(broker, 'hay_suscripciones', return_value=True):
+            with mock.patch.object(broker, 'publicar') as publicar:
+                with self.captureOnCommitCallbacks() as callbacks:
+                    self.registrar()
+                # The event is built once committed, outside the write transaction
+                publicar.assert_not_called()
+                for callback in callbacks:
+                    callback()
+        publicar.assert_called_once_with(self.evento(self.workflow.pk, 'jefe'))
+
+    def test_no_event_is_built_without_streams(self):
+        with mock.patch('workflow.events.evento_actividad') as evento:
+            with mock.patch.object(broker, 'publicar') as publicar:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.registrar()
+        evento.assert_not_called()
+        publicar.assert_not_called()
+
+    def test_wsgi_requests_are_told_not_to_reconnect(self):
+        self.client.force_login(self.jefe)
+        self.assertEqual(self.client.get(reverse('workflow:dashboard_events')).status_code, 204)
+
+    async def test_stream_only_carries_the_visible_events(self):
+        await self.async_client.aforce_login(self.jefe)
+        respuesta = await self.async_client.get(reverse('workflow:dashboard_events'))
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+
+        stream = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        broker.publicar(self.evento(999, 'otro'))
+        broker.publicar(self.evento(self.workflow.pk, 'jefe'))
+        mensaje = (await anext(stream)).decode()
+        await stream.aclose()
+
+        self.assertTrue(mensaje.startswith('event: actividad\n'))
+        self.assertEqual(json.loads(mensaje.split('data: ', 1)[1])['id_workflow'], self.workflow.pk)
+
+
+class AsyncEndpointTests(TestCase):
+    """dashboard_api and the QA AJAX endpoints are served by async views under ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        cls.qa = crear_usuario('QA')
+        cls.workflow = crear_workflow()
+        registrar_actividad(cls.workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+        PlanPruebaQA.objects.create(
+            workflow=cls.workflow, id_prueba=1, prueba='Prueba', avance=0, resultado='No iniciado'
+        )
+
+    async def test_dashboard_api_and_revalidation(self):
+        url = reverse('workflow:dashboard_api')
+        await self.async_client.aforce_login(self.qa)
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.admin)
+        respuesta = await self.async_client.get(url)
+        self.assertEqual(respuesta.json()['stats']['nuevo'], 1)
+        revalidada = await self.async_client.get(url, headers={'if-none-match': respuesta['ETag']})
+        self.assertEqual(revalidada.status_code, 304)
+
+    async def test_qa_endpoints_apply_the_resultado_rules(self):
+        await self.async_client.aforce_login(self.qa)
+        argumentos = [self.workflow.pk, 1]
+        respuesta = await self.async_client.post(
+            reverse('workflow:qa_update_avance_ajax', args=argumentos), {'avance': '100'}
+        )
+        self.assertEqual(respuesta.json()['resultado'], 'Aprobado')
+
+        respuesta = await self.async_client.post(reverse('workflow:qa_toggle_rechazar_ajax', args=argumentos))
+        self.assertFalse(respuesta.json()['success'])
+        prueba = await PlanPruebaQA.objects.aget(workflow=self.workflow, id_prueba=1)
+        self.assertEqual((prueba.avance, prueba.resultado), (100, 'Aprobado'))
+
+    async def test_qa_endpoints_answer_404_for_unknown_tests(self):
+        await self.async_client.aforce_login(self.qa)
+        for vista in ('qa_update_avance_ajax', 'qa_toggle_rechazar_ajax'):
+            for argumentos in ([self.workflow.pk, 99], [999, 1]):
+                with self.subTest(vista=vista, argumentos=argumentos):
+                    respuesta = await self.async_client.post(reverse(f'workflow:{vista}', args=argumentos), {'avance': '10'})
+                    self.assertEqual(respuesta.status_code, 404)
+
+
+class BatchQaUpdateTests(TestCase):
+    """qa_batch_update_ajax applies many QA test updates in one request and one transaction."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qa = crear_usuario('QA')
+        cls.workflow = crear_workflow()
+        PlanPruebaQA.objects.bulk_create([
+            PlanPruebaQA(workflow=cls.workflow, id_prueba=i, prueba=f'Prueba {i}', avance=0, resultado='No iniciado')
+            for i in range(1, 7)
+        ])
+        registrar_actividad(cls.workflow, 'jefe', 'Pruebas QA solicitadas', estado_workflow='Activo',
+                            proceso='QA', estado_proceso='En Proceso')
+
+    def setUp(self):
+        self.client.force_login(self.qa)
+        self.url = reverse('workflow:qa_batch_update_ajax', args=[self.workflow.pk])
+
+    def enviar(self, cuerpo):
+        return self.client.post(self.url, json.dumps(cuerpo), content_type='application/json').json()
+
+    def estado_pruebas(self):
+        return {
+            prueba.id_prueba: (prueba.avance, prueba.resultado)
+            for prueba in PlanPruebaQA.objects.filter(workflow=self.workflow)
+        }
+
+    def version(self):
+        return Workflow.objects.get(pk=self.workflow.pk).version
+
+    def test_operations_follow_the_resultado_rules(self):
+        version = self.version()
+        datos = self.enviar({'operaciones': [
+            {'id_prueba': 1, 'avance': 30},
+            {'id_prueba': 1, 'avance': 100},
+            {'id_prueba': 2, 'avance': 40},
+            {'id_prueba': 3, 'accion': 'alternar'},
+            {'id_prueba': 4, 'accion': 'alternar'},
+            {'id_prueba': 4, 'accion': 'alternar'},
+        ]})
+        self.assertTrue(datos['success'])
+        self.assertEqual(datos['actualizadas'], 4)
+        self.assertEqual(datos['resumen'], {'total': 6, 'aprobadas': 1, 'rechazadas': 1})
+        estado = self.estado_pruebas()
+        self.assertEqual(estado[1], (100, 'Aprobado'))
+        self.assertEqual(estado[2], (40, 'En proceso'))
+        self.assertEqual(estado[3], (0, 'No aprobado'))
+        self.assertEqual(estado[4], (0, 'No iniciado'))
+        self.assertEqual(self.version(), version + 1)
+
+    def test_invalid_batch_writes_nothing(self):
+        antes = self.estado_pruebas()
+        datos = self.enviar({'operaciones': [{'id_prueba': 1, 'avance': 100}, {'id_prueba': 1, 'accion': 'alternar'}]})
+        self.assertFalse(datos['success'])
+        datos = self.enviar({'operaciones': [{'id_prueba': 2, 'avance': 50}, {'id_prueba': 99, 'avance': 50}]})
+        self.assertFalse(datos['success'])
+        datos = self.enviar({'operaciones': [{'id_prueba': 2, 'avance': 150}]})
+        self.assertEqual(datos['error'], 'Prueba 2: El valor de avance debe estar entre 0 y 100')
+        datos = self.enviar({'operaciones': [{'id_prueba': True, 'avance': 50}]})
+        self.assertEqual(datos['error'], 'Cada operación requiere un id_prueba entero')
+        self.assertEqual(self.estado_pruebas(), antes)
+
+    def test_set_based_actions(self):
+        self.enviar({'operaciones': [
+            {'id_prueba': 1, 'avance': 50}, {'id_prueba': 2, 'accion': 'alternar'}, {'id_prueba': 3, 'accion': 'alternar'},
+        ]})
+
+        # One UPDATE of the tests and one of the workflow version, inside a savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(completar_pruebas(self.workflow, ['En proceso']), 1)
+
+        datos = self.enviar({'accion': 'reinyectar'})
+        self.assertEqual(datos['actualizadas'], 2)
+        self.assertEqual(datos['resumen'], {'total': 6, 'aprobadas': 1, 'rechazadas': 0})
+
+        datos = self.enviar({'accion': 'completar'})
+        self.assertEqual(datos['actualizadas'], 5)
+        self.assertEqual(datos['resumen'], {'total': 6, 'aprobadas': 6, 'rechazadas': 0})
+        self.assertEqual(len(datos['pruebas']), 6)
+
+    def test_only_workflows_pending_qa_are_updated(self):
+        antes = self.estado_pruebas()
+        url = reverse('workflow:qa_batch_update_ajax', args=[999])
+        self.assertEqual(self.client.post(url, '{"accion": "completar"}', content_type='application/json').status_code, 404)
+
+        for estado_workflow, proceso, estado_proceso in [('Activo', 'QA', 'Ok'), ('Cancelado', None, None)]:
+            registrar_actividad(self.workflow, 'jefe', 'Actividad', estado_workflow=estado_workflow,
+                                proceso=proceso, estado_proceso=estado_proceso)
+            respuesta = self.client.post(self.url, '{"accion": "completar"}', content_type='application/json')
+            self.assertEqual(respuesta.status_code, 409)
+            self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(self.estado_pruebas(), antes)
+
+    def test_query_count_does_not_depend_on_the_number_of_operations(self):
+        def consultas(operaciones):
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertTrue(self.enviar({'operaciones': operaciones})['success'])
+            return len(contexto)
+
+        una = consultas([{'id_prueba': 1, 'avance': 10}])
+        todas = consultas([{'id_prueba': i, 'avance': 20} for i in range(1, 7)])
+        self.assertGreater(una, 0)
+        self.assertEqual(una, todas)
+
+
+class PlanImportTests(TestCase):
+    """The test plan is imported from CSV/TSV in bulk and listed in pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        cls.workflow = crear_workflow()
+
+    def setUp(self):
+        self.client.force_login(self.jefe)
+        self.url = reverse('workflow:plan_pruebas', args=[self.workflow.pk])
+
+    def importar(self, nombre, contenido):
+        archivo = SimpleUploadedFile(nombre, contenido.encode('utf-8'))
+        return self.client.post(self.url, {'importar': '1', 'archivo': archivo})
+
+    def test_import_appends_consecutive_ids_in_one_reservation(self):
+        self.client.post(self.url, {'prueba': 'Manual'})
+        version = Workflow.objects.get(pk=self.workflow.pk).version
+
+        filas = '\n'.join(f'{i}\tPrueba {i}' for i in range(120))
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.importar('plan.tsv', 'id\tprueba\n' + filas + '\n\n')
+        inserts = [q for q in contexto.captured_queries if q['sql'].startswith('INSERT INTO "workflow_planpruebaqa"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertRedirects(respuesta, self.url)
+
+        pruebas = list(PlanPruebaQA.objects.filter(workflow=self.workflow).values_list('id_prueba', 'prueba'))
+        self.assertEqual(pruebas[:2], [(1, 'Manual'), (2, 'Prueba 0')])
+        self.assertEqual(pruebas[-1], (121, 'Prueba 119'))
+        workflow = Workflow.objects.get(pk=self.workflow.pk)
+        self.assertEqual(workflow.next_prueba, 122)
+        self.assertEqual(workflow.version, version + 1)
+
+        # Following single inserts continue after the imported ids
+        self.client.post(self.url, {'prueba': 'Otra'})
+        self.assertTrue(PlanPruebaQA.objects.filter(workflow=self.workflow, id_prueba=122, prueba='Otra').exists())
+
+    def test_invalid_rows_reject_the_whole_file(self):
+        respuesta = self.importar('plan.csv', 'Login\n,\n"' + 'x' * 81 + '"\nLogout\n')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['import_form'].errors['archivo'], [
+            'Fila 3: la descripción supera los 80 caracteres.',
+        ])
+        self.assertFalse(PlanPruebaQA.objects.filter(workflow=self.workflow).exists())
+
+        respuesta = self.importar('plan.csv', 'prueba,owner\n,ana\n')
+        self.assertEqual(respuesta.context['import_form'].errors['archivo'], [
+            'Fila 2: la descripción de la prueba está vacía.',
+        ])
+
+    def test_plan_is_paginated(self):
+        self.importar('plan.csv', '\n'.join(f'Prueba {i}' for i in range(1, 121)))
+        respuesta = self.client.get(self.url, {'page': 3})
+        self.assertEqual([p.id_prueba for p in respuesta.context['pruebas']], list(range(101, 121)))
+        self.assertContains(respuesta, 'Página 3 de 3')
+
+        # The QA page pages the filtered plan; the approval rules still see every test
+        qa = crear_usuario('QA')
+        registrar_actividad(self.workflow, 'jefe', 'Pruebas QA solicitadas',
+                            estado_workflow='Activo', proceso='QA', estado_proceso='En Proceso')
+        PlanPruebaQA.objects.filter(workflow=self.workflow, id_prueba__gt=60).update(avance=100, resultado='Aprobado')
+        self.client.force_login(qa)
+        respuesta = self.client.get(
+            reverse('workflow:workflow_detail_qa', args=[self.workflow.pk]), {'resultado': 'Aprobado', 'page': 2}
+        )
+        self.assertEqual([p.id_prueba for p in respuesta.context['pruebas']], list(range(111, 121)))
+        self.assertEqual(respuesta.context['total_pruebas'], 120)
+        self.assertFalse(respuesta.context['btn_ok_enabled'])
+        self.assertContains(respuesta, '&resultado=Aprobado')
+
+
+class BulkTransitionTests(TestCase):
+    """Reviewers approve or reject many workflows in one request, validated one by one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.scm = crear_usuario('SCM')
+        cls.workflows = []
+        for i in range(4):
+            workflow = crear_workflow(id_proyecto=f'PRJ-00{i}', linea_base='LB-1' if i != 2 else '')
+            registrar_actividad(workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+            # The last workflow has nothing pending for SCM
+            if i != 3:
+                registrar_actividad(workflow, 'jefe', 'Linea base solicitada', estado_workflow='Activo',
+                                    proceso='linea base', estado_proceso='En Proceso')
+            cls.workflows.append(workflow)
+
+    def setUp(self):
+        self.client.force_login(self.scm)
+        self.url = reverse('workflow:transiciones_lote')
+
+    def enviar(self, accion, ids, comentario=''):
+        return self.client.post(self.url, {'accion': accion, 'workflows': ids, 'comentario': comentario}).json()
+
+    def test_each_workflow_is_validated_and_the_valid_ones_recorded(self):
+        ids = [workflow.pk for workflow in self.workflows] + [999]
+        versiones = dict(Workflow.objects.values_list('pk', 'version'))
+
+        with mock.patch.object(broker, 'hay_suscripciones', return_value=True):
+            with mock.patch.object(broker, 'publicar') as publicar:
+                with self.captureOnCommitCallbacks(execute=True):
+                    datos = self.enviar('aprobar', ids)
+
+        self.assertEqual(datos['procesados'], 2)
+        self.assertEqual([r['success'] for r in datos['resultados']], [True, True, False, False, False])
+        self.assertEqual(datos['resultados'][0]['mensaje'], 'Linea base aprobada exitosamente.')
+        self.assertIn('línea base', datos['resultados'][2]['mensaje'])
+        self.assertEqual(datos['resultados'][4]['mensaje'], 'El workflow no existe.')
+
+        for workflow in self.workflows[:2]:
+            estado = estado_actual(Workflow.objects.with_latest_activities().get(pk=workflow.pk))
+            self.assertEqual(estado['linea base'], 'Ok')
+            actividad = Actividad.objects.get(workflow=workflow, id_actividad=3)
+            self.assertEqual((actividad.usuario, actividad.actividad), ('scm', 'Linea base aprobada'))
+            self.assertEqual(Workflow.objects.get(pk=workflow.pk).version, versiones[workflow.pk] + 1)
+        self.assertFalse(Actividad.objects.filter(workflow=self.workflows[2], id_actividad=3).exists())
+        self.assertEqual(publicar.call_count, 2)
+
+        # The incrementally maintained work queues match a full rebuild
+        colas = set(ColaTrabajo.objects.values_list('workflow_id', 'rol', 'proceso'))
+        ColaTrabajo.reconstruir()
+        self.assertEqual(set(ColaTrabajo.objects.values_list('workflow_id', 'rol', 'proceso')), colas)
+        self.assertEqual({rol for _, rol, _ in colas}, {'SCM'})
+
+    def test_rejection_requires_the_shared_comment(self):
+        ids = [workflow.pk for workflow in self.workflows[:2]]
+        datos = self.enviar('rechazar', ids)
+        self.assertEqual(datos['procesados'], 0)
+        self.assertFalse(Actividad.objects.filter(id_actividad=3).exists())
+
+        datos = self.enviar('rechazar', ids, 'Falta la rama')
+        self.assertEqual(datos['procesados'], 2)
+        self.assertEqual(
+            list(Actividad.objects.filter(id_actividad=3).values_list('estado_proceso', 'comentario').distinct()),
+            [('No Ok', 'Falta la rama')]
+        )
+
+    def test_state_is_checked_again_when_recording(self):
+        # Loaded before another reviewer approves the first workflow
+        workflows = list(Workflow.objects.with_latest_activities().filter(pk__in=[w.pk for w in self.workflows[:2]]).order_by('pk'))
+        ejecutar_transicion(workflows[0], 'aprobar', 'linea base', usuario='scm2', rol='SCM')
+
+        resultados = ejecutar_transiciones(workflows, 'aprobar', usuario='scm', rol='SCM')
+        self.assertEqual([exito for _, exito, _ in resultados], [False, True])
+        self.assertEqual(resultados[0][2], 'La acción solicitada no está permitida en el estado actual del workflow.')
+        self.assertEqual(
+            list(Actividad.objects.filter(estado_proceso='Ok').order_by('workflow_id').values_list('workflow_id', 'usuario')),
+            [(workflows[0].pk, 'scm2'), (workflows[1].pk, 'scm')]
+        )
+
+    def test_query_count_does_not_depend_on_the_number_of_workflows(self):
+        def consultas(workflows):
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertEqual(self.enviar('aprobar', [w.pk for w in workflows])['procesados'], len(workflows))
+            return len(contexto)
+
+        Workflow.objects.filter(pk=self.workflows[2].pk).update(linea_base='LB-1')
+        self.assertEqual(consultas(self.workflows[:1]), consultas(self.workflows[1:3]))
+
+
+class SyntheticDatasetTests(TestCase):
+    """generate_dataset produces deterministic histories the state machine accepts."""
+
+    def generar(self, **opciones):
+        call_command(
+            'generate_dataset', workflows=40, users_per_role=2, max_tests=5, days=60,
+            until='2030-01-31', seed=3, stdout=io.StringIO(), **opciones
+        )
+        return list(
+            Actividad.objects.order_by('workflow_id', 'id_actividad').values_list(
+                'workflow_id', 'id_actividad', 'fecha', 'usuario', 'actividad', 'estado_proceso'
+            )
+        )
+
+    def test_histories_follow_the_state_machine(self):
+        historial = self.generar(chunk_size=7)
+        self.assertEqual(Workflow.objects.count(), 40)
+        self.assertEqual(User.objects.filter(username__startswith='synjp').count(), 2)
+
+        for workflow in Workflow.objects.with_latest_activities().prefetch_related('plan_pruebas'):
+            actividades = list(
+                Actividad.objects.filter(workflow=workflow).order_by('id_actividad')
+            )
+            self.assertEqual(workflow.next_actividad, len(actividades) + 1)
+            self.assertEqual([a.fecha for a in actividades], sorted(a.fecha for a in actividades))
+            self.assertEqual(actividades[0].fecha.date(), workflow.creacion)
+
+            estado = estado_actual(workflow)
+            pruebas = list(workflow.plan_pruebas.all())
+            self.assertEqual(workflow.next_prueba, len(pruebas) + 1)
+            if estado['QA'] == 'Ok':
+                self.assertTrue(all(prueba.resultado == 'Aprobado' for prueba in pruebas))
+            if estado['QA'] == 'No Ok':
+                self.assertTrue(any(prueba.resultado == 'No aprobado' for prueba in pruebas))
+
+        # Snapshots and work queues were rebuilt from the generated log
+        self.assertEqual(WorkflowEstado.objects.count(), 40)
+        colas = set(ColaTrabajo.objects.values_list('workflow_id', 'rol', 'proceso'))
+        ColaTrabajo.reconstruir()
+        self.assertEqual(set(ColaTrabajo.objects.values_list('workflow_id', 'rol', 'proceso')), colas)
+
+        # Same seed, different chunking: the same data
+        primer_id = Workflow.objects.order_by('pk').first().pk
+        Workflow.objects.all().delete()
+        repetido = self.generar(chunk_size=40)
+        desplazamiento = Workflow.objects.order_by('pk').first().pk - primer_id
+        self.assertEqual(repetido, [(fila[0] + desplazamiento, *fila[1:]) for fila in historial])
+
+
+class ViewBenchmarkTests(TestCase):
+    """benchmark_views measures every role's views and diffs them against a baseline."""
+
+    def test_results_and_baseline_comparison(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        salida = f'{directorio}/benchmark.json'
+
+        call_command(
+            'benchmark_views', sizes='15,30', repeat=2, warmup=0, in_place=True, output=salida, stdout=io.StringIO()
+        )
+        with open(salida, encoding='utf-8') as archivo:
+            informe = json.load(archivo)
+
+        resultados = {(fila['escenario'], fila['workflows']): fila for fila in informe['resultados']}
+        self.assertEqual({workflows for _, workflows in resultados}, {15, 30})
+        for rol in ('Administrador', 'Jefe de Proyecto', 'SCM', 'Release Manager', 'QA'):
+            self.assertIn((f'dashboard[{rol}]', 30), resultados)
+        for fila in informe['resultados']:
+            self.assertEqual(fila['status'], [200], fila['escenario'])
+            self.assertGreater(fila['consultas'], 0)
+            self.assertGreater(fila['bytes'], 0)
+
+        # A view that used to need fewer queries is reported as a regression
+        fila = resultados[('dashboard[SCM]', 30)]
+        fila['consultas'] -= 1
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo)
+        salida_texto = io.StringIO()
+        with self.assertRaisesMessage(CommandError, 'regressions'):
+            call_command(
+                'benchmark_views', sizes='30', repeat=1, warmup=0, only='dashboard[SCM]', in_place=True,
+                baseline=salida, fail_on_regression=True, stdout=salida_texto
+            )
+        self.assertIn('consultas', salida_texto.getvalue())
+
+
+# The most SQL queries one request of each URL name may issue, per role, whatever
+# the amount of data; the session and user lookups are included
+PRESUPUESTO_CONSULTAS = {
+    ('workflow:dashboard', 'Administrador'): 8,
+    ('workflow:dashboard', 'Jefe de Proyecto'): 5,
+    ('workflow:dashboard', 'SCM'): 4,
+    ('workflow:dashboard', 'Release Manager'): 4,
+    ('workflow:dashboard', 'QA'): 4,
+    ('workflow:dashboard_api', 'Administrador'): 7,
+    ('workflow:dashboard_events', 'SCM'): 2,
+    ('workflow:export_workflows_csv', 'Administrador'): 3,
+    ('workflow:export_job_create', 'Administrador'): 3,
+    ('workflow:export_job_status', 'Administrador'): 3,
+    ('workflow:export_job_download', 'Administrador'): 3,
+    ('workflow:workflow_create', 'Jefe de Proyecto'): 2,
+    ('workflow:workflow_detail', 'Jefe de Proyecto'): 4,
+    ('workflow:plan_pruebas', 'Jefe de Proyecto'): 5,
+    ('workflow:workflow_detail_scm', 'SCM'): 4,
+    ('workflow:workflow_detail_rm', 'Release Manager'): 4,
+    ('workflow:workflow_detail_qa', 'QA'): 7,
+    ('workflow:qa_update_avance_ajax', 'QA'): 6,
+    ('workflow:qa_toggle_rechazar_ajax', 'QA'): 6,
+    ('workflow:qa_batch_update_ajax', 'QA'): 9,
+    # The Workflow rows, then the WorkflowEstado rows, are locked before recording.
+    # One more on backends whose bulk_create does not return primary keys (MySQL)
+    ('workflow:transiciones_lote', 'SCM'): 16,
+    ('workflow:solicitudes_lentas', 'Administrador'): 2,
+    ('users_admin:user_list', 'Administrador'): 4,
+    ('users_admin:user_create', 'Administrador'): 2,
+    ('users_admin:user_update', 'Administrador'): 3,
+}
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard'},
+    'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragments'},
+})
+class QueryBudgetTests(TestCase):
+    """
+    Every URL name stays within its query budget (PRESUPUESTO_CONSULTAS) on a
+    small and on a four times larger synthetic dataset, so the number of queries
+    does not grow with the number of workflows, activities or tests. The N+1
+    detector runs on every request as well.
+    """
+
+    TAMANOS = [40, 160]
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        ajustes = self.settings(MEDIA_ROOT=media_root)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def peticiones(self):
+        """(URL name, role, user, method, URL, data) of every budgeted request on the current data."""
+        peticiones = [
+            (f"workflow:{escenario['vista']}", escenario['rol'], escenario['usuario'],
+             escenario['metodo'], escenario['url'], escenario['datos'])
+            for escenario in benchmark.preparar_escenarios()
+        ]
+        usuario = {rol: User.objects.filter(role=rol).order_by('username').first() for _, rol in PRESUPUESTO_CONSULTAS}
+        admin, scm = usuario['Administrador'], usuario['SCM']
+        workflow = Workflow.objects.annotate(total=Count('plan_pruebas')).order_by('-total', 'pk').first()
+        jefe = User.objects.get(username=workflow.jefe_proyecto)
+
+        trabajo = TrabajoExportacion.objects.create(usuario=admin.username, filtros={}, estado='Completado')
+        trabajo.archivo.save('reporte.csv', ContentFile(b'ID\n'))
+        pendientes = list(ColaTrabajo.objects.filter(rol='SCM').values_list('workflow_id', flat=True)[:100])
+        self.assertTrue(pendientes)
+
+        return peticiones + [
+            ('workflow:dashboard_events', 'SCM', scm, 'get', reverse('workflow:dashboard_events'), {}),
+            ('workflow:export_job_create', 'Administrador', admin, 'post', reverse('workflow:export_job_create'),
+             {'componente': 'api'}),
+            ('workflow:export_job_status', 'Administrador', admin, 'get',
+             reverse('workflow:export_job_status', args=[trabajo.pk]), {}),
+            ('workflow:export_job_download', 'Administrador', admin, 'get',
+             reverse('workflow:export_job_download', args=[trabajo.pk]), {}),
+            ('workflow:workflow_create', 'Jefe de Proyecto', jefe, 'get', reverse('workflow:workflow_create'), {}),
+            ('workflow:plan_pruebas', 'Jefe de Proyecto', jefe, 'get',
+             reverse('workflow:plan_pruebas', args=[workflow.pk]), {}),
+            ('workflow:solicitudes_lentas', 'Administrador', admin, 'get', reverse('workflow:solicitudes_lentas'), {}),
+            ('users_admin:user_list', 'Administrador', admin, 'get', reverse('users_admin:user_list'), {}),
+            ('users_admin:user_create', 'Administrador', admin, 'get', reverse('users_admin:user_create'), {}),
+            ('users_admin:user_update', 'Administrador', admin, 'get',
+             reverse('users_admin:user_update', args=[scm.pk]), {}),
+            # Last: it records the approvals of the whole SCM queue
+            ('workflow:transiciones_lote', 'SCM', scm, 'post', reverse('workflow:transiciones_lote'),
+             {'accion': 'aprobar', 'workflows': pendientes}),
+        ]
+
+    def test_every_url_name_has_a_budget(self):
+        for modulo in (workflow_urls, users_admin_urls):
+            for patron in modulo.urlpatterns:
+                nombre = f'{modulo.app_name}:{patron.name}'
+                self.assertIn(nombre, {url for url, _ in PRESUPUESTO_CONSULTAS})
+
+    def test_queries_stay_within_budget_at_two_sizes(self):
+        generados = 0
+        for tamano in self.TAMANOS:
+            dataset.generar(tamano - generados, 2, timezone.now(), dias=15, max_pruebas=25, seed=5, inicio=generados)
+            generados = tamano
+
+            medidas = set()
+            for nombre, rol, usuario, metodo, url, datos in self.peticiones():
+                self.client.force_login(usuario)
+                for cache in caches.all():
+                    cache.clear()
+                with nplusone.detectar(descripcion=f'{nombre} as {rol}'), \
+                        CaptureQueriesContext(connection) as consultas:
+                    if metodo == 'json':
+                        respuesta = self.client.post(url, json.dumps(datos), content_type='application/json')
+                    else:
+                        respuesta = getattr(self.client, metodo)(url, datos)
+                    if respuesta.streaming:
+                        b''.join(respuesta.streaming_content)
+                medidas.add((nombre, rol))
+
+                presupuesto = PRESUPUESTO_CONSULTAS[nombre, rol]
+                with self.subTest(url=nombre, rol=rol, workflows=tamano):
+                    self.assertLess(respuesta.status_code, 400)
+                    self.assertLessEqual(len(consultas), presupuesto, '\n'.join(
+                        [f'{len(consultas)} queries, budget {presupuesto}:'] +
+                        [f"{numero}. {consulta['sql']}" for numero, consulta in enumerate(consultas, 1)]
+                    ))
+            self.assertEqual(medidas, set(PRESUPUESTO_CONSULTAS))
+
+
+def server_timing(respuesta):
+    """{metric: (duration, description)} of a Server-Timing header."""
+    metricas = {}
+    for entrada in respuesta['Server-Timing'].split(', '):
+        nombre, *parametros = entrada.split(';')
+        valores = dict(parametro.split('=', 1) for parametro in parametros)
+        metricas[nombre] = (float(valores['dur']), valores.get('desc', '').strip('"'))
+    return metricas
+
+
+class ServerTimingTests(TestCase):
+    """ServerTimingMiddleware reports SQL, template and view time and logs slow requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('Administrador')
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        workflow = crear_workflow()
+        registrar_actividad(workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+
+    def setUp(self):
+        timing.solicitudes_lentas.vaciar()
+        self.addCleanup(timing.solicitudes_lentas.vaciar)
+
+    def test_header_of_sync_and_async_views(self):
+        self.client.force_login(self.jefe)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('workflow:dashboard'))
+        metricas = server_timing(respuesta)
+        self.assertEqual(set(metricas), {'db', 'tpl', 'view', 'total'})
+        self.assertEqual(metricas['db'][1], f'{len(consultas)} queries')
+        self.assertGreater(metricas['tpl'][0], 0)
+        self.assertGreaterEqual(metricas['total'][0], metricas['view'][0])
+        self.assertGreaterEqual(metricas['view'][0], metricas['tpl'][0])
+
+        # The queries of async views run in a worker thread and are counted too
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('workflow:dashboard_api'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(server_timing(respuesta)['db'][1], '0 queries')
+
+    async def test_header_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        respuesta = await self.async_client.get(reverse('workflow:dashboard_api'))
+        self.assertNotEqual(server_timing(respuesta)['db'][1], '0 queries')
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0, SERVER_TIMING_BUFFER=2)
+    def test_slow_request_log(self):
+        self.client.force_login(self.jefe)
+        for _ in range(3):
+            self.client.get(reverse('workflow:dashboard'))
+        self.assertEqual(self.client.get(reverse('workflow:solicitudes_lentas')).status_code, 403)
+
+        solicitudes = timing.solicitudes_lentas.listar()
+        self.assertEqual(len(solicitudes), 2)
+        self.assertEqual({solicitud['vista'] for solicitud in solicitudes}, {'workflow:dashboard', 'workflow:solicitudes_lentas'})
+        self.assertTrue(all(solicitud['usuario'] == 'jefe' for solicitud in solicitudes))
+        self.assertGreaterEqual(solicitudes[0]['total_ms'], solicitudes[1]['total_ms'])
+
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('workflow:solicitudes_lentas'))
+        self.assertContains(respuesta, 'GET /workflow/')
+        self.client.post(reverse('workflow:solicitudes_lentas'))
+        self.assertEqual(len(timing.solicitudes_lentas.listar()), 1)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        self.client.force_login(self.jefe)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('workflow:dashboard')))
+        self.assertEqual(timing.solicitudes_lentas.listar(), [])
+
+
+class NPlusOneDetectorTests(TestCase):
+    """Queries repeated by shape from one call site are reported with that call site."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jefe = crear_usuario('Jefe de Proyecto')
+        for numero in range(8):
+            workflow = crear_workflow(id_proyecto=f'PRJ-00{numero}')
+            registrar_actividad(workflow, 'jefe', 'Creación de workflow', estado_workflow='Nuevo')
+        cls.workflow = workflow
+
+    def test_shapes_ignore_literals_and_in_list_lengths(self):
+        self.assertEqual(
+            nplusone.normalizar("SELECT *  FROM t WHERE a = 'x''y' AND b = 12 AND c IN (%s, %s, %s)"),
+            nplusone.normalizar("SELECT * FROM t WHERE a = 'z' AND b = 7 AND c IN (%s, %s)"),
+        )
+
+    def test_loop_over_rows_is_reported_at_its_line(self):
+        with self.assertRaises(nplusone.ConsultasRepetidas) as contexto:
+            with nplusone.detectar(umbral=5):
+                for workflow in Workflow.objects.all():
+                    workflow.get_actividad_workflow()
+        mensaje = str(contexto.exception)
+        self.assertIn('8x at workflow/models.py:', mensaje)
+        self.assertIn('in test_loop_over_rows_is_reported_at_its_line', mensaje)
+
+        # Under the threshold, or with the rows loaded up front, nothing is reported
+        with nplusone.detectar(umbral=8):
+            for workflow in Workflow.objects.all():
+                workflow.get_actividad_workflow()
+        with nplusone.detectar(umbral=1):
+            for workflow in Workflow.objects.with_latest_activities():
+                workflow.get_actividad_workflow()
+
+    def test_middleware_checks_each_request(self):
+        def historial_fila_por_fila(workflow):
+            return [Actividad.objects.get(pk=pk) for pk in workflow.actividades.values_list('pk', flat=True)]
+
+        for _ in range(5):
+            registrar_actividad(self.workflow, 'jefe', 'Release actualizado', estado_workflow='Nuevo')
+        url = reverse('workflow:workflow_detail', args=[self.workflow.pk])
+
+        def solicitar(modo):
+            # The middleware reads NPLUSONE when the client's handler is built
+            with override_settings(NPLUSONE=modo):
+                cliente = Client()
+                cliente.force_login(self.jefe)
+                return cliente.get(url)
+
+        with mock.patch.object(Workflow, 'get_historial', historial_fila_por_fila):
+            with self.assertRaisesMessage(nplusone.ConsultasRepetidas, f'GET {url}') as contexto:
+                solicitar('raise')
+            self.assertIn('in historial_fila_por_fila <- workflow/views.py:', str(contexto.exception))
+            with self.assertLogs('workflow.nplusone', 'WARNING') as registro:
+                self.assertEqual(solicitar('log').status_code, 200)
+            self.assertIn('6x at workflow/tests.py:', registro.output[0])
+            self.assertEqual(solicitar('off').status_code, 200)
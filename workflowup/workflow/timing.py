@@ -0,0 +1,237 @@
+"""
+Per-request performance measurement.
+
+ServerTimingMiddleware times every request and reports, in a Server-Timing
+header shown by the browser devtools:
+  db     time in SQL and number of queries (a connection execute_wrapper)
+  tpl    template rendering (the DjangoTemplates backend below)
+  view   the view, including the template rendering it does
+  total  the whole request, middleware included
+Durations overlap: SQL run from a template counts in db, tpl and view.
+Requests slower than SERVER_TIMING_SLOW_MS are kept in a bounded log of this
+process (solicitudes_lentas), shown to administrators by the
+solicitudes_lentas view. With SERVER_TIMING off the middleware removes itself
+at startup, no execute wrapper is installed and the template backend only
+checks that no request is being measured.
+"""
+import time
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates as DjangoTemplatesBase
+from django.utils import timezone
+
+# Measurement of the request being served in this context, or None
+_medicion = ContextVar('medicion', default=None)
+
+
+class Medicion:
+    """Timings of one request, in seconds."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.inicio_vista = None
+        self.vista = 0.0
+        self.plantillas = 0.0
+        self.sql = 0.0
+        self.consultas = 0
+        self._renderizando = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run and time one query of the request."""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - inicio
+            self.consultas += 1
+
+    def render(self, template, context, request):
+        """Render a template, timing only the outermost render of nested ones."""
+        self._renderizando += 1
+        inicio = time.perf_counter()
+        try:
+            return template.render(context, request)
+        finally:
+            self._renderizando -= 1
+            if not self._renderizando:
+                self.plantillas += time.perf_counter() - inicio
+
+    def header(self, total):
+        return ', '.join([
+            f'db;dur={self.sql * 1000:.1f};desc="{self.consultas} queries"',
+            f'tpl;dur={self.plantillas * 1000:.1f}',
+            f'view;dur={self.vista * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class SolicitudesLentas:
+    """Bounded log of the slow requests of this process; the oldest drop out first."""
+
+    def __init__(self, capacidad=100):
+        self._entradas = deque(maxlen=capacidad)
+        self._lock = Lock()
+
+    def configurar(self, capacidad):
+        with self._lock:
+            self._entradas = deque(self._entradas, maxlen=capacidad)
+
+    def registrar(self, entrada):
+        with self._lock:
+            self._entradas.append(entrada)
+
+    def listar(self):
+        """The logged requests, slowest first."""
+        with self._lock:
+            entradas = list(self._entradas)
+        return sorted(entradas, key=lambda entrada: entrada['total_ms'], reverse=True)
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+solicitudes_lentas = SolicitudesLentas()
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection. The measurement is looked up in the
+    context, which sync_to_async carries into the thread where async views run
+    their queries (a connection other than that of the event loop's thread).
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def _instalar(sender, connection, **kwargs):
+    """
+    Put _medir_consulta first on a connection, once; connection_created runs again
+    on every reconnect, possibly inside an execute_wrapper() block, whose wrapper
+    must stay the last one.
+    """
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_consulta)
+
+
+def medir_conexiones():
+    """
+    Time the queries of every database connection opened from now on, in any
+    thread. Called from WorkflowConfig.ready, before the first connection.
+    """
+    connection_created.connect(_instalar)
+
+
+class ServerTimingMiddleware:
+    """
+    Add the Server-Timing header to every response and log the slow requests.
+    Place it first in MIDDLEWARE so the total and the SQL count cover the
+    session and authentication lookups. The header of a streamed response
+    covers the time until the stream starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = getattr(settings, 'SERVER_TIMING_SLOW_MS', 500)
+        solicitudes_lentas.configurar(getattr(settings, 'SERVER_TIMING_BUFFER', 100))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self.terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self.terminar(request, response, medicion)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicion = _medicion.get()
+        if medicion is not None:
+            medicion.inicio_vista = time.perf_counter()
+
+    def terminar(self, request, response, medicion):
+        fin = time.perf_counter()
+        total = fin - medicion.inicio
+        if medicion.inicio_vista is not None:
+            medicion.vista = fin - medicion.inicio_vista
+        response['Server-Timing'] = medicion.header(total)
+
+        if total * 1000 >= self.umbral:
+            solicitudes_lentas.registrar({
+                'fecha': timezone.now(),
+                'metodo': request.method,
+                'ruta': request.get_full_path(),
+                'vista': request.resolver_match.view_name if request.resolver_match else '',
+                'usuario': _usuario(request),
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'vista_ms': round(medicion.vista * 1000, 1),
+                'plantillas_ms': round(medicion.plantillas * 1000, 1),
+                'sql_ms': round(medicion.sql * 1000, 1),
+                'consultas': medicion.consultas,
+            })
+        return response
+
+
+def _usuario(request):
+    """
+    Username of the request, if authentication already loaded the user: reading
+    request.user here could query the database from the event loop.
+    """
+    usuario = getattr(request, '_cached_user', None) or getattr(request, '_acached_user', None)
+    return usuario.get_username() if usuario is not None and usuario.is_authenticated else ''
+
+
+class PlantillaMedida:
+    """Template of the DjangoTemplates backend below, reporting its render time."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, nombre):
+        return getattr(self.template, nombre)
+
+    def render(self, context=None, request=None):
+        medicion = _medicion.get()
+        if medicion is None:
+            return self.template.render(context, request)
+        return medicion.render(self.template, context, request)
+
+
+class DjangoTemplates(DjangoTemplatesBase):
+    """
+    The Django template backend, timing the templates rendered while
+    ServerTimingMiddleware measures a request (tpl in Server-Timing).
+    """
+
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name))
@@ -0,0 +1,500 @@
+"""
+Declarative state machine of the workflow processes.
+
+The transition table below is the single place that defines which role can
+fire which transition in which state, and which Actividad it records. At
+import it is compiled into a lookup keyed by (role, state), so the allowed
+transitions of a workflow are resolved in O(1) from its latest-activity
+snapshot, without querying the activity log.
+"""
+from itertools import product
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Workflow, Actividad, PlanPruebaQA, WorkflowEstado, PROCESO_SNAPSHOT_FIELDS
+from .services import registrar_actividad, registrar_actividades
+
+
+PROCESOS = ('linea base', 'RM Rev', 'Diff Info', 'QA')
+ROLES_REVISORES = ('SCM', 'Release Manager', 'QA')
+ESTADOS_WORKFLOW = (None, 'Nuevo', 'Activo', 'Cancelado', 'Cerrado')
+ESTADOS_PROCESO = (None, 'En Proceso', 'Ok', 'No Ok')
+
+# Workflow helper returning the latest activity of each proceso
+_ACTIVIDAD_PROCESO = {
+    'linea base': 'get_actividad_scm1',
+    'RM Rev': 'get_actividad_rm',
+    'Diff Info': 'get_actividad_scm2',
+    'QA': 'get_actividad_qa',
+}
+
+MENSAJE_NO_PERMITIDA = 'La acción solicitada no está permitida en el estado actual del workflow.'
+MENSAJE_COMENTARIO_OBLIGATORIO = 'El comentario es obligatorio para rechazar. Por favor, ingrese el motivo del rechazo.'
+
+
+# ============================================================================
+# DATA REQUIREMENTS
+# Checks on workflow fields and test results, which are not part of the
+# activity state. Each returns an error message, or None when satisfied.
+# ============================================================================
+
+def _requiere_release(workflow, pruebas):
+    if not workflow.release or not workflow.release.strip():
+        return 'Para solicitar la revisión RM, primero debe ingresar el campo Release.'
+    return None
+
+
+def _requiere_linea_base(workflow, pruebas):
+    if not workflow.linea_base or not workflow.linea_base.strip():
+        return 'No se puede aprobar la línea base si el campo está vacío. Por favor, ingrese la línea base primero.'
+    return None
+
+
+def _requiere_codigo_rm(workflow, pruebas):
+    if not workflow.codigo_rm or not workflow.codigo_rm.strip():
+        return 'No se puede aprobar la revisión RM si el código RM está vacío. Por favor, ingrese el código RM primero.'
+    return None
+
+
+def _requiere_pruebas_aprobadas(workflow, pruebas):
+    if not pruebas:
+        return 'No hay pruebas en el plan de pruebas.'
+    if not all(prueba.resultado == 'Aprobado' for prueba in pruebas):
+        return 'No se puede aprobar el workflow. Todas las pruebas deben tener resultado "Aprobado".'
+    return None
+
+
+def _requiere_prueba_rechazada(workflow, pruebas):
+    if not any(prueba.resultado == 'No aprobado' for prueba in pruebas):
+        return 'No se puede rechazar el workflow. Al menos una prueba debe tener resultado "No aprobado".'
+    return None
+
+
+# Requirements that need the test plan loaded
+_REQUISITOS_PRUEBAS = (_requiere_pruebas_aprobadas, _requiere_prueba_rechazada)
+
+
+# ============================================================================
+# TRANSITION TABLE
+# ============================================================================
+
+def _transicion(accion, proceso, roles, cuando, registro, actividad, mensaje,
+                actividad_reintento=None, requisitos=(), comentario_obligatorio=False):
+    """
+    Declare a transition.
+
+    accion/proceso: key of the transition ('solicitar', 'aprobar', 'rechazar',
+        'cerrar', 'cancelar'; proceso is None for workflow-level actions).
+    cuando: predicate over the state dict returned by estado_actual().
+    registro: (estado_workflow, proceso, estado_proceso) of the recorded Actividad.
+    actividad_reintento: activity text used when the proceso was rejected before.
+    mensaje: success message; '{actividad}' is replaced by the activity text.
+    """
+    return {
+        'accion': accion,
+        'proceso': proceso,
+        'roles': frozenset(roles),
+        'cuando': cuando,
+        'registro': registro,
+        'actividad': actividad,
+        'actividad_reintento': actividad_reintento,
+        'mensaje': mensaje,
+        'requisitos': tuple(requisitos),
+        'comentario_obligatorio': comentario_obligatorio,
+    }
+
+
+def _activo(estado):
+    return estado['workflow'] == 'Activo'
+
+
+TRANSICIONES = [
+    # Jefe de Proyecto: process requests (re-requests after a rejection)
+    _transicion(
+        'solicitar', 'linea base', ['Jefe de Proyecto'],
+        cuando=lambda e: e['linea base'] != 'Ok',
+        registro=('Activo', 'linea base', 'En Proceso'),
+        actividad='Linea base solicitada',
+        actividad_reintento='Re solicitud de linea base',
+        mensaje='{actividad} exitosamente.',
+    ),
+    _transicion(
+        'solicitar', 'RM Rev', ['Jefe de Proyecto'],
+        cuando=lambda e: e['RM Rev'] != 'Ok' and (e['linea base'] == 'Ok' or e['RM Rev'] == 'No Ok'),
+        registro=('Activo', 'RM Rev', 'En Proceso'),
+        actividad='Revision RM solicitada',
+        actividad_reintento='Re solicitud de Revision RM',
+        mensaje='{actividad} exitosamente.',
+        requisitos=[_requiere_release],
+    ),
+    _transicion(
+        'solicitar', 'Diff Info', ['Jefe de Proyecto'],
+        cuando=lambda e: e['Diff Info'] != 'Ok' and (e['RM Rev'] == 'Ok' or e['Diff Info'] == 'No Ok'),
+        registro=('Activo', 'Diff Info', 'En Proceso'),
+        actividad='Informe diferencias solicitado',
+        actividad_reintento='Re solicitud de Informe diferencias',
+        mensaje='{actividad} exitosamente.',
+    ),
+    _transicion(
+        'solicitar', 'QA', ['Jefe de Proyecto'],
+        cuando=lambda e: e['QA'] != 'Ok' and (e['Diff Info'] == 'Ok' or e['QA'] == 'No Ok'),
+        registro=('Activo', 'QA', 'En Proceso'),
+        actividad='Pruebas QA solicitadas',
+        actividad_reintento='Re solicitud de pruebas QA',
+        mensaje='{actividad} exitosamente.',
+    ),
+
+    # Jefe de Proyecto: workflow closure and cancellation
+    _transicion(
+        'cerrar', None, ['Jefe de Proyecto'],
+        cuando=lambda e: e['QA'] == 'Ok',
+        registro=('Cerrado', '', ''),
+        actividad='Workflow cerrado exitosamente',
+        mensaje='Workflow cerrado exitosamente.',
+    ),
+    _transicion(
+        'cancelar', None, ['Jefe de Proyecto'],
+        cuando=lambda e: True,
+        registro=('Cancelado', None, None),
+        actividad='Workflow Cancelado',
+        mensaje='Workflow cancelado exitosamente.',
+    ),
+
+    # SCM: linea base takes precedence over Diff Info when both are pending
+    _transicion(
+        'aprobar', 'linea base', ['SCM'],
+        cuando=lambda e: _activo(e) and e['linea base'] == 'En Proceso',
+        registro=('Activo', 'linea base', 'Ok'),
+        actividad='Linea base aprobada',
+        mensaje='{actividad} exitosamente.',
+        requisitos=[_requiere_linea_base],
+    ),
+    _transicion(
+        'rechazar', 'linea base', ['SCM'],
+        cuando=lambda e: _activo(e) and e['linea base'] == 'En Proceso',
+        registro=('Activo', 'linea base', 'No Ok'),
+        actividad='Linea base rechazada',
+        mensaje='{actividad} exitosamente.',
+        comentario_obligatorio=True,
+    ),
+    _transicion(
+        'aprobar', 'Diff Info', ['SCM'],
+        cuando=lambda e: _activo(e) and e['linea base'] != 'En Proceso' and e['Diff Info'] == 'En Proceso',
+        registro=('Activo', 'Diff Info', 'Ok'),
+        actividad='Informe diferencias aprobado',
+        mensaje='{actividad} exitosamente.',
+    ),
+    _transicion(
+        'rechazar', 'Diff Info', ['SCM'],
+        cuando=lambda e: _activo(e) and e['linea base'] != 'En Proceso' and e['Diff Info'] == 'En Proceso',
+        registro=('Activo', 'Diff Info', 'No Ok'),
+        actividad='Informe diferencias rechazado',
+        mensaje='{actividad} exitosamente.',
+        comentario_obligatorio=True,
+    ),
+
+    # Release Manager
+    _transicion(
+        'aprobar', 'RM Rev', ['Release Manager'],
+        cuando=lambda e: _activo(e) and e['RM Rev'] == 'En Proceso',
+        registro=('Activo', 'RM Rev', 'Ok'),
+        actividad='Codigo RM enviado',
+        mensaje='Código RM enviado exitosamente.',
+        requisitos=[_requiere_codigo_rm],
+    ),
+    _transicion(
+        'rechazar', 'RM Rev', ['Release Manager'],
+        cuando=lambda e: _activo(e) and e['RM Rev'] == 'En Proceso',
+        registro=('Activo', 'RM Rev', 'No Ok'),
+        actividad='Revision RM Rechazada',
+        mensaje='Revisión RM rechazada exitosamente.',
+        comentario_obligatorio=True,
+    ),
+
+    # QA
+    _transicion(
+        'aprobar', 'QA', ['QA'],
+        cuando=lambda e: _activo(e) and e['QA'] == 'En Proceso',
+        registro=('Activo', 'QA', 'Ok'),
+        actividad='Aprobado por QA',
+        mensaje='Workflow aprobado por QA exitosamente.',
+        requisitos=[_requiere_pruebas_aprobadas],
+    ),
+    _transicion(
+        'rechazar', 'QA', ['QA'],
+        cuando=lambda e: _activo(e) and e['QA'] == 'En Proceso',
+        registro=('Activo', 'QA', 'No Ok'),
+        actividad='Rechazado por QA',
+        mensaje='Workflow rechazado por QA exitosamente.',
+        requisitos=[_requiere_prueba_rechazada],
+        comentario_obligatorio=True,
+    ),
+]
+
+
+# ============================================================================
+# COMPILED LOOKUP
+# ============================================================================
+
+def _clave(estado):
+    """Hashable key of a state dict: (estado_workflow, estado of each proceso)."""
+    return (estado['workflow'],) + tuple(estado[proceso] for proceso in PROCESOS)
+
+
+def _compilar(transiciones):
+    """
+    Evaluate every transition predicate over every possible state once.
+    Returns the transitions indexed by (accion, proceso), the allowed
+    (accion, proceso) pairs per (rol, state key), and the proceso pending
+    on each reviewer role per (rol, state key).
+    """
+    tabla = {}
+    for transicion in transiciones:
+        clave_transicion = (transicion['accion'], transicion['proceso'])
+        if clave_transicion in tabla:
+            raise ValueError(f'Transición duplicada: {clave_transicion}')
+        tabla[clave_transicion] = transicion
+
+    roles = {rol for transicion in transiciones for rol in transicion['roles']}
+    permitidas = {}
+    pendientes = {}
+
+    for valores in product(ESTADOS_WORKFLOW, *([ESTADOS_PROCESO] * len(PROCESOS))):
+        estado = dict(zip(('workflow',) + PROCESOS, valores))
+        for rol in roles:
+            acciones = frozenset(
+                (transicion['accion'], transicion['proceso'])
+                for transicion in transiciones
+                if rol in transicion['roles'] and transicion['cuando'](estado)
+            )
+            permitidas[(rol, valores)] = acciones
+            for accion, proceso in acciones:
+                if accion == 'aprobar':
+                    pendientes[(rol, valores)] = proceso
+
+    return tabla, permitidas, pendientes
+
+
+_TABLA, _PERMITIDAS, _PENDIENTES = _compilar(TRANSICIONES)
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def construir_estado(actividad_workflow, actividades_proceso):
+    """
+    Build the state dict from the latest general activity and a
+    {proceso: latest activity or None} dict.
+    """
+    estado = {'workflow': actividad_workflow.estado_workflow if actividad_workflow else None}
+    for proceso in PROCESOS:
+        actividad = actividades_proceso.get(proceso)
+        estado[proceso] = actividad.estado_proceso if actividad else None
+
+    # Values outside the known choices are treated as "never requested"
+    if estado['workflow'] not in ESTADOS_WORKFLOW:
+        estado['workflow'] = None
+    for proceso in PROCESOS:
+        if estado[proceso] not in ESTADOS_PROCESO:
+            estado[proceso] = None
+    return estado
+
+
+def estado_actual(workflow):
+    """
+    Build the state dict of a workflow from its latest activities.
+    Load the workflow with Workflow.objects.with_latest_activities() so this
+    issues no queries.
+    """
+    return construir_estado(
+        workflow.get_actividad_workflow(),
+        {proceso: getattr(workflow, helper)() for proceso, helper in _ACTIVIDAD_PROCESO.items()}
+    )
+
+
+def procesos_pendientes(estado):
+    """{rol: proceso} of every reviewer role with pending work in this state."""
+    pendientes = {}
+    for rol in ROLES_REVISORES:
+        proceso = proceso_pendiente(rol, estado)
+        if proceso is not None:
+            pendientes[rol] = proceso
+    return pendientes
+
+
+def acciones_permitidas(rol, estado):
+    """Set of (accion, proceso) pairs the role may fire in this state."""
+    return _PERMITIDAS.get((rol, _clave(estado)), frozenset())
+
+
+def proceso_pendiente(rol, estado):
+    """Proceso waiting for review by the role in this state, or None."""
+    return _PENDIENTES.get((rol, _clave(estado)))
+
+
+def _pruebas_requeridas(transicion, workflow, pruebas):
+    if pruebas is None and any(requisito in _REQUISITOS_PRUEBAS for requisito in transicion['requisitos']):
+        pruebas = list(workflow.plan_pruebas.all())
+    return pruebas
+
+
+def acciones_habilitadas(workflow, rol, estado, pruebas=None):
+    """
+    Set of (accion, proceso) pairs the role may fire now: allowed in this state
+    and with every data requirement satisfied. Used to enable the action buttons.
+    """
+    habilitadas = set()
+    for clave_transicion in acciones_permitidas(rol, estado):
+        transicion = _TABLA[clave_transicion]
+        pruebas = _pruebas_requeridas(transicion, workflow, pruebas)
+        if not any(requisito(workflow, pruebas) for requisito in transicion['requisitos']):
+            habilitadas.add(clave_transicion)
+    return habilitadas
+
+
+def texto_actividad(accion, proceso, estado):
+    """Actividad text recorded by a transition in this state (the re-request text after a rejection)."""
+    transicion = _TABLA[(accion, proceso)]
+    if transicion['actividad_reintento'] and estado.get(proceso) == 'No Ok':
+        return transicion['actividad_reintento']
+    return transicion['actividad']
+
+
+def registro_transicion(accion, proceso):
+    """(estado_workflow, proceso, estado_proceso) of the Actividad a transition records."""
+    return _TABLA[(accion, proceso)]['registro']
+
+
+def comentario_obligatorio(accion, proceso):
+    """Whether a transition requires a comentario."""
+    return _TABLA[(accion, proceso)]['comentario_obligatorio']
+
+
+def _validar_transicion(workflow, accion, proceso, rol, estado, comentario, pruebas):
+    """
+    Check a transition against the state and the data requirements.
+    Returns (transition, activity text, stripped comentario).
+    Raises ValidationError with a user-facing message when it is not allowed.
+    """
+    if (accion, proceso) not in acciones_permitidas(rol, estado):
+        raise ValidationError(MENSAJE_NO_PERMITIDA)
+
+    transicion = _TABLA[(accion, proceso)]
+    pruebas = _pruebas_requeridas(transicion, workflow, pruebas)
+    for requisito in transicion['requisitos']:
+        error = requisito(workflow, pruebas)
+        if error:
+            raise ValidationError(error)
+
+    comentario = (comentario or '').strip()
+    if transicion['comentario_obligatorio'] and not comentario:
+        raise ValidationError(MENSAJE_COMENTARIO_OBLIGATORIO)
+
+    return transicion, texto_actividad(accion, proceso, estado), comentario
+
+
+def _bloquear_snapshots(workflow_ids):
+    """
+    Lock the WorkflowEstado rows of the workflows until the end of the transaction
+    and return them by workflow_id, with their latest activities. A concurrent
+    transition on the same workflow waits here, then reads the activity recorded
+    by the first one, so a state read earlier cannot be acted on twice.
+    The Workflow rows are locked first, in pk order: every activity insert takes
+    the Workflow row (the id reservation) before the snapshot, and the opposite
+    order here could deadlock with it.
+    """
+    list(Workflow.objects.select_for_update().filter(pk__in=workflow_ids).order_by('pk').values_list('pk', flat=True))
+    return WorkflowEstado.objects.select_for_update().select_related(
+        'actividad_workflow', *PROCESO_SNAPSHOT_FIELDS.values()
+    ).in_bulk(workflow_ids)
+
+
+def _estado_snapshot(snapshot):
+    """State dict of a WorkflowEstado row, or that of a workflow without activities for None."""
+    if snapshot is None:
+        return construir_estado(None, {})
+    return snapshot.get_estado()
+
+
+def ejecutar_transicion(workflow, accion, proceso, usuario, rol, comentario='', pruebas=None):
+    """
+    Validate a transition against the current state and record its Actividad.
+    The state is read again from the locked WorkflowEstado row inside the
+    transaction that records the activity, not from the loaded workflow.
+    Returns (actividad, success message).
+    Raises ValidationError with a user-facing message when it is not allowed.
+    """
+    with transaction.atomic():
+        estado = _estado_snapshot(_bloquear_snapshots([workflow.pk]).get(workflow.pk))
+        transicion, texto, comentario = _validar_transicion(
+            workflow, accion, proceso, rol, estado, comentario, pruebas
+        )
+
+        estado_workflow, proceso_registro, estado_proceso = transicion['registro']
+        actividad = registrar_actividad(
+            workflow=workflow,
+            usuario=usuario,
+            estado_workflow=estado_workflow,
+            proceso=proceso_registro,
+            estado_proceso=estado_proceso,
+            actividad=texto,
+            comentario=comentario or None
+        )
+    return actividad, transicion['mensaje'].format(actividad=texto)
+
+
+def ejecutar_transiciones(workflows, accion, usuario, rol, comentario=''):
+    """
+    Fire `accion` ('aprobar' or 'rechazar') on the proceso each workflow has
+    pending for a reviewer role. Inside one transaction, the WorkflowEstado rows
+    of all the workflows are locked and read in one query, each workflow is
+    validated against its own locked state, and the activities of the valid ones
+    are recorded together. The test plans, when a requirement needs them, are
+    read in one query for all of them.
+    Returns [(workflow, success, message)] in the given order.
+    """
+    with transaction.atomic():
+        snapshots = _bloquear_snapshots([workflow.pk for workflow in workflows])
+
+        pruebas_por_workflow = None
+        if any(
+            requisito in _REQUISITOS_PRUEBAS
+            for transicion in TRANSICIONES
+            if transicion['accion'] == accion and rol in transicion['roles']
+            for requisito in transicion['requisitos']
+        ):
+            pruebas_por_workflow = {workflow.pk: [] for workflow in workflows}
+            for prueba in PlanPruebaQA.objects.filter(workflow__in=workflows).only('workflow', 'resultado'):
+                pruebas_por_workflow[prueba.workflow_id].append(prueba)
+
+        resultados, actividades = [], []
+        for workflow in workflows:
+            estado = _estado_snapshot(snapshots.get(workflow.pk))
+            proceso = proceso_pendiente(rol, estado)
+            try:
+                if proceso is None:
+                    raise ValidationError(MENSAJE_NO_PERMITIDA)
+                transicion, texto, comentario_transicion = _validar_transicion(
+                    workflow, accion, proceso, rol, estado, comentario,
+                    pruebas_por_workflow[workflow.pk] if pruebas_por_workflow is not None else None
+                )
+            except ValidationError as e:
+                resultados.append((workflow, False, e.messages[0]))
+                continue
+
+            estado_workflow, proceso_registro, estado_proceso = transicion['registro']
+            actividades.append(Actividad(
+                workflow=workflow,
+                usuario=usuario,
+                estado_workflow=estado_workflow,
+                proceso=proceso_registro,
+                estado_proceso=estado_proceso,
+                actividad=texto,
+                comentario=comentario_transicion or None
+            ))
+            resultados.append((workflow, True, transicion['mensaje'].format(actividad=texto)))
+
+        registrar_actividades(actividades)
+    return resultados
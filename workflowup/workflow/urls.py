@@ -9,7 +9,13 @@ app_name = 'workflow'
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('dashboard-api/', views.dashboard_api, name='dashboard_api'),
+    path('events/', views.dashboard_events, name='dashboard_events'),
     path('export-csv/', views.export_workflows_csv, name='export_workflows_csv'),
+    path('export-jobs/', views.export_job_create, name='export_job_create'),
+    path('export-jobs/<int:id_trabajo>/', views.export_job_status, name='export_job_status'),
+    path('export-jobs/<int:id_trabajo>/download/', views.export_job_download, name='export_job_download'),
+    path('transiciones/', views.transiciones_lote, name='transiciones_lote'),
+    path('rendimiento/', views.solicitudes_lentas, name='solicitudes_lentas'),
     path('create/', views.workflow_create, name='workflow_create'),
     path('<int:id_workflow>/', views.workflow_detail, name='workflow_detail'),
     path('<int:id_workflow>/plan-pruebas/', views.plan_pruebas, name='plan_pruebas'),
@@ -18,4 +24,5 @@ urlpatterns = [
     path('<int:id_workflow>/qa/', views.workflow_detail_qa, name='workflow_detail_qa'),
     path('<int:id_workflow>/qa/<int:id_prueba>/update-avance/', views.qa_update_avance_ajax, name='qa_update_avance_ajax'),
     path('<int:id_workflow>/qa/<int:id_prueba>/toggle-rechazar/', views.qa_toggle_rechazar_ajax, name='qa_toggle_rechazar_ajax'),
+    path('<int:id_workflow>/qa/batch/', views.qa_batch_update_ajax, name='qa_batch_update_ajax'),
 ]
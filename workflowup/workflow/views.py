@@ -3,19 +3,118 @@ Views for the workflow app.
 Main application area accessible to all authenticated users.
 """
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
-from django.db.models import Max, Q, OuterRef, Subquery, Count
-from django.http import JsonResponse, HttpResponse
+from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Count, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.conf import settings
 from django.utils import timezone
-import csv
+from django.utils.http import urlencode
+import hashlib
+import json
+import os
 from datetime import datetime
-from .models import Workflow, PlanPruebaQA, Actividad
-from .forms import WorkflowCreateForm, PlanPruebaCreateForm, ReleaseUpdateForm, LineaBaseUpdateForm, FechasUpdateForm, CodigoRMUpdateForm
+from functools import wraps
+from .models import Workflow, PlanPruebaQA, Actividad, ColaTrabajo, TrabajoExportacion, VersionDatos
+from . import timing
+from .events import broker, evento_visible
+from .services import (
+    registrar_actividad, registrar_prueba, importar_pruebas, actualizar_pruebas, completar_pruebas,
+    reinyectar_pruebas_rechazadas
+)
+from .reports import (
+    admin_dashboard_data, aadmin_dashboard_data, decode_historial_cursor, parse_admin_filters, get_filtered_workflows,
+    iter_export_rows, iter_csv, iter_gzip
+)
+from .transitions import (
+    PROCESOS, ROLES_REVISORES, estado_actual, acciones_habilitadas, proceso_pendiente, ejecutar_transicion,
+    ejecutar_transiciones
+)
+from .forms import WorkflowCreateForm, PlanPruebaCreateForm, PlanPruebaImportForm, ReleaseUpdateForm, LineaBaseUpdateForm, FechasUpdateForm, CodigoRMUpdateForm
+
+
+# ============================================================================
+# CONDITIONAL GET
+# ============================================================================
+
+def _version_datos(request):
+    """
+    Global data version for this request (read once), or None when the response
+    must not be validated, e.g. while flash messages are waiting to be shown.
+    """
+    if not hasattr(request, '_version_datos'):
+        request._version_datos = None if _mensajes_pendientes(request) else VersionDatos.actual()
+    return request._version_datos
+
+
+def _mensajes_pendientes(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _dashboard_etag(request, *args, **kwargs):
+    """
+    ETag of a dashboard response: data version, user and normalized query parameters.
+    The CSRF cookie is included so a page is never revalidated across sessions.
+    The reviewer dashboards show how long each workflow has waited in the queue,
+    which changes with no data write: theirs includes the current minute too.
+    """
+    version = _version_datos(request)
+    if version is None:
+        return None
+    clave = [
+        str(version.version),
+        str(request.user.pk),
+        request.user.role,
+        urlencode(sorted((nombre, sorted(valores)) for nombre, valores in request.GET.lists()), doseq=True),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+    if request.user.role in ROLES_REVISORES:
+        clave.append(str(int(timezone.now().timestamp() // 60)))
+    clave = '|'.join(clave)
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+
+def _dashboard_last_modified(request, *args, **kwargs):
+    """
+    Last-Modified of a dashboard response: time of the last data write.
+    """
+    version = _version_datos(request)
+    return version.modificado if version is not None else None
+
+
+# Revalidate on every use, and only in the browser's private cache
+dashboard_condition = condition(etag_func=_dashboard_etag, last_modified_func=_dashboard_last_modified)
+
+
+def adashboard_condition(view):
+    """
+    dashboard_condition for async views. The user and the data version read by
+    the ETag and Last-Modified callbacks are resolved first without blocking the
+    event loop; the message storage has no async API and runs in a thread.
+    """
+    condicional = dashboard_condition(view)
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not hasattr(request, '_version_datos'):
+            pendientes = await sync_to_async(_mensajes_pendientes)(request)
+            request._version_datos = None if pendientes else await VersionDatos.aactual()
+        return await condicional(request, *args, **kwargs)
+
+    return inner
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@dashboard_condition
 def dashboard(request):
     """
     Main workflow dashboard.
@@ -23,9 +122,10 @@ def dashboard(request):
     """
     if request.user.role == 'Jefe de Proyecto':
         # Get workflows for this project manager
-        workflows = Workflow.objects.filter(
+        # The latest activity is read from the WorkflowEstado snapshot in the same query
+        workflows = Workflow.objects.with_latest_activities().filter(
             jefe_proyecto=request.user.username
-        ).prefetch_related('actividades')
+        )
 
         # Apply filters from GET parameters
         id_proyecto = request.GET.get('id_proyecto', '').strip()
@@ -44,27 +144,18 @@ def dashboard(request):
             workflows = workflows.filter(creacion__lte=fecha_hasta)
 
         # Filter out workflows with estado_workflow = 'Cancelado' or 'Cerrado'
+        # Workflows without activities are kept (estado would be N/A)
+        workflows = workflows.exclude(
+            estado__actividad_workflow__estado_workflow__in=['Cancelado', 'Cerrado']
+        )
+
         # Also apply estado filter if provided
-        active_workflows = []
-        for workflow in workflows:
-            ultima_actividad = workflow.get_actividad_workflow()
-            if ultima_actividad:
-                # Exclude Cancelado and Cerrado
-                if ultima_actividad.estado_workflow not in ['Cancelado', 'Cerrado']:
-                    # Apply estado filter if provided
-                    if estado_filtro:
-                        if ultima_actividad.estado_workflow == estado_filtro:
-                            active_workflows.append(workflow)
-                    else:
-                        active_workflows.append(workflow)
-            else:
-                # No activities yet, include it (estado would be N/A)
-                if not estado_filtro:  # Only include if no estado filter
-                    active_workflows.append(workflow)
+        if estado_filtro:
+            workflows = workflows.filter(estado__actividad_workflow__estado_workflow=estado_filtro)
 
         # Prepare data for display
         workflow_data = []
-        for workflow in active_workflows:
+        for workflow in workflows:
             ultima_actividad = workflow.get_actividad_workflow()
             workflow_data.append({
                 'workflow': workflow,
@@ -74,23 +165,16 @@ def dashboard(request):
             })
 
         # Get unique project IDs for filter dropdown
-        # Get all workflows for this jefe (without date/estado filters) to build the project list
-        all_workflows = Workflow.objects.filter(
-            jefe_proyecto=request.user.username
-        ).prefetch_related('actividades')
-
-        project_ids = set()
-        for workflow in all_workflows:
-            ultima_actividad = workflow.get_actividad_workflow()
-            if ultima_actividad:
-                if ultima_actividad.estado_workflow in ['Nuevo', 'Activo']:
-                    project_ids.add(workflow.id_proyecto)
-            else:
-                # No activities yet, consider it as active
-                project_ids.add(workflow.id_proyecto)
-
-        # Sort project IDs alphabetically
-        project_ids_sorted = sorted(project_ids)
+        # Active workflows of this jefe (without date/estado filters);
+        # workflows without activities yet are considered active
+        project_ids_sorted = list(
+            Workflow.objects.filter(
+                jefe_proyecto=request.user.username
+            ).filter(
+                Q(estado__actividad_workflow__estado_workflow__in=['Nuevo', 'Activo']) |
+                Q(estado__actividad_workflow__isnull=True)
+            ).order_by('id_proyecto').values_list('id_proyecto', flat=True).distinct()
+        )
 
         context = {
             'workflow_data': workflow_data,
@@ -99,39 +183,19 @@ def dashboard(request):
         return render(request, 'workflow/dashboard_jp.html', context)
 
     elif request.user.role == 'SCM':
-        # Get all workflows with SCM activities in process
-        # "lista de actividades scm": QuerySet where latest activity has:
-        # (proceso='linea base' AND estado_proceso='En Proceso') OR
-        # (proceso='Diff Info' AND estado_proceso='En Proceso')
-        all_workflows = Workflow.objects.all().prefetch_related('actividades')
+        # "lista de actividades scm": active workflows whose latest
+        # 'linea base' or 'Diff Info' activity is 'En Proceso'.
+        # Read from the SCM work queue, oldest pending item first
+        cola = ColaTrabajo.objects.filter(rol='SCM').select_related('workflow')
 
         scm_workflows = []
-        for workflow in all_workflows:
-            # Get the latest activity
-            ultima_actividad = workflow.get_actividad_workflow()
-
-            # Check if workflow should be included in SCM list
-            if ultima_actividad:
-                # Include if estado_workflow is 'Activo' (exclude Cancelado/Cerrado)
-                if ultima_actividad.estado_workflow == 'Activo':
-                    # Check if SCM needs to act on this workflow
-                    actividad_scm1 = workflow.get_actividad_scm1()
-                    actividad_scm2 = workflow.get_actividad_scm2()
-
-                    # Include if linea base is in process
-                    if actividad_scm1 and actividad_scm1.estado_proceso == 'En Proceso':
-                        scm_workflows.append({
-                            'workflow': workflow,
-                            'proceso': 'linea base',
-                            'estado_workflow': ultima_actividad.estado_workflow,
-                        })
-                    # Or if Diff Info is in process
-                    elif actividad_scm2 and actividad_scm2.estado_proceso == 'En Proceso':
-                        scm_workflows.append({
-                            'workflow': workflow,
-                            'proceso': 'Diff Info',
-                            'estado_workflow': ultima_actividad.estado_workflow,
-                        })
+        for item in cola:
+            scm_workflows.append({
+                'workflow': item.workflow,
+                'proceso': item.proceso,
+                'estado_workflow': 'Activo',
+                'encolado': item.encolado,
+            })
 
         context = {
             'scm_workflows': scm_workflows,
@@ -139,29 +203,21 @@ def dashboard(request):
         return render(request, 'workflow/dashboard_scm.html', context)
 
     elif request.user.role == 'Release Manager':
-        # Get all workflows with RM Rev activities in process
-        all_workflows = Workflow.objects.all().prefetch_related('actividades')
-
-        rm_workflows = []
-        for workflow in all_workflows:
-            # Verify general workflow state
-            ultima_actividad = workflow.get_actividad_workflow()
-            if ultima_actividad and ultima_actividad.estado_workflow == 'Activo':
-                # Check if RM Rev process is in progress
-                actividad_rm = workflow.get_actividad_rm()
-                if actividad_rm and actividad_rm.estado_proceso == 'En Proceso':
-                    rm_workflows.append(workflow)
+        # Active workflows with RM Rev in process, from the RM work queue
+        cola = ColaTrabajo.objects.filter(rol='Release Manager').select_related(
+            'workflow__estado__actividad_rm'
+        )
 
         # Prepare data for display
         workflow_data = []
-        for workflow in rm_workflows:
-            ultima_actividad = workflow.get_actividad_workflow()
-            actividad_rm = workflow.get_actividad_rm()
+        for item in cola:
+            actividad_rm = item.workflow.get_actividad_rm()
             workflow_data.append({
-                'workflow': workflow,
-                'estado_workflow': ultima_actividad.estado_workflow if ultima_actividad else 'N/A',
-                'proceso': actividad_rm.proceso if actividad_rm else 'N/A',
+                'workflow': item.workflow,
+                'estado_workflow': 'Activo',
+                'proceso': item.proceso,
                 'actividad': actividad_rm.actividad if actividad_rm else 'N/A',
+                'encolado': item.encolado,
             })
 
         context = {
@@ -170,29 +226,21 @@ def dashboard(request):
         return render(request, 'workflow/dashboard_rm.html', context)
 
     elif request.user.role == 'QA':
-        # Get all workflows with QA process in progress
-        all_workflows = Workflow.objects.all().prefetch_related('actividades')
-
-        qa_workflows = []
-        for workflow in all_workflows:
-            # Verify general workflow state
-            ultima_actividad = workflow.get_actividad_workflow()
-            if ultima_actividad and ultima_actividad.estado_workflow == 'Activo':
-                # Check if QA process is in progress
-                actividad_qa = workflow.get_actividad_qa()
-                if actividad_qa and actividad_qa.estado_proceso == 'En Proceso':
-                    qa_workflows.append(workflow)
+        # Active workflows with QA in process, from the QA work queue
+        cola = ColaTrabajo.objects.filter(rol='QA').select_related(
+            'workflow__estado__actividad_qa'
+        )
 
         # Prepare data for display
         workflow_data = []
-        for workflow in qa_workflows:
-            ultima_actividad = workflow.get_actividad_workflow()
-            actividad_qa = workflow.get_actividad_qa()
+        for item in cola:
+            actividad_qa = item.workflow.get_actividad_qa()
             workflow_data.append({
-                'workflow': workflow,
-                'estado_workflow': ultima_actividad.estado_workflow if ultima_actividad else 'N/A',
-                'proceso': actividad_qa.proceso if actividad_qa else 'N/A',
+                'workflow': item.workflow,
+                'estado_workflow': 'Activo',
+                'proceso': item.proceso,
                 'actividad': actividad_qa.actividad if actividad_qa else 'N/A',
+                'encolado': item.encolado,
             })
 
         context = {
@@ -202,20 +250,14 @@ def dashboard(request):
 
     # Dashboard for Administrator role
     elif request.user.role == 'Administrador':
-        # Get all workflows with their latest activity
-        workflows_with_latest = _get_workflows_with_latest_activity()
-
-        # Apply filters if provided
-        filtered_workflows = _apply_admin_filters(request, workflows_with_latest)
-
-        # Calculate statistics
-        stats = _calculate_workflow_stats(filtered_workflows)
-
-        # Calculate process/state matrix
-        matrix = _calculate_process_state_matrix(filtered_workflows)
-
-        # Prepare detailed list
-        workflow_details = _prepare_workflow_details(filtered_workflows)
+        # Statistics, matrix and the first page of the detailed list (cached per data version)
+        filtros = parse_admin_filters(request.GET)
+        datos = admin_dashboard_data(filtros, version=_version_datos(request))
+        stats = datos['stats']
+        matrix = datos['matrix']
+        workflow_details = datos['workflow_details']
+        next_cursor = datos['next_cursor']
+        total_registros = datos['total_registros']
 
         # Get filter options
         usuarios = Actividad.objects.values_list('usuario', flat=True).distinct().order_by('usuario')
@@ -241,6 +283,8 @@ def dashboard(request):
             'stats': stats,
             'matrix_rows': matrix_rows,
             'workflow_details': workflow_details,
+            'next_cursor': next_cursor,
+            'total_registros': total_registros,
             'usuarios': usuarios,
             # Filter values for form persistence
             'filter_fecha_desde': request.GET.get('fecha_desde', ''),
@@ -250,6 +294,7 @@ def dashboard(request):
             'filter_id_proyecto': request.GET.get('id_proyecto', ''),
             'filter_nom_proyecto': request.GET.get('nom_proyecto', ''),
             'filter_componente': request.GET.get('componente', ''),
+            'filter_archivados': filtros['archivados'],
         }
         return render(request, 'workflow/dashboard.html', context)
 
@@ -277,9 +322,8 @@ def workflow_create(request):
             workflow.save()
 
             # Create initial activity
-            Actividad.objects.create(
+            registrar_actividad(
                 workflow=workflow,
-                id_actividad=1,
                 usuario=request.user.username,
                 estado_workflow='Nuevo',
                 proceso=None,
@@ -305,12 +349,15 @@ def workflow_detail(request, id_workflow):
     View workflow details (only accessible by the workflow's jefe_proyecto).
     Handles release updates and activity creation.
     """
-    workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
+    workflow = get_object_or_404(Workflow.objects.with_latest_activities(), id_workflow=id_workflow)
 
     # Verify user is the jefe de proyecto
     if request.user.username != workflow.jefe_proyecto:
         raise PermissionDenied("Solo el jefe de proyecto puede ver este workflow.")
 
+    # Current process states, read once from the latest-activity snapshot
+    estado = estado_actual(workflow)
+
     # Handle release update
     if request.method == 'POST' and 'update_release' in request.POST:
         release_form = ReleaseUpdateForm(request.POST, instance=workflow)
@@ -327,175 +374,74 @@ def workflow_detail(request, id_workflow):
             messages.success(request, 'Fechas actualizadas exitosamente.')
             return redirect('workflow:workflow_detail', id_workflow=id_workflow)
 
-    # Handle workflow cancellation
+    # Handle workflow cancellation, closure and process requests
+    # (linea base, RM Rev, Diff Info, QA) through the state machine
+    transicion = None
     if request.method == 'POST' and 'cancel_workflow' in request.POST:
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create cancellation activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Cancelado',
-            proceso=None,
-            estado_proceso=None,
-            actividad='Workflow Cancelado',
-            comentario=None
-        )
-
-        messages.success(request, 'Workflow cancelado exitosamente.')
-        return redirect('workflow:workflow_detail', id_workflow=id_workflow)
-
-    # Handle workflow closure
-    if request.method == 'POST' and 'close_workflow' in request.POST:
-        comentario = request.POST.get('comentario', '').strip()
-
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create closure activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Cerrado',
-            proceso='',
-            estado_proceso='',
-            actividad='Workflow cerrado exitosamente',
-            comentario=comentario if comentario else None
-        )
-
-        messages.success(request, 'Workflow cerrado exitosamente.')
-        return redirect('workflow:workflow_detail', id_workflow=id_workflow)
-
-    # Handle process requests (linea base, RM Rev, Diff Info, QA)
-    if request.method == 'POST' and 'proceso_request' in request.POST:
+        transicion = ('cancelar', None)
+    elif request.method == 'POST' and 'close_workflow' in request.POST:
+        transicion = ('cerrar', None)
+    elif request.method == 'POST' and 'proceso_request' in request.POST:
         proceso = request.POST.get('proceso')
-        comentario = request.POST.get('comentario', '')
-
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Determine if it's a re-request
-        ultima_actividad = workflow.get_actividad_workflow()
-        is_rechazo = False
-
-        if proceso == 'linea base':
-            actividad_scm1 = workflow.get_actividad_scm1()
-            is_rechazo = actividad_scm1 and actividad_scm1.estado_proceso == 'No Ok'
-            actividad_text = 'Re solicitud de linea base' if is_rechazo else 'Linea base solicitada'
-        elif proceso == 'RM Rev':
-            actividad_rm = workflow.get_actividad_rm()
-            is_rechazo = actividad_rm and actividad_rm.estado_proceso == 'No Ok'
-            actividad_text = 'Re solicitud de Revision RM' if is_rechazo else 'Revision RM solicitada'
-        elif proceso == 'Diff Info':
-            actividad_scm2 = workflow.get_actividad_scm2()
-            is_rechazo = actividad_scm2 and actividad_scm2.estado_proceso == 'No Ok'
-            actividad_text = 'Re solicitud de Informe diferencias' if is_rechazo else 'Informe diferencias solicitado'
-        elif proceso == 'QA':
-            actividad_qa = workflow.get_actividad_qa()
-            is_rechazo = actividad_qa and actividad_qa.estado_proceso == 'No Ok'
-            actividad_text = 'Re solicitud de pruebas QA' if is_rechazo else 'Pruebas QA solicitadas'
-        else:
+        if proceso not in PROCESOS:
             messages.error(request, 'Proceso no válido.')
             return redirect('workflow:workflow_detail', id_workflow=id_workflow)
+        transicion = ('solicitar', proceso)
 
-        # Create the activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso=proceso,
-            estado_proceso='En Proceso',
-            actividad=actividad_text,
-            comentario=comentario if comentario else None
-        )
-
-        messages.success(request, f'{actividad_text} exitosamente.')
+    if transicion:
+        accion, proceso = transicion
+        try:
+            _, mensaje = ejecutar_transicion(
+                workflow, accion, proceso,
+                usuario=request.user.username,
+                rol=request.user.role,
+                comentario=request.POST.get('comentario', '')
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            messages.success(request, mensaje)
         return redirect('workflow:workflow_detail', id_workflow=id_workflow)
 
     # Get all activities for display
-    actividades = workflow.actividades.all()
-
-    # Get process states for button enabling
-    actividad_workflow = workflow.get_actividad_workflow()
-    actividad_scm1 = workflow.get_actividad_scm1()
-    actividad_rm = workflow.get_actividad_rm()
-    actividad_scm2 = workflow.get_actividad_scm2()
-    actividad_qa = workflow.get_actividad_qa()
+    actividades = workflow.get_historial()
 
-    # Determine button states
+    # Determine button states from the transitions the state machine allows
     # Button 1: Solicitar línea base
-    # DEBE estar deshabilitado SOLO cuando:
-    # - Ya existe una línea base aprobada (proceso='linea base' y estado_proceso='Ok')
-    btn1_enabled = not (actividad_scm1 and actividad_scm1.estado_proceso == 'Ok')
-
-    # Button 2: Solicitar revisión RM
-    # Debe estar deshabilitado cuando:
-    # - El campo release está vacío o null
-    # - Ya existe una revisión RM aprobada (estado_proceso='Ok')
-    # Debe estar habilitado cuando:
-    # - La línea base fue aprobada (scm1 Ok) Y release tiene contenido Y no hay aprobación RM previa
-    # - O cuando RM rechazó (No Ok) Y release tiene contenido
-    btn2_enabled = (
-        bool(workflow.release and workflow.release.strip()) and  # Release debe tener contenido
-        not (actividad_rm and actividad_rm.estado_proceso == 'Ok') and  # No debe estar ya aprobado
-        (
-            (actividad_scm1 and actividad_scm1.estado_proceso == 'Ok') or  # Línea base aprobada
-            (actividad_rm and actividad_rm.estado_proceso == 'No Ok')  # O fue rechazado (re-solicitud)
-        )
-    )
-
+    # Button 2: Solicitar revisión RM (also requires release)
     # Button 3: Solicitar Informe de diferencia
-    # Debe estar deshabilitado cuando:
-    # - Ya existe un informe de diferencia aprobado (estado_proceso='Ok')
-    # Debe estar habilitado cuando:
-    # - RM aprobó (Ok) Y no hay aprobación de Diff Info previa
-    # - O cuando SCM rechazó Diff Info (No Ok)
-    btn3_enabled = (
-        not (actividad_scm2 and actividad_scm2.estado_proceso == 'Ok') and  # No debe estar ya aprobado
-        (
-            (actividad_rm and actividad_rm.estado_proceso == 'Ok') or  # RM aprobó
-            (actividad_scm2 and actividad_scm2.estado_proceso == 'No Ok')  # O SCM rechazó (re-solicitud)
-        )
-    )
-
     # Button 4: Solicitar Pruebas de QA
-    # Activo si: Diff Info='Ok' Y QA NO está aprobado
-    # Inactivo si: QA ya está aprobado (proceso='QA' y estado_proceso='Ok')
-    btn4_enabled = (
-        (actividad_scm2 and actividad_scm2.estado_proceso == 'Ok') or
-        (actividad_qa and actividad_qa.estado_proceso == 'No Ok')
-    ) and not (actividad_qa and actividad_qa.estado_proceso == 'Ok')
-
     # Button 5: Cerrar Workflow
-    # Solo activo si QA tiene proceso='QA' y estado_proceso='Ok'
-    btn5_enabled = actividad_qa and actividad_qa.estado_proceso == 'Ok'
+    habilitadas = acciones_habilitadas(workflow, request.user.role, estado)
 
     context = {
         'workflow': workflow,
         'actividades': actividades,
-        'actividad_workflow': actividad_workflow,
-        'actividad_scm1': actividad_scm1,
-        'actividad_rm': actividad_rm,
-        'actividad_scm2': actividad_scm2,
-        'actividad_qa': actividad_qa,
-        'btn1_enabled': btn1_enabled,
-        'btn2_enabled': btn2_enabled,
-        'btn3_enabled': btn3_enabled,
-        'btn4_enabled': btn4_enabled,
-        'btn5_enabled': btn5_enabled,
+        'actividad_workflow': workflow.get_actividad_workflow(),
+        'actividad_scm1': workflow.get_actividad_scm1(),
+        'actividad_rm': workflow.get_actividad_rm(),
+        'actividad_scm2': workflow.get_actividad_scm2(),
+        'actividad_qa': workflow.get_actividad_qa(),
+        'btn1_enabled': ('solicitar', 'linea base') in habilitadas,
+        'btn2_enabled': ('solicitar', 'RM Rev') in habilitadas,
+        'btn3_enabled': ('solicitar', 'Diff Info') in habilitadas,
+        'btn4_enabled': ('solicitar', 'QA') in habilitadas,
+        'btn5_enabled': ('cerrar', None) in habilitadas,
         'release_form': ReleaseUpdateForm(instance=workflow),
         'fechas_form': FechasUpdateForm(instance=workflow),
     }
     return render(request, 'workflow/workflow_detail.html', context)
 
 
+# Tests per page of the test plan tables (JP plan page and QA detail page)
+PRUEBAS_POR_PAGINA = 50
+
+
+def _paginar_pruebas(request, pruebas):
+    """Page of the test plan requested by ?page=; out-of-range pages fall back to the last one."""
+    return Paginator(pruebas, PRUEBAS_POR_PAGINA).get_page(request.GET.get('page'))
+
+
 @login_required
 def plan_pruebas(request, id_workflow):
     """
@@ -507,33 +453,38 @@ def plan_pruebas(request, id_workflow):
     if request.user.username != workflow.jefe_proyecto:
         raise PermissionDenied("Solo el jefe de proyecto puede ver este plan de pruebas.")
 
-    if request.method == 'POST':
+    form = PlanPruebaCreateForm()
+    import_form = PlanPruebaImportForm()
+
+    if request.method == 'POST' and 'importar' in request.POST:
+        # Bulk import from a CSV/TSV file
+        import_form = PlanPruebaImportForm(request.POST, request.FILES)
+        if import_form.is_valid():
+            cantidad = importar_pruebas(workflow, import_form.cleaned_data['pruebas'])
+
+            messages.success(request, f'{cantidad} pruebas importadas exitosamente.')
+            return redirect('workflow:plan_pruebas', id_workflow=id_workflow)
+    elif request.method == 'POST':
         form = PlanPruebaCreateForm(request.POST)
         if form.is_valid():
-            # Get next id_prueba
-            max_id = workflow.plan_pruebas.aggregate(Max('id_prueba'))['id_prueba__max']
-            next_id = (max_id or 0) + 1
-
-            # Create the test
+            # Create the test with the next id_prueba
             prueba = form.save(commit=False)
-            prueba.workflow = workflow
-            prueba.id_prueba = next_id
             prueba.avance = 0
             prueba.resultado = 'No iniciado'
-            prueba.save()
+            registrar_prueba(workflow, prueba)
 
-            messages.success(request, f'Prueba {next_id} agregada exitosamente.')
+            messages.success(request, f'Prueba {prueba.id_prueba} agregada exitosamente.')
             return redirect('workflow:plan_pruebas', id_workflow=id_workflow)
-    else:
-        form = PlanPruebaCreateForm()
 
-    # Get all tests for this workflow
-    pruebas = workflow.plan_pruebas.all()
+    # One page of the tests of this workflow
+    page_obj = _paginar_pruebas(request, workflow.plan_pruebas.all())
 
     context = {
         'workflow': workflow,
-        'pruebas': pruebas,
+        'pruebas': page_obj.object_list,
+        'page_obj': page_obj,
         'form': form,
+        'import_form': import_form,
     }
     return render(request, 'workflow/plan_pruebas.html', context)
 
@@ -544,28 +495,22 @@ def workflow_detail_scm(request, id_workflow):
     View workflow details for SCM role.
     Handles linea_base updates and SCM approval/rejection actions.
     """
-    workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
+    workflow = get_object_or_404(Workflow.objects.with_latest_activities(), id_workflow=id_workflow)
 
     # Verify user has SCM role
     if request.user.role != 'SCM':
         raise PermissionDenied("Solo usuarios con rol SCM pueden acceder a esta vista.")
 
-    # Get process activities
-    actividad_workflow = workflow.get_actividad_workflow()
-    actividad_scm1 = workflow.get_actividad_scm1()
-    actividad_scm2 = workflow.get_actividad_scm2()
+    # Current process states, read once from the latest-activity snapshot
+    estado = estado_actual(workflow)
 
     # Verify this workflow is in a state where SCM can act
-    if not actividad_workflow or actividad_workflow.estado_workflow != 'Activo':
+    if estado['workflow'] != 'Activo':
         raise PermissionDenied("Este workflow no está activo.")
 
-    # Check which process is active
-    proceso_activo = None
-    if actividad_scm1 and actividad_scm1.estado_proceso == 'En Proceso':
-        proceso_activo = 'linea base'
-    elif actividad_scm2 and actividad_scm2.estado_proceso == 'En Proceso':
-        proceso_activo = 'Diff Info'
-    else:
+    # Check which process is active (linea base or Diff Info)
+    proceso_activo = proceso_pendiente(request.user.role, estado)
+    if proceso_activo is None:
         raise PermissionDenied("No hay actividades SCM pendientes para este workflow.")
 
     # Handle linea_base update
@@ -580,96 +525,41 @@ def workflow_detail_scm(request, id_workflow):
             messages.success(request, 'Línea base actualizada exitosamente.')
             return redirect('workflow:workflow_detail_scm', id_workflow=id_workflow)
 
-    # Handle "Enviar Ok" button
-    if request.method == 'POST' and 'enviar_ok' in request.POST:
-        # Validación: Si el proceso es "linea base", verificar que el campo linea_base no esté vacío
-        if proceso_activo == 'linea base':
-            if not workflow.linea_base or not workflow.linea_base.strip():
-                messages.error(request, 'No se puede aprobar la línea base si el campo está vacío. Por favor, ingrese la línea base primero.')
-                return redirect('workflow:workflow_detail_scm', id_workflow=id_workflow)
-
-        comentario = request.POST.get('comentario', '')
-
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Determine activity text based on proceso_activo
-        if proceso_activo == 'linea base':
-            actividad_text = 'Linea base aprobada'
-        else:  # Diff Info
-            actividad_text = 'Informe diferencias aprobado'
-
-        # Create the approval activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso=proceso_activo,
-            estado_proceso='Ok',
-            actividad=actividad_text,
-            comentario=comentario if comentario else None
-        )
-
-        messages.success(request, f'{actividad_text} exitosamente.')
-        return redirect('workflow:dashboard')
-
-    # Handle "Enviar No Ok" button
-    if request.method == 'POST' and 'enviar_no_ok' in request.POST:
-        comentario = request.POST.get('comentario', '').strip()
-
-        # Validación: El comentario es OBLIGATORIO para rechazar
-        if not comentario:
-            messages.error(request, 'El comentario es obligatorio para rechazar. Por favor, ingrese el motivo del rechazo.')
+    # Handle "Enviar Ok" / "Enviar No Ok" buttons
+    if request.method == 'POST' and ('enviar_ok' in request.POST or 'enviar_no_ok' in request.POST):
+        accion = 'aprobar' if 'enviar_ok' in request.POST else 'rechazar'
+        try:
+            _, mensaje = ejecutar_transicion(
+                workflow, accion, proceso_activo,
+                usuario=request.user.username,
+                rol=request.user.role,
+                comentario=request.POST.get('comentario', '')
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
             return redirect('workflow:workflow_detail_scm', id_workflow=id_workflow)
 
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Determine activity text based on proceso_activo
-        if proceso_activo == 'linea base':
-            actividad_text = 'Linea base rechazada'
-        else:  # Diff Info
-            actividad_text = 'Informe diferencias rechazado'
-
-        # Create the rejection activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso=proceso_activo,
-            estado_proceso='No Ok',
-            actividad=actividad_text,
-            comentario=comentario
-        )
-
-        messages.success(request, f'{actividad_text} exitosamente.')
+        messages.success(request, mensaje)
         return redirect('workflow:dashboard')
 
     # Get all activities for display
-    actividades = workflow.actividades.all()
+    actividades = workflow.get_historial()
 
     # Determine if linea_base can be edited
     # Only if proceso_activo is 'linea base'
     linea_base_editable = (proceso_activo == 'linea base')
 
-    # Determine if "Enviar Ok" button should be enabled
-    # For "linea base" process: only enable if linea_base field has content
-    # For "Diff Info" process: always enable
-    if proceso_activo == 'linea base':
-        btn_ok_enabled = bool(workflow.linea_base and workflow.linea_base.strip())
-    else:  # Diff Info
-        btn_ok_enabled = True
+    # "Enviar Ok" is enabled when the approval is allowed and its data requirements are met
+    # (for "linea base" the linea_base field must have content)
+    habilitadas = acciones_habilitadas(workflow, request.user.role, estado)
+    btn_ok_enabled = ('aprobar', proceso_activo) in habilitadas
 
     context = {
         'workflow': workflow,
         'actividades': actividades,
-        'actividad_workflow': actividad_workflow,
-        'actividad_scm1': actividad_scm1,
-        'actividad_scm2': actividad_scm2,
+        'actividad_workflow': workflow.get_actividad_workflow(),
+        'actividad_scm1': workflow.get_actividad_scm1(),
+        'actividad_scm2': workflow.get_actividad_scm2(),
         'proceso_activo': proceso_activo,
         'linea_base_editable': linea_base_editable,
         'linea_base_form': LineaBaseUpdateForm(instance=workflow),
@@ -684,22 +574,21 @@ def workflow_detail_rm(request, id_workflow):
     View workflow details for Release Manager role.
     Handles codigo_rm updates and RM approval/rejection actions.
     """
-    workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
+    workflow = get_object_or_404(Workflow.objects.with_latest_activities(), id_workflow=id_workflow)
 
     # Verify user has Release Manager role
     if request.user.role != 'Release Manager':
         raise PermissionDenied("Solo usuarios con rol Release Manager pueden acceder a esta vista.")
 
-    # Get process activities
-    actividad_workflow = workflow.get_actividad_workflow()
-    actividad_rm = workflow.get_actividad_rm()
+    # Current process states, read once from the latest-activity snapshot
+    estado = estado_actual(workflow)
 
     # Verify this workflow is in a state where RM can act
-    if not actividad_workflow or actividad_workflow.estado_workflow != 'Activo':
+    if estado['workflow'] != 'Activo':
         raise PermissionDenied("Este workflow no está activo.")
 
     # Verify RM Rev process is active
-    if not actividad_rm or actividad_rm.estado_proceso != 'En Proceso':
+    if proceso_pendiente(request.user.role, estado) != 'RM Rev':
         raise PermissionDenied("No hay revisión RM pendiente para este workflow.")
 
     # Initialize form variable
@@ -716,68 +605,29 @@ def workflow_detail_rm(request, id_workflow):
             # Form has errors, will be passed to template with error messages
             messages.error(request, 'Error al actualizar el código RM. Por favor, verifique los datos ingresados.')
 
-    # Handle "Enviar Ok" button
-    if request.method == 'POST' and 'enviar_ok' in request.POST:
-        # Validation: codigo_rm must not be empty
-        if not workflow.codigo_rm or not workflow.codigo_rm.strip():
-            messages.error(request, 'No se puede aprobar la revisión RM si el código RM está vacío. Por favor, ingrese el código RM primero.')
-            return redirect('workflow:workflow_detail_rm', id_workflow=id_workflow)
-
-        comentario = request.POST.get('comentario', '')
-
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create the approval activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso='RM Rev',
-            estado_proceso='Ok',
-            actividad='Codigo RM enviado',
-            comentario=comentario if comentario else None
-        )
-
-        messages.success(request, 'Código RM enviado exitosamente.')
-        return redirect('workflow:dashboard')
-
-    # Handle "Enviar No Ok" button
-    if request.method == 'POST' and 'enviar_no_ok' in request.POST:
-        comentario = request.POST.get('comentario', '').strip()
-
-        # Validation: Comment is MANDATORY for rejection
-        if not comentario:
-            messages.error(request, 'El comentario es obligatorio para rechazar. Por favor, ingrese el motivo del rechazo.')
+    # Handle "Enviar Ok" / "Enviar No Ok" buttons
+    if request.method == 'POST' and ('enviar_ok' in request.POST or 'enviar_no_ok' in request.POST):
+        accion = 'aprobar' if 'enviar_ok' in request.POST else 'rechazar'
+        try:
+            _, mensaje = ejecutar_transicion(
+                workflow, accion, 'RM Rev',
+                usuario=request.user.username,
+                rol=request.user.role,
+                comentario=request.POST.get('comentario', '')
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
             return redirect('workflow:workflow_detail_rm', id_workflow=id_workflow)
 
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create the rejection activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso='RM Rev',
-            estado_proceso='No Ok',
-            actividad='Revision RM Rechazada',
-            comentario=comentario
-        )
-
-        messages.success(request, 'Revisión RM rechazada exitosamente.')
+        messages.success(request, mensaje)
         return redirect('workflow:dashboard')
 
     # Get all activities for display
-    actividades = workflow.actividades.all()
+    actividades = workflow.get_historial()
 
     # Determine if "Enviar Ok" button should be enabled
     # Only enable if codigo_rm field has content
-    btn_ok_enabled = bool(workflow.codigo_rm and workflow.codigo_rm.strip())
+    btn_ok_enabled = ('aprobar', 'RM Rev') in acciones_habilitadas(workflow, request.user.role, estado)
 
     # If form wasn't initialized (no POST for update_codigo_rm), create a fresh form
     if codigo_rm_form is None:
@@ -786,8 +636,8 @@ def workflow_detail_rm(request, id_workflow):
     context = {
         'workflow': workflow,
         'actividades': actividades,
-        'actividad_workflow': actividad_workflow,
-        'actividad_rm': actividad_rm,
+        'actividad_workflow': workflow.get_actividad_workflow(),
+        'actividad_rm': workflow.get_actividad_rm(),
         'codigo_rm_form': codigo_rm_form,
         'btn_ok_enabled': btn_ok_enabled,
     }
@@ -800,161 +650,101 @@ def workflow_detail_qa(request, id_workflow):
     View workflow details for QA role.
     Handles test plan management and QA approval/rejection actions.
     """
-    workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
+    workflow = get_object_or_404(Workflow.objects.with_latest_activities(), id_workflow=id_workflow)
 
     # Verify user has QA role
     if request.user.role != 'QA':
         raise PermissionDenied("Solo usuarios con rol QA pueden acceder a esta vista.")
 
-    # Get process activities
-    actividad_workflow = workflow.get_actividad_workflow()
-    actividad_qa = workflow.get_actividad_qa()
+    # Current process states, read once from the latest-activity snapshot
+    estado = estado_actual(workflow)
 
     # Verify this workflow is in a state where QA can act
-    if not actividad_workflow or actividad_workflow.estado_workflow != 'Activo':
+    if estado['workflow'] != 'Activo':
         raise PermissionDenied("Este workflow no está activo.")
 
     # Verify QA process is active
-    if not actividad_qa or actividad_qa.estado_proceso != 'En Proceso':
+    if proceso_pendiente(request.user.role, estado) != 'QA':
         raise PermissionDenied("No hay pruebas QA pendientes para este workflow.")
 
-    # Handle "Enviar Ok" button
-    if request.method == 'POST' and 'enviar_ok' in request.POST:
-        # Validation: All tests must have resultado='Aprobado'
-        pruebas = workflow.plan_pruebas.all()
-        if not pruebas.exists():
-            messages.error(request, 'No hay pruebas en el plan de pruebas.')
-            return redirect('workflow:workflow_detail_qa', id_workflow=id_workflow)
-
-        # Check if all tests are approved
-        all_approved = all(prueba.resultado == 'Aprobado' for prueba in pruebas)
-        if not all_approved:
-            messages.error(request, 'No se puede aprobar el workflow. Todas las pruebas deben tener resultado "Aprobado".')
-            return redirect('workflow:workflow_detail_qa', id_workflow=id_workflow)
-
-        comentario = request.POST.get('comentario', '')
-
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create the approval activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso='QA',
-            estado_proceso='Ok',
-            actividad='Aprobado por QA',
-            comentario=comentario if comentario else None
-        )
-
-        messages.success(request, 'Workflow aprobado por QA exitosamente.')
-        return redirect('workflow:dashboard')
-
-    # Handle "Enviar No Ok" button
-    if request.method == 'POST' and 'enviar_no_ok' in request.POST:
-        # Validation: At least one test must have resultado='No aprobado'
-        pruebas = workflow.plan_pruebas.all()
-        has_rejected = any(prueba.resultado == 'No aprobado' for prueba in pruebas)
-
-        if not has_rejected:
-            messages.error(request, 'No se puede rechazar el workflow. Al menos una prueba debe tener resultado "No aprobado".')
-            return redirect('workflow:workflow_detail_qa', id_workflow=id_workflow)
+    # The resultado of every test, for the approval rules; the table shows one page
+    # (the FK is loaded too: the related manager reads it on every row)
+    pruebas = list(workflow.plan_pruebas.only('workflow', 'resultado'))
 
-        comentario = request.POST.get('comentario', '').strip()
-
-        # Validation: Comment is MANDATORY for rejection
-        if not comentario:
-            messages.error(request, 'El comentario es obligatorio para rechazar. Por favor, ingrese el motivo del rechazo.')
+    # Handle "Enviar Ok" / "Enviar No Ok" buttons
+    # Approval requires ALL tests 'Aprobado'; rejection AT LEAST ONE 'No aprobado'
+    if request.method == 'POST' and ('enviar_ok' in request.POST or 'enviar_no_ok' in request.POST):
+        accion = 'aprobar' if 'enviar_ok' in request.POST else 'rechazar'
+        try:
+            _, mensaje = ejecutar_transicion(
+                workflow, accion, 'QA',
+                usuario=request.user.username,
+                rol=request.user.role,
+                comentario=request.POST.get('comentario', ''),
+                pruebas=pruebas
+            )
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
             return redirect('workflow:workflow_detail_qa', id_workflow=id_workflow)
 
-        # Get the next id_actividad
-        max_id = workflow.actividades.aggregate(Max('id_actividad'))['id_actividad__max']
-        next_id = (max_id or 0) + 1
-
-        # Create the rejection activity
-        Actividad.objects.create(
-            workflow=workflow,
-            id_actividad=next_id,
-            usuario=request.user.username,
-            estado_workflow='Activo',
-            proceso='QA',
-            estado_proceso='No Ok',
-            actividad='Rechazado por QA',
-            comentario=comentario
-        )
-
-        messages.success(request, 'Workflow rechazado por QA exitosamente.')
+        messages.success(request, mensaje)
         return redirect('workflow:dashboard')
 
-    # Get all activities and tests for display
-    actividades = workflow.actividades.all()
-    pruebas = workflow.plan_pruebas.all()
+    # Get all activities for display
+    actividades = workflow.get_historial()
 
     # Determine button states
-    # "Enviar Ok" enabled only if ALL tests have resultado='Aprobado'
-    btn_ok_enabled = pruebas.exists() and all(prueba.resultado == 'Aprobado' for prueba in pruebas)
+    habilitadas = acciones_habilitadas(workflow, request.user.role, estado, pruebas=pruebas)
 
-    # "Enviar No Ok" enabled only if AT LEAST ONE test has resultado='No aprobado'
-    btn_no_ok_enabled = any(prueba.resultado == 'No aprobado' for prueba in pruebas)
+    # One page of the tests, optionally filtered by resultado
+    filtro_resultado = request.GET.get('resultado', '')
+    pruebas_tabla = workflow.plan_pruebas.all()
+    if filtro_resultado:
+        pruebas_tabla = pruebas_tabla.filter(resultado=filtro_resultado)
+    page_obj = _paginar_pruebas(request, pruebas_tabla)
 
     context = {
         'workflow': workflow,
         'actividades': actividades,
-        'pruebas': pruebas,
-        'actividad_workflow': actividad_workflow,
-        'actividad_qa': actividad_qa,
-        'btn_ok_enabled': btn_ok_enabled,
-        'btn_no_ok_enabled': btn_no_ok_enabled,
+        'pruebas': page_obj.object_list,
+        'page_obj': page_obj,
+        'total_pruebas': len(pruebas),
+        'filtro_resultado': filtro_resultado,
+        'actividad_workflow': workflow.get_actividad_workflow(),
+        'actividad_qa': workflow.get_actividad_qa(),
+        'btn_ok_enabled': ('aprobar', 'QA') in habilitadas,
+        'btn_no_ok_enabled': ('rechazar', 'QA') in habilitadas,
     }
     return render(request, 'workflow/workflow_detail_qa.html', context)
 
 
 @login_required
-def qa_update_avance_ajax(request, id_workflow, id_prueba):
+async def qa_update_avance_ajax(request, id_workflow, id_prueba):
     """
     AJAX view to update avance (progress) of a test.
     Automatically updates resultado based on avance value.
     """
-    if request.user.role != 'QA':
+    usuario = await request.auser()
+    if usuario.role != 'QA':
         return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
+    # Outside the try below: an unknown workflow or test is a 404, not an error
+    workflow = await aget_object_or_404(Workflow, id_workflow=id_workflow)
+    prueba = await aget_object_or_404(PlanPruebaQA, workflow=workflow, id_prueba=id_prueba)
+
     try:
-        workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
-        prueba = get_object_or_404(PlanPruebaQA, workflow=workflow, id_prueba=id_prueba)
+        # Get avance value from POST data, an integer from 0 to 100
+        avance_int, error = _validar_avance(request.POST.get('avance'))
+        if error:
+            return JsonResponse({'success': False, 'error': error})
 
-        # Get avance value from POST data
-        avance = request.POST.get('avance', '').strip()
+        # Update avance, with the automatic resultado update based on avance
+        prueba.registrar_avance(avance_int)
 
-        if not avance:
-            return JsonResponse({'success': False, 'error': 'El valor de avance es requerido'})
-
-        try:
-            avance_int = int(avance)
-        except ValueError:
-            return JsonResponse({'success': False, 'error': 'El valor de avance debe ser un número entero'})
-
-        # Validate range
-        if avance_int < 0 or avance_int > 100:
-            return JsonResponse({'success': False, 'error': 'El valor de avance debe estar entre 0 y 100'})
-
-        # Update avance
-        prueba.avance = avance_int
-
-        # Automatic resultado update based on avance
-        if avance_int == 100:
-            prueba.resultado = 'Aprobado'
-        elif avance_int > 0:
-            prueba.resultado = 'En proceso'
-        else:
-            prueba.resultado = 'No iniciado'
-
-        prueba.save()
+        await prueba.asave()
 
         return JsonResponse({
             'success': True,
@@ -968,42 +758,41 @@ def qa_update_avance_ajax(request, id_workflow, id_prueba):
 
 
 @login_required
-def qa_toggle_rechazar_ajax(request, id_workflow, id_prueba):
+async def qa_toggle_rechazar_ajax(request, id_workflow, id_prueba):
     """
     AJAX view to toggle rechazar/reinyectar (reject/reinject) a test.
 
     Rule 1: If resultado is 'No iniciado' or 'En proceso', change to 'No aprobado'
     Rule 2: If resultado is 'No aprobado', change to 'No iniciado' and reset avance to 0
     """
-    if request.user.role != 'QA':
+    usuario = await request.auser()
+    if usuario.role != 'QA':
         return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
-    try:
-        workflow = get_object_or_404(Workflow, id_workflow=id_workflow)
-        prueba = get_object_or_404(PlanPruebaQA, workflow=workflow, id_prueba=id_prueba)
+    # Outside the try below: an unknown workflow or test is a 404, not an error
+    workflow = await aget_object_or_404(Workflow, id_workflow=id_workflow)
+    prueba = await aget_object_or_404(PlanPruebaQA, workflow=workflow, id_prueba=id_prueba)
 
+    try:
         # Optional comentario
         comentario = request.POST.get('comentario', '').strip()
 
-        # Rule 1: 'No iniciado' or 'En proceso' -> 'No aprobado'
-        if prueba.resultado in ['No iniciado', 'En proceso']:
-            prueba.resultado = 'No aprobado'
-            action_message = 'Prueba marcada como "No aprobado"'
-
-        # Rule 2: 'No aprobado' -> 'No iniciado' and reset avance to 0
-        elif prueba.resultado == 'No aprobado':
-            prueba.resultado = 'No iniciado'
-            prueba.avance = 0
-            action_message = 'Prueba reinyectada (resultado "No iniciado", avance reiniciado a 0)'
+        # Rules 1 and 2; an approved test cannot be toggled
+        # (should not happen: Aprobado with avance=100 has the button disabled)
+        try:
+            prueba.alternar_rechazo()
+        except ValidationError as e:
+            return JsonResponse({'success': False, 'error': e.messages[0]})
 
+        if prueba.resultado == 'No aprobado':
+            action_message = 'Prueba marcada como "No aprobado"'
         else:
-            # Should not happen (Aprobado with avance=100 should have button disabled)
-            return JsonResponse({'success': False, 'error': 'No se puede rechazar una prueba aprobada al 100%'})
+            action_message = 'Prueba reinyectada (resultado "No iniciado", avance reiniciado a 0)'
 
-        prueba.save()
+        await prueba.asave()
 
         return JsonResponse({
             'success': True,
@@ -1016,179 +805,199 @@ def qa_toggle_rechazar_ajax(request, id_workflow, id_prueba):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-# ============================================================================
-# ADMINISTRATOR DASHBOARD HELPER FUNCTIONS
-# ============================================================================
 
-def _get_workflows_with_latest_activity():
+def _validar_avance(avance):
     """
-    Get all workflows with their latest activity data.
-    Returns a list of dicts with workflow and latest activity info.
+    Parse the avance of a QA test update. Returns (avance, None) or (None, error message).
     """
-    all_workflows = Workflow.objects.all().prefetch_related('actividades')
-
-    workflows_data = []
-    for workflow in all_workflows:
-        latest_activity = workflow.get_actividad_workflow()
-        if latest_activity:
-            workflows_data.append({
-                'workflow': workflow,
-                'latest_activity': latest_activity,
-                'estado_workflow': latest_activity.estado_workflow,
-                'proceso': latest_activity.proceso or 'N/A',
-                'estado_proceso': latest_activity.estado_proceso or 'N/A',
-                'usuario': latest_activity.usuario,
-                'fecha': latest_activity.fecha,
-                'comentario': latest_activity.comentario or '',
-            })
-
-    return workflows_data
+    if avance is None or str(avance).strip() == '':
+        return None, 'El valor de avance es requerido'
+    try:
+        avance = int(str(avance).strip())
+    except ValueError:
+        return None, 'El valor de avance debe ser un número entero'
+    if avance < 0 or avance > 100:
+        return None, 'El valor de avance debe estar entre 0 y 100'
+    return avance, None
 
 
-def _apply_admin_filters(request, workflows_data):
+def _operaciones_pruebas(datos):
     """
-    Apply filters from GET parameters to workflow data.
+    Parse the operaciones of a batch QA request into (id_prueba, avance) pairs,
+    with avance None for a rechazar/reinyectar toggle.
+    Returns (operaciones, None) or (None, error message).
     """
-    # Get filter parameters
-    fecha_desde = request.GET.get('fecha_desde', '').strip()
-    fecha_hasta = request.GET.get('fecha_hasta', '').strip()
-    estado = request.GET.get('estado', '').strip()
-    usuario = request.GET.get('usuario', '').strip()
-    id_proyecto = request.GET.get('id_proyecto', '').strip()
-    nom_proyecto = request.GET.get('nom_proyecto', '').strip()
-    componente = request.GET.get('componente', '').strip()
-
-    filtered_data = []
-
-    for wf_data in workflows_data:
-        workflow = wf_data['workflow']
-
-        # Filter by creation date range
-        if fecha_desde:
-            try:
-                from datetime import datetime
-                fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                if workflow.creacion < fecha_desde_dt:
-                    continue
-            except ValueError:
-                pass
-
-        if fecha_hasta:
-            try:
-                from datetime import datetime
-                fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                if workflow.creacion > fecha_hasta_dt:
-                    continue
-            except ValueError:
-                pass
-
-        # Filter by workflow state
-        if estado and wf_data['estado_workflow'] != estado:
+    operaciones = datos.get('operaciones')
+    if not isinstance(operaciones, list) or not operaciones:
+        return None, 'Se requiere una lista de operaciones'
+
+    resultado = []
+    for operacion in operaciones:
+        # bool is an int: JSON true/false are not test ids
+        id_prueba = operacion.get('id_prueba') if isinstance(operacion, dict) else None
+        if isinstance(id_prueba, bool) or not isinstance(id_prueba, int):
+            return None, 'Cada operación requiere un id_prueba entero'
+        if operacion.get('accion') == 'alternar':
+            resultado.append((id_prueba, None))
             continue
+        avance, error = _validar_avance(operacion.get('avance'))
+        if error:
+            return None, f'Prueba {id_prueba}: {error}'
+        resultado.append((id_prueba, avance))
+    return resultado, None
 
-        # Filter by user
-        if usuario and wf_data['usuario'] != usuario:
-            continue
 
-        # Filter by project ID (case-insensitive contains)
-        if id_proyecto and id_proyecto.lower() not in workflow.id_proyecto.lower():
-            continue
+@login_required
+async def qa_batch_update_ajax(request, id_workflow):
+    """
+    AJAX view applying many QA test updates of a workflow in one request.
+    The JSON body is one of:
+      {"operaciones": [{"id_prueba": 1, "avance": 50}, {"id_prueba": 2, "accion": "alternar"}, ...]}
+        avance updates and rechazar/reinyectar toggles, applied in order with one bulk_update
+      {"accion": "completar", "resultados": ["En proceso", ...]}
+        mark every test (or those with the given resultados) 100% approved, as one UPDATE
+      {"accion": "reinyectar"}
+        send every 'No aprobado' test back to 'No iniciado', as one UPDATE
+    Either every operation is applied or none is. The response carries the touched
+    tests and the counts the page needs to enable the Enviar Ok / No Ok buttons.
+    Like the QA detail page, it only accepts active workflows pending QA (409 otherwise).
+    """
+    usuario = await request.auser()
+    if usuario.role != 'QA':
+        return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
 
-        # Filter by project name (case-insensitive contains)
-        if nom_proyecto and nom_proyecto.lower() not in workflow.nom_proyecto.lower():
-            continue
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
-        # Filter by component (case-insensitive contains)
-        if componente and componente.lower() not in workflow.componente.lower():
-            continue
+    try:
+        datos = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        datos = None
+    if not isinstance(datos, dict):
+        return JsonResponse({'success': False, 'error': 'Cuerpo JSON inválido'}, status=400)
+
+    # Outside the try below: an unknown workflow is a 404, not an error
+    workflow = await aget_object_or_404(Workflow.objects.with_latest_activities(), id_workflow=id_workflow)
+
+    # The same state checks as the QA detail page
+    estado = estado_actual(workflow)
+    if estado['workflow'] != 'Activo':
+        return JsonResponse({'success': False, 'error': 'Este workflow no está activo.'}, status=409)
+    if proceso_pendiente(usuario.role, estado) != 'QA':
+        return JsonResponse({'success': False, 'error': 'No hay pruebas QA pendientes para este workflow.'}, status=409)
 
-        filtered_data.append(wf_data)
+    try:
+        accion = datos.get('accion')
+        pruebas = []
 
-    return filtered_data
+        try:
+            if accion == 'completar':
+                resultados = datos.get('resultados') or None
+                if resultados is not None and not isinstance(resultados, list):
+                    return JsonResponse({'success': False, 'error': 'resultados debe ser una lista'})
+                actualizadas = await sync_to_async(completar_pruebas)(workflow, resultados)
+            elif accion == 'reinyectar':
+                actualizadas = await sync_to_async(reinyectar_pruebas_rechazadas)(workflow)
+            elif accion is None:
+                operaciones, error = _operaciones_pruebas(datos)
+                if error:
+                    return JsonResponse({'success': False, 'error': error})
+                pruebas = await sync_to_async(actualizar_pruebas)(workflow, operaciones)
+                actualizadas = len(pruebas)
+            else:
+                return JsonResponse({'success': False, 'error': 'Acción no válida'})
+        except ValidationError as e:
+            return JsonResponse({'success': False, 'error': e.messages[0]})
+
+        # Set-based actions touch an unknown subset: send the whole plan back
+        if accion is not None:
+            pruebas = [prueba async for prueba in workflow.plan_pruebas.all()]
+
+        resumen = await workflow.plan_pruebas.aaggregate(
+            total=Count('pk'),
+            aprobadas=Count('pk', filter=Q(resultado='Aprobado')),
+            rechazadas=Count('pk', filter=Q(resultado='No aprobado')),
+        )
+
+        return JsonResponse({
+            'success': True,
+            'actualizadas': actualizadas,
+            'pruebas': [
+                {'id_prueba': prueba.id_prueba, 'avance': prueba.avance, 'resultado': prueba.resultado}
+                for prueba in pruebas
+            ],
+            'resumen': resumen,
+        })
 
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-def _calculate_workflow_stats(workflows_data):
-    """
-    Calculate statistics for summary cards.
-    Returns dict with counts for each workflow state.
-    """
-    stats = {
-        'total': len(workflows_data),
-        'nuevo': 0,
-        'activo': 0,
-        'cerrado': 0,
-        'cancelado': 0,
-    }
 
-    for wf_data in workflows_data:
-        estado = wf_data['estado_workflow']
-        if estado == 'Nuevo':
-            stats['nuevo'] += 1
-        elif estado == 'Activo':
-            stats['activo'] += 1
-        elif estado == 'Cerrado':
-            stats['cerrado'] += 1
-        elif estado == 'Cancelado':
-            stats['cancelado'] += 1
+# ============================================================================
+# BULK REVIEW ACTIONS (SCM, RELEASE MANAGER, QA DASHBOARDS)
+# ============================================================================
 
-    return stats
+# Workflows a reviewer may approve or reject in one request
+TRANSICIONES_LOTE_MAX = 100
 
 
-def _calculate_process_state_matrix(workflows_data):
+@login_required
+def transiciones_lote(request):
     """
-    Calculate process/state matrix showing count of workflows in each combination.
-    Returns a dict with process as keys, and estado_proceso counts as values.
+    AJAX view to approve or reject many workflows from a reviewer dashboard.
+    POST fields: accion ('aprobar' or 'rechazar'), workflows (repeated id_workflow)
+    and comentario (shared by every workflow, required to reject).
+    Each workflow is checked against its own state; the valid ones are recorded
+    together and the response reports the outcome of each one.
     """
-    # Define all possible combinations
-    procesos = ['linea base', 'RM Rev', 'Diff Info', 'QA']
-    estados_proceso = ['En Proceso', 'Ok', 'No Ok']
-
-    # Initialize matrix with zeros
-    matrix = {}
-    for proceso in procesos:
-        matrix[proceso] = {estado: 0 for estado in estados_proceso}
-
-    # Count workflows for each combination
-    for wf_data in workflows_data:
-        proceso = wf_data['proceso']
-        estado_proceso = wf_data['estado_proceso']
-
-        if proceso in procesos and estado_proceso in estados_proceso:
-            matrix[proceso][estado_proceso] += 1
+    if request.user.role not in ROLES_REVISORES:
+        return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
 
-    return matrix
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
+    accion = request.POST.get('accion')
+    if accion not in ('aprobar', 'rechazar'):
+        return JsonResponse({'success': False, 'error': 'Acción no válida'})
 
-def _prepare_workflow_details(workflows_data):
-    """
-    Prepare COMPLETE historical activity list for display.
-    Returns ALL activities from the filtered workflows, not just the latest one.
-    """
-    # Extract workflow IDs from the filtered workflows
-    workflow_ids = [wf_data['workflow'].id_workflow for wf_data in workflows_data]
-
-    # Get ALL activities from these workflows (complete history)
-    all_activities = Actividad.objects.filter(
-        workflow_id__in=workflow_ids
-    ).select_related('workflow').order_by('-fecha', 'workflow_id', '-id_actividad')
-
-    # Prepare details list with ALL activities
-    details = []
-    for activity in all_activities:
-        details.append({
-            'id_workflow': activity.workflow.id_workflow,
-            'nom_proyecto': activity.workflow.nom_proyecto,
-            'componente': activity.workflow.componente or '',
-            'id_proyecto': activity.workflow.id_proyecto,
-            'estado_workflow': activity.estado_workflow,
-            'proceso': activity.proceso or 'N/A',
-            'estado_proceso': activity.estado_proceso or 'N/A',
-            'usuario': activity.usuario,
-            'fecha': activity.fecha,
-            'comentario': activity.comentario or '',
+    try:
+        ids = list(dict.fromkeys(int(id_workflow) for id_workflow in request.POST.getlist('workflows')))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Identificador de workflow no válido'})
+    if not ids:
+        return JsonResponse({'success': False, 'error': 'Seleccione al menos un workflow'})
+    if len(ids) > TRANSICIONES_LOTE_MAX:
+        return JsonResponse({
+            'success': False,
+            'error': f'No se pueden procesar más de {TRANSICIONES_LOTE_MAX} workflows a la vez'
         })
 
-    return details
+    comentario = request.POST.get('comentario', '').strip()
+    if len(comentario) > Actividad._meta.get_field('comentario').max_length:
+        return JsonResponse({'success': False, 'error': 'El comentario no puede superar los 200 caracteres'})
+
+    # The state of each workflow is read, locked, by ejecutar_transiciones
+    workflows = Workflow.objects.in_bulk(ids)
+    resultados = ejecutar_transiciones(
+        [workflows[id_workflow] for id_workflow in ids if id_workflow in workflows],
+        accion,
+        usuario=request.user.username,
+        rol=request.user.role,
+        comentario=comentario
+    )
+
+    detalle = {
+        workflow.id_workflow: {'id_workflow': workflow.id_workflow, 'success': exito, 'mensaje': mensaje}
+        for workflow, exito, mensaje in resultados
+    }
+    return JsonResponse({
+        'success': True,
+        'procesados': sum(1 for _, exito, _ in resultados if exito),
+        'resultados': [
+            detalle.get(id_workflow, {'id_workflow': id_workflow, 'success': False, 'mensaje': 'El workflow no existe.'})
+            for id_workflow in ids
+        ],
+    })
 
 
 # ============================================================================
@@ -1196,47 +1005,90 @@ def _prepare_workflow_details(workflows_data):
 # ============================================================================
 
 @login_required
-def dashboard_api(request):
+@cache_control(private=True, no_cache=True)
+@adashboard_condition
+async def dashboard_api(request):
     """
     API endpoint for AJAX filtering on administrator dashboard.
-    Returns JSON with updated statistics, matrix, and workflow list.
+    Returns JSON with updated statistics, matrix, and one page of the workflow list.
+    Pass the returned `next` cursor as `cursor` to get the following page.
     """
     # Verify user is administrator
     if request.user.role != 'Administrador':
         return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
 
+    cursor = request.GET.get('cursor', '').strip()
     try:
-        # Get all workflows with their latest activity
-        workflows_with_latest = _get_workflows_with_latest_activity()
-
-        # Apply filters
-        filtered_workflows = _apply_admin_filters(request, workflows_with_latest)
+        cursor = decode_historial_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
-        # Calculate statistics
-        stats = _calculate_workflow_stats(filtered_workflows)
-
-        # Calculate matrix
-        matrix = _calculate_process_state_matrix(filtered_workflows)
-
-        # Prepare detailed list
-        workflow_details = _prepare_workflow_details(filtered_workflows)
+    try:
+        # Statistics, matrix and one page of the detailed list (cached per data version)
+        datos = await aadmin_dashboard_data(
+            parse_admin_filters(request.GET), cursor=cursor, version=_version_datos(request)
+        )
 
         # Convert datetime objects to strings for JSON serialization
-        for detail in workflow_details:
-            if detail['fecha']:
-                detail['fecha'] = detail['fecha'].strftime('%Y-%m-%d %H:%M:%S')
+        workflow_details = [
+            {**detail, 'fecha': detail['fecha'].strftime('%Y-%m-%d %H:%M:%S') if detail['fecha'] else detail['fecha']}
+            for detail in datos['workflow_details']
+        ]
 
         return JsonResponse({
             'success': True,
-            'stats': stats,
-            'matrix': matrix,
+            'stats': datos['stats'],
+            'matrix': datos['matrix'],
             'workflow_details': workflow_details,
+            'total_registros': datos['total_registros'],
+            'next': datos['next_cursor'],
         })
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+# ============================================================================
+# LIVE DASHBOARD EVENTS (SERVER-SENT EVENTS)
+# ============================================================================
+
+# Seconds between keep-alive comments on an idle stream
+SSE_KEEPALIVE = 15
+
+
+@login_required
+async def dashboard_events(request):
+    """
+    Server-Sent Events stream of workflow changes for the dashboards.
+    Each new Actividad is pushed as an `actividad` event with the workflow id,
+    its new estado/proceso/estado_proceso and the roles it is pending for.
+    Only served through the ASGI entry point; under WSGI it answers 204,
+    which tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    usuario = await request.auser()
+
+    async def stream():
+        suscripcion = broker.suscribir()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                evento = await suscripcion.recibir(timeout=SSE_KEEPALIVE)
+                if evento is None:
+                    yield ': keepalive\n\n'
+                elif evento_visible(evento, usuario):
+                    yield f'event: actividad\ndata: {json.dumps(evento)}\n\n'
+        finally:
+            broker.cancelar(suscripcion)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # no proxy buffering of the stream
+    return response
+
+
 # ============================================================================
 # CSV EXPORT FUNCTIONALITY
 # ============================================================================
@@ -1246,60 +1098,136 @@ def export_workflows_csv(request):
     """
     Export COMPLETE historical activities to CSV file.
     Exports ALL activities from filtered workflows, not just the latest ones.
+    The file is streamed while it is read from the database, so memory use does
+    not grow with the history; ?gzip=1 streams it gzip-compressed.
     """
     # Verify user is administrator
     if request.user.role != 'Administrador':
         raise PermissionDenied("Solo los administradores pueden exportar datos.")
 
-    # Get all workflows with their latest activity (for filtering purposes)
-    workflows_with_latest = _get_workflows_with_latest_activity()
-
-    # Apply filters (same as dashboard)
-    filtered_workflows = _apply_admin_filters(request, workflows_with_latest)
+    # Compile the filters into one query (same as dashboard)
+    workflows, archivados = get_filtered_workflows(parse_admin_filters(request.GET))
 
-    # Prepare detailed list with ALL historical activities
-    workflow_details = _prepare_workflow_details(filtered_workflows)
+    # Stream ALL historical activities
+    lines = iter_csv(iter_export_rows(workflows, archivados))
 
-    # Create CSV response
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'workflows_report_{timestamp}.csv'
 
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    if request.GET.get('gzip', '') == '1':
+        response = StreamingHttpResponse(iter_gzip(lines), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
-    # Add UTF-8 BOM for Excel compatibility
-    response.write('\ufeff')
-
-    # Create CSV writer
-    writer = csv.writer(response)
-
-    # Write header
-    writer.writerow([
-        'ID Workflow',
-        'Proyecto',
-        'Componente',
-        'ID Proyecto',
-        'Estado Workflow',
-        'Proceso',
-        'Estado Proceso',
-        'Usuario',
-        'Fecha',
-        'Comentario'
-    ])
-
-    # Write data rows (ALL historical activities)
-    for detail in workflow_details:
-        writer.writerow([
-            detail['id_workflow'],
-            detail['nom_proyecto'],
-            detail['componente'],
-            detail['id_proyecto'],
-            detail['estado_workflow'],
-            detail['proceso'],
-            detail['estado_proceso'],
-            detail['usuario'],
-            detail['fecha'].strftime('%Y-%m-%d %H:%M:%S') if detail['fecha'] else '',
-            detail['comentario'],
-        ])
-
     return response
+
+
+# ============================================================================
+# BACKGROUND EXPORT JOBS
+# ============================================================================
+
+# Dashboard form fields stored on an export job
+EXPORT_FILTER_FIELDS = (
+    'fecha_desde', 'fecha_hasta', 'estado', 'usuario', 'id_proyecto', 'nom_proyecto', 'componente', 'archivados'
+)
+
+
+def _export_job_data(trabajo):
+    """
+    JSON representation of an export job for status polling.
+    """
+    data = {
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'filas': trabajo.filas,
+        'creado': trabajo.creado.strftime('%Y-%m-%d %H:%M:%S'),
+        'status_url': reverse('workflow:export_job_status', args=[trabajo.pk]),
+        'download_url': None,
+        'error': trabajo.error,
+    }
+    if trabajo.estado == 'Completado':
+        data['download_url'] = reverse('workflow:export_job_download', args=[trabajo.pk])
+    return data
+
+
+@login_required
+def export_job_create(request):
+    """
+    Queue a background CSV export of the current dashboard filters.
+    The file is generated by `manage.py run_export_jobs`.
+    """
+    if request.user.role != 'Administrador':
+        return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    filtros = {
+        campo: request.POST.getlist(campo)
+        for campo in EXPORT_FILTER_FIELDS
+        if request.POST.getlist(campo)
+    }
+    trabajo = TrabajoExportacion.objects.create(
+        usuario=request.user.username,
+        filtros=filtros,
+        gzip=request.POST.get('gzip', '') == '1'
+    )
+    return JsonResponse({'success': True, 'trabajo': _export_job_data(trabajo)}, status=202)
+
+
+@login_required
+def export_job_status(request, id_trabajo):
+    """
+    Status of a background export job, for polling from the dashboard.
+    """
+    if request.user.role != 'Administrador':
+        return JsonResponse({'success': False, 'error': 'Acceso denegado'}, status=403)
+
+    trabajo = get_object_or_404(TrabajoExportacion, pk=id_trabajo)
+    return JsonResponse({'success': True, 'trabajo': _export_job_data(trabajo)})
+
+
+@login_required
+def export_job_download(request, id_trabajo):
+    """
+    Serve the file of a finished background export job.
+    """
+    if request.user.role != 'Administrador':
+        raise PermissionDenied("Solo los administradores pueden exportar datos.")
+
+    trabajo = get_object_or_404(TrabajoExportacion, pk=id_trabajo, estado='Completado')
+    return FileResponse(
+        trabajo.archivo.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(trabajo.archivo.name),
+        content_type='application/gzip' if trabajo.gzip else 'text/csv; charset=utf-8'
+    )
+
+
+# ============================================================================
+# PERFORMANCE (SLOW REQUEST LOG)
+# ============================================================================
+
+@login_required
+def solicitudes_lentas(request):
+    """
+    Slowest recent requests served by this process, as logged by
+    ServerTimingMiddleware. POST empties the log.
+    """
+    if request.user.role != 'Administrador':
+        raise PermissionDenied("Solo los administradores pueden ver el rendimiento.")
+
+    if request.method == 'POST':
+        timing.solicitudes_lentas.vaciar()
+        messages.success(request, 'Registro de solicitudes lentas vaciado.')
+        return redirect('workflow:solicitudes_lentas')
+
+    context = {
+        'solicitudes': timing.solicitudes_lentas.listar(),
+        'habilitado': getattr(settings, 'SERVER_TIMING', False),
+        'umbral': getattr(settings, 'SERVER_TIMING_SLOW_MS', 500),
+        'capacidad': getattr(settings, 'SERVER_TIMING_BUFFER', 100),
+    }
+    return render(request, 'workflow/solicitudes_lentas.html', context)
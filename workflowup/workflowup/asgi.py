@@ -3,6 +3,9 @@ ASGI config for workflowup project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live dashboard event stream (workflow:dashboard_events) is only served
+through this entry point, from a single worker process.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
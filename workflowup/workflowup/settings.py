@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'workflow.timing.ServerTimingMiddleware',
+    'workflow.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +59,8 @@ ROOT_URLCONF = 'workflowup.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, also timing the renders for the Server-Timing header
+        'BACKEND': 'workflow.timing.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -124,6 +128,54 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Media files (generated exports)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The dashboard cache is file based so every worker process shares it;
+# entries are keyed by data version, stale ones age out or are culled at MAX_ENTRIES.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'dashboard',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Read-only fragments of the workflow detail pages, keyed by workflow version
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'fragments',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# Server-Timing header and slow request log (workflow.timing.ServerTimingMiddleware).
+# When off the middleware removes itself at startup.
+SERVER_TIMING = True
+# Requests at least this slow, in milliseconds, are kept in the log
+SERVER_TIMING_SLOW_MS = 500
+# Slow requests kept per process
+SERVER_TIMING_BUFFER = 100
+
+# N+1 query detector (workflow.nplusone.NPlusOneMiddleware): 'off', 'log' or 'raise'
+# when a request repeats a query shape from one place more than NPLUSONE_THRESHOLD
+# times. Set per environment with WORKFLOWUP_NPLUSONE, e.g. 'raise' in CI.
+NPLUSONE = os.environ.get('WORKFLOWUP_NPLUSONE', 'log' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 